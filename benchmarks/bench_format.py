@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+"""Compares the JSON and binary snapshot formats on a generated store
+
+Usage: python3 -m benchmarks.bench_format [count]
+
+Converts a generated JSON store to the binary format, then prints as
+JSON the size of both files, the seconds taken to decode and encode
+them, and the seconds taken by a FileStorage reload() and save() in
+each format.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from benchmarks.dataset import generate
+from models.engine import binary_format
+from models.engine.file_storage import FileStorage
+
+
+def timed(function, *args):
+    """Returns the result of function(*args) and the seconds it took"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def time_storage(path, binary):
+    """Returns the seconds taken by a reload() then a full save()"""
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    storage = FileStorage(binary=binary)
+    reload_time = timed(storage.reload)[1]
+    # Every object has to be written again
+    FileStorage._FileStorage__cache = {}
+    FileStorage._FileStorage__dirty = set(storage.all())
+    save_time = timed(storage.save)[1]
+    FileStorage._FileStorage__objects = {}
+    return reload_time, save_time
+
+
+def main(count):
+    """Runs the benchmark on count objects and prints the results"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "file.json")
+        binary_path = os.path.join(tmp_dir, "file.bin")
+        generate(json_path, count)
+        binary_format.convert("binary", json_path, binary_path)
+
+        with open(json_path, "rb") as f:
+            json_data = f.read()
+        with open(binary_path, "rb") as f:
+            binary_data = f.read()
+
+        obj_dict, json_load = timed(json.loads, json_data)
+        binary_load = timed(binary_format.loads, binary_data)[1]
+        json_dump = timed(json.dumps, obj_dict)[1]
+        binary_dump = timed(binary_format.dumps, obj_dict)[1]
+
+        for name, path, data, load, dump in (
+                ("json", json_path, json_data, json_load, json_dump),
+                ("binary", binary_path, binary_data, binary_load,
+                 binary_dump)):
+            reload_time, save_time = time_storage(path, name == "binary")
+            results[name] = {
+                "bytes": len(data),
+                "decode_seconds": round(load, 3),
+                "encode_seconds": round(dump, 3),
+                "reload_seconds": round(reload_time, 3),
+                "save_seconds": round(save_time, 3)
+            }
+
+    print(json.dumps({
+        "benchmark": "format",
+        "objects": count,
+        "results": results,
+        "size_ratio": round(results["binary"]["bytes"] /
+                            results["json"]["bytes"], 3)
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+"""Measures the memory used per model instance
+
+Usage: python3 -m benchmarks.bench_memory [count]
+
+Creates count instances of every model class from parsed JSON, as
+reload() does, in a fresh process with and without HBNB_COMPACT_MODELS
+and prints as JSON the bytes kept per instance of each class, its
+strings and timestamps included. Foreign keys point to count / 10
+parents.
+"""
+import json
+import os
+import subprocess
+import sys
+
+SESSION = """
+import gc, json, random, sys, tracemalloc, uuid
+from datetime import datetime
+from models.amenity import Amenity
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+count = int(sys.argv[1])
+rng = random.Random(0)
+parents = [str(uuid.UUID(int=rng.getrandbits(128), version=4))
+           for _ in range(max(count // 10, 1))]
+fields = {
+    Amenity: {"name": "Wifi"},
+    City: {"state_id": None, "name": "San Francisco"},
+    Place: {"city_id": None, "user_id": None, "name": "Loft",
+            "number_rooms": 3, "price_by_night": 120,
+            "latitude": 37.77, "longitude": -122.41},
+    Review: {"place_id": None, "user_id": None, "text": "Great"},
+    State: {"name": "California"},
+    User: {"email": "a@b.c", "password": "pwd", "first_name": "A"}
+}
+now = datetime.now().isoformat()
+results = {}
+for cls, values in fields.items():
+    dicts = []
+    for _ in range(count):
+        value = dict(values, id=str(uuid.uuid4()), created_at=now,
+                     updated_at=now, __class__=cls.__name__)
+        for key in value:
+            if key.endswith("_id"):
+                value[key] = rng.choice(parents)
+        dicts.append(value)
+    text = json.dumps(dicts)
+
+    tracemalloc.start()
+    # Every object gets its own strings, as when reloaded
+    objs = [cls(**value) for value in json.loads(text)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results[cls.__name__] = round(size / count)
+    del objs
+print(json.dumps(results))
+"""
+
+
+def main(count):
+    """Runs the benchmark on count instances per class and prints the
+    results"""
+    results = {}
+    for mode, compact in (("dict", ""), ("compact", "1")):
+        env = dict(os.environ, HBNB_COMPACT_MODELS=compact)
+        output = subprocess.run(
+                [sys.executable, "-c", SESSION, str(count)], env=env,
+                check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output)
+
+    print(json.dumps({
+        "benchmark": "memory",
+        "objects_per_class": count,
+        "bytes_per_object": results,
+        "saved_ratio": {
+            name: round(1 - results["compact"][name] / size, 3)
+            for name, size in results["dict"].items()
+        }
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
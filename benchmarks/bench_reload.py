@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""Measures FileStorage.reload() throughput on a generated store
+
+Usage: python3 -m benchmarks.bench_reload [count]
+
+Reloads the same file twice, once parsing timestamps with strptime as
+BaseModel used to and once with the current datetime.fromisoformat
+path, and prints the objects per second of both as JSON.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import models.base_model
+from benchmarks.dataset import generate
+from models.engine.file_storage import FileStorage
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+class StrptimeDatetime(datetime):
+    """datetime whose fromisoformat goes through strptime"""
+
+    @classmethod
+    def fromisoformat(cls, date_string):
+        """Parses date_string the way BaseModel did before"""
+        return datetime.strptime(date_string, TIME_FORMAT)
+
+
+def time_reload(storage):
+    """Returns the seconds taken by a reload into an empty storage"""
+    FileStorage._FileStorage__objects = {}
+    start = time.perf_counter()
+    storage.reload()
+    elapsed = time.perf_counter() - start
+    FileStorage._FileStorage__objects = {}
+    return elapsed
+
+
+def main(count):
+    """Runs the benchmark on count objects and prints the results"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "file.json")
+        generate(path, count)
+        FileStorage._FileStorage__file_path = path
+        storage = FileStorage()
+
+        models.base_model.datetime = StrptimeDatetime
+        try:
+            before = time_reload(storage)
+        finally:
+            models.base_model.datetime = datetime
+        after = time_reload(storage)
+
+    print(json.dumps({
+        "benchmark": "reload",
+        "objects": count,
+        "strptime_objects_per_second": round(count / before),
+        "fromisoformat_objects_per_second": round(count / after),
+        "speedup": round(before / after, 2)
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""Measures FileStorage.save() latency at each durability level
+
+Usage: python3 -m benchmarks.bench_save [count] [rounds]
+
+Loads a generated store of count objects, then rounds times changes
+one object and saves, with and without the journal, and prints the
+median and worst latency in milliseconds of every combination as JSON.
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.dataset import generate
+from models.engine.file_storage import FileStorage
+
+
+def time_saves(storage, rounds):
+    """Returns the latencies in milliseconds of rounds one-object saves"""
+    objs = list(storage.all().values())
+    latencies = []
+    for i in range(rounds):
+        objs[i % len(objs)].name = f"round {i}"
+        start = time.perf_counter()
+        storage.save()
+        latencies.append((time.perf_counter() - start) * 1000)
+    storage.close()
+    return latencies
+
+
+def main(count, rounds):
+    """Runs the benchmark and prints the results"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "file.json")
+        generate(path, count)
+        FileStorage._FileStorage__file_path = path
+        FileStorage().reload()
+        # Warm the serialization cache
+        FileStorage().save()
+
+        for journal in (False, True):
+            for durability in ("none", "file", "dir"):
+                storage = FileStorage(journal=journal, durability=durability)
+                latencies = time_saves(storage, rounds)
+                results.append({
+                    "journal": journal,
+                    "durability": durability,
+                    "median_ms": round(statistics.median(latencies), 3),
+                    "max_ms": round(max(latencies), 3)
+                })
+        FileStorage._FileStorage__objects = {}
+
+    print(json.dumps({
+        "benchmark": "save",
+        "objects": count,
+        "rounds": rounds,
+        "results": results
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""Measures the cost of a session showing a single object
+
+Usage: python3 -m benchmarks.bench_startup [count]
+
+Writes a generated store of count objects in the binary format, then
+in a fresh process for each mode reloads it and gets one object, and
+prints as JSON the milliseconds taken and the peak RSS of the process.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.dataset import generate
+from models.engine import binary_format
+
+# ru_maxrss survives exec on Linux, the peak of the new image is VmHWM
+SESSION = """
+import json, resource, sys, time
+from models.engine.file_storage import FileStorage
+FileStorage._FileStorage__file_path = sys.argv[1]
+start = time.perf_counter()
+storage = FileStorage(read_only=sys.argv[2] == "1")
+storage.reload()
+obj = storage.get(*sys.argv[3].split("."))
+elapsed = time.perf_counter() - start
+assert obj is not None
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                peak = int(line.split()[1])
+except OSError:
+    pass
+print(json.dumps({
+    "milliseconds": round(elapsed * 1000, 3),
+    "max_rss_kb": peak
+}))
+"""
+
+
+def main(count):
+    """Runs the benchmark on count objects and prints the results"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "file.json")
+        path = os.path.join(tmp_dir, "file.bin")
+        generate(json_path, count)
+        binary_format.convert("binary", json_path, path)
+        with open(json_path, "r") as f:
+            key = list(json.load(f))[count // 2]
+        os.remove(json_path)
+
+        for mode, read_only in (("reload", "0"), ("read_only", "1")):
+            output = subprocess.run(
+                    [sys.executable, "-c", SESSION, path, read_only, key],
+                    check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output)
+
+    print(json.dumps({
+        "benchmark": "startup",
+        "objects": count,
+        "results": results
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
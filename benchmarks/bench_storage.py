@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+"""Measures the storage and the console on a generated store
+
+Usage: python3 -m benchmarks.bench_storage [count or scale] [rounds]
+           [--seed=N] [--output=PATH]
+
+Generates a store of count objects (or 10k, 100k, 1m) with
+benchmarks.dataset, then times FileStorage.reload(), save() and new()
+and the console commands show, all, update and destroy run through
+HBNBCommand.onecmd. Prints the results as JSON, also written to PATH
+with --output, along with the commit and Python version measured so
+that runs can be compared with benchmarks.compare.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import models
+from benchmarks.dataset import generate, size
+from console import HBNBCommand
+from models.engine.file_storage import FileStorage
+from models.place import Place
+
+
+def summary(latencies):
+    """Returns the statistics of latencies given in seconds"""
+    return {
+        "rounds": len(latencies),
+        "median_ms": round(statistics.median(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3)
+    }
+
+
+def timed(function, *args):
+    """Returns the seconds taken by function(*args)"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def run(commands):
+    """Returns the seconds taken by every console command, its output
+    thrown away"""
+    console = HBNBCommand()
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        for command in commands:
+            latencies.append(timed(console.onecmd, command))
+            output.seek(0)
+            output.truncate()
+    return latencies
+
+
+def commit():
+    """Returns the git commit of the working tree, None if unknown"""
+    try:
+        return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], check=True,
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__))
+                ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(path, rounds, seed):
+    """Runs every measure on the store at path
+
+    Args:
+        path (str): Path of the generated store
+        rounds (int): Number of times every operation is timed, all
+            being timed at most 3 times
+        seed (int): Seed choosing the objects used
+    """
+    rng = random.Random(seed)
+    storage = models.storage
+    FileStorage._FileStorage__file_path = path
+    FileStorage._FileStorage__objects = {}
+    results = {}
+
+    elapsed = timed(storage.reload)
+    count = len(storage.all())
+    results["reload"] = {
+        "seconds": round(elapsed, 3),
+        "objects_per_second": round(count / elapsed)
+    }
+
+    # The first save after a reload serializes every object
+    objs = list(storage.all().values())
+    objs[0].name = "benchmark"
+    results["save_first"] = {"seconds": round(timed(storage.save), 3)}
+    latencies = []
+    for obj in rng.sample(objs, min(rounds, len(objs))):
+        obj.name = "benchmark"
+        latencies.append(timed(storage.save))
+    results["save"] = summary(latencies)
+
+    created = []
+    start = time.perf_counter()
+    for _ in range(max(rounds, 1000)):
+        created.append(Place())
+    elapsed = time.perf_counter() - start
+    results["new"] = {
+        "objects": len(created),
+        "seconds": round(elapsed, 3),
+        "microseconds_per_object": round(elapsed * 10 ** 6 / len(created),
+                                         3)
+    }
+    for obj in created:
+        storage.delete(obj)
+    storage.save()
+
+    places = [key.split(".", 1)[1] for key in storage.all(Place)]
+    reviews = [key.split(".", 1)[1] for key in storage.all("Review")]
+    sample = rng.sample(places, min(rounds, len(places)))
+    results["show"] = summary(run(f"show Place {obj_id}"
+                                  for obj_id in sample))
+    results["all"] = summary(run(["all Place"] * min(rounds, 3)))
+    results["update"] = summary(run(f'update Place {obj_id} name "updated"'
+                                    for obj_id in sample))
+    results["destroy"] = summary(run(
+            f"destroy Review {obj_id}"
+            for obj_id in rng.sample(reviews, min(rounds, len(reviews)))))
+
+    storage.close()
+    FileStorage._FileStorage__objects = {}
+    return results
+
+
+def main(count, rounds=20, seed=0, output=None):
+    """Runs the benchmark and prints the results
+
+    Args:
+        count (int): Number of objects of the store
+        rounds (int): Number of times every operation is timed
+        seed (int): Seed of the store and of the objects used
+        output (str): Path of a file to write the results to as well
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "file.json")
+        start = time.perf_counter()
+        classes = generate(path, count, seed)
+        generated = time.perf_counter() - start
+        results = measure(path, rounds, seed)
+
+    report = json.dumps({
+        "benchmark": "storage",
+        "commit": commit(),
+        "python": platform.python_version(),
+        "objects": count,
+        "classes": classes,
+        "seed": seed,
+        "generate_seconds": round(generated, 3),
+        "results": results
+    }, indent=4)
+    print(report)
+    if output is not None:
+        with open(output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:]
+                   if arg.startswith("--") and "=" in arg)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    main(size(args[0]) if args else 10000,
+         int(args[1]) if len(args) > 1 else 20,
+         int(options.get("seed", 0)), options.get("output"))
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""Compares two results of a benchmark
+
+Usage: python3 -m benchmarks.compare <before.json> <after.json>
+           [threshold]
+
+Prints as JSON the ratio after / before of every timing found in both
+results (the values named seconds, *_seconds and *_ms) and exits with
+status 1 if one of them grew by more than threshold, 0.1 by default,
+and by more than a millisecond, below which timings are mostly noise.
+"""
+import json
+import sys
+
+
+def timings(results, prefix=""):
+    """Returns {dotted path: milliseconds} of the timings of results"""
+    found = {}
+    for name, value in results.items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict):
+            found.update(timings(value, path + "."))
+        elif (isinstance(value, (int, float)) and
+                (name == "seconds" or name.endswith(("_seconds", "_ms")))):
+            found[path] = value if name.endswith("_ms") else value * 1000
+    return found
+
+
+def compare(before, after, threshold=0.1):
+    """Returns the ratios after / before of the timings of two results
+    and the paths of those grown by more than threshold"""
+    before = timings(before)
+    after = timings(after)
+    ratios = {path: round(after[path] / value, 3)
+              for path, value in before.items()
+              if path in after and value > 0}
+    regressions = [path for path, ratio in ratios.items()
+                   if ratio > 1 + threshold and
+                   after[path] - before[path] > 1]
+    return ratios, regressions
+
+
+def main(argv):
+    """Compares the results files named in argv, returns the status"""
+    if len(argv) < 2:
+        print(__doc__.split("\n\n")[1], file=sys.stderr)
+        return 2
+    results = []
+    for path in argv[:2]:
+        with open(path, "r") as f:
+            results.append(json.load(f))
+    threshold = float(argv[2]) if len(argv) > 2 else 0.1
+    ratios, regressions = compare(*results, threshold)
+    print(json.dumps({
+        "before": results[0].get("commit"),
+        "after": results[1].get("commit"),
+        "ratios": ratios,
+        "regressions": regressions
+    }, indent=4))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
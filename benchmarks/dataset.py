@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+"""Generates seeded stores of related objects for the benchmarks
+
+Usage: python3 -m benchmarks.dataset <count or scale> <path> [seed]
+
+The objects form the graph of a real store: States hold Cities, whose
+Places belong to Users and list Amenities, and Reviews are written by
+Users about Places. Popular cities and places get more of the children,
+Places lie around their City and their City around its State. The same
+count and seed always give the same file.
+"""
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+SCALES = {"10k": 10000, "100k": 100000, "1m": 1000000}
+# Share of the objects of each class, Reviews take the rest
+SHARES = {"State": 0.001, "City": 0.01, "Amenity": 0.001, "User": 0.1,
+          "Place": 0.2}
+WORDS = ("sunny quiet cosy spacious modern charming bright clean central "
+         "loft house studio cabin villa apartment garden terrace pool view "
+         "beach lake mountain downtown park river historic family friendly "
+         "great host noisy street small comfortable walk station market "
+         "wifi kitchen parking breakfast").split()
+AMENITIES = ("Wifi", "Kitchen", "Parking", "Pool", "Heating", "Washer",
+             "Air conditioning", "TV", "Gym", "Breakfast")
+
+
+def size(count):
+    """Returns the number of objects of a count or of a scale name
+
+    Raises:
+        ValueError: If it is neither
+    """
+    if isinstance(count, str) and count.lower() in SCALES:
+        return SCALES[count.lower()]
+    count = int(count)
+    if count < 1:
+        raise ValueError("the count must be positive")
+    return count
+
+
+def counts(count):
+    """Returns the number of objects of every class in a store of count
+    objects, at least one of each"""
+    numbers = {name: max(1, int(count * share))
+               for name, share in SHARES.items()}
+    numbers["Review"] = max(1, count - sum(numbers.values()))
+    return numbers
+
+
+class Generator:
+    """Seeded source of the objects of a store"""
+
+    def __init__(self, seed=0):
+        """Initialize the generator
+
+        Args:
+            seed (int): Seed of the random generator
+        """
+        self.rng = random.Random(seed)
+        self.start = datetime(2020, 1, 1)
+
+    def id(self):
+        """Returns a random UUID4 string"""
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def pick(self, items):
+        """Returns one of items, those at the start more often"""
+        return items[int(len(items) * self.rng.random() ** 2)]
+
+    def text(self, words):
+        """Returns a sentence of random words"""
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def value(self, class_name, **attrs):
+        """Returns the dictionary of a new object"""
+        created = self.start + timedelta(
+                seconds=self.rng.randrange(10 ** 8),
+                microseconds=self.rng.randrange(1, 10 ** 6))
+        value = {"id": self.id(), "created_at": created.isoformat(),
+                 "updated_at": created.isoformat()}
+        value.update(attrs)
+        value["__class__"] = class_name
+        return value
+
+    def objects(self, count):
+        """Yields the (key, dictionary) pairs of a store of count objects,
+        parents first"""
+        numbers = counts(count)
+        rng = self.rng
+        ids = {}
+
+        def emit(class_name, value):
+            ids.setdefault(class_name, []).append(value["id"])
+            return f"{class_name}.{value['id']}", value
+
+        states = []
+        for i in range(numbers["State"]):
+            value = self.value("State", name=f"State {i}")
+            states.append((value["id"], rng.uniform(25, 49),
+                           rng.uniform(-124, -67)))
+            yield emit("State", value)
+        cities = []
+        for i in range(numbers["City"]):
+            state_id, latitude, longitude = self.pick(states)
+            value = self.value("City", state_id=state_id,
+                               name=f"City {i}")
+            cities.append((value["id"], latitude + rng.gauss(0, 1),
+                           longitude + rng.gauss(0, 1)))
+            yield emit("City", value)
+        for i in range(numbers["Amenity"]):
+            name = AMENITIES[i % len(AMENITIES)]
+            if i >= len(AMENITIES):
+                name = f"{name} {i // len(AMENITIES)}"
+            yield emit("Amenity", self.value("Amenity", name=name))
+        for i in range(numbers["User"]):
+            yield emit("User", self.value(
+                    "User", email=f"user{i}@example.com",
+                    password=f"pwd{i}", first_name=f"First {i}",
+                    last_name=f"Last {i}"))
+
+        amenities = ids["Amenity"]
+        users = ids["User"]
+        for i in range(numbers["Place"]):
+            city_id, latitude, longitude = self.pick(cities)
+            rooms = rng.randint(1, 6)
+            yield emit("Place", self.value(
+                    "Place", city_id=city_id, user_id=rng.choice(users),
+                    name=self.text(2), description=self.text(12),
+                    number_rooms=rooms,
+                    number_bathrooms=rng.randint(1, rooms),
+                    max_guest=rooms * rng.randint(1, 3),
+                    price_by_night=rng.randint(20, 500),
+                    latitude=round(latitude + rng.gauss(0, 0.1), 6),
+                    longitude=round(longitude + rng.gauss(0, 0.1), 6),
+                    amenity_ids=rng.sample(amenities,
+                                           min(len(amenities),
+                                               rng.randint(0, 5)))))
+
+        places = ids["Place"]
+        for i in range(numbers["Review"]):
+            yield emit("Review", self.value(
+                    "Review", place_id=self.pick(places),
+                    user_id=rng.choice(users), text=self.text(20)))
+
+
+def generate(path, count, seed=0):
+    """Writes a store of count objects to a JSON file
+
+    Args:
+        path (str): Path of the file to write
+        count (int): Number of objects
+        seed (int): Seed of the random generator
+
+    Returns:
+        dict: Number of objects of every class
+    """
+    with open(path, "w") as f:
+        f.write("{")
+        for i, (key, value) in enumerate(Generator(seed).objects(count)):
+            if i:
+                f.write(", ")
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}")
+        f.write("}")
+    return counts(count)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__.split("\n\n")[1])
+    print(json.dumps(generate(sys.argv[2], size(sys.argv[1]),
+                              int(sys.argv[3]) if len(sys.argv) > 3
+                              else 0)))
@@ -1,16 +1,31 @@
 #!/usr/bin/python3
 """This module serves as the entry point of the Abnb programme"""
+import ast
 import cmd
+import io
+import json
+import re
 import shlex
+import sys
+import time
+from datetime import datetime
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
+from models.engine import binary_format, stats
+from models.engine.columns import AGGREGATES
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
 from models import storage
 
+split = stats.instrumented("console.split")(shlex.split)
+# <class name>.<command>(<arguments>)
+DOT_CALL = re.compile(r"^(\w+)\.(\w+)\((.*)\)$")
+# <class name> <id> <dictionary>
+DICT_ARGS = re.compile(r"^\s*(\S+\s+\S+)\s+(\{.*\})\s*$", re.DOTALL)
+
 
 class HBNBCommand(cmd.Cmd):
     """HBNBCommand command interpreter"""
@@ -26,7 +41,57 @@ class HBNBCommand(cmd.Cmd):
             "State": State,
             "User": User
     }
+    __dot_commands = ("all", "count", "show", "destroy", "update")
+
+    def onecmd(self, line):
+        """Runs a command, recording its latency as console.<command>,
+        and refuses the changes if the storage is read only"""
+        command = self.parseline(line)[0]
+        if not command:
+            return super().onecmd(line)
+        if not hasattr(self, "do_" + command):
+            match = DOT_CALL.match(line.strip())
+            if match is not None and match.group(2) in self.__dot_commands:
+                command = match.group(2)
+            else:
+                command = "default"
+        start = time.perf_counter()
+        try:
+            return super().onecmd(line)
+        except io.UnsupportedOperation:
+            print("** storage is read only **")
+        finally:
+            stats.record(f"console.{command}", time.perf_counter() - start)
+
+    def default(self, line):
+        """
+        Runs <class name>.<command>(<arguments>) as <command> <class name>
+        <arguments>, for the commands all, count, show, destroy and update
+        Example: Place.count()
+        Example: Place.show("1234-1234-1234")
+        Example: Place.update("1234-1234-1234", {"name": "Loft"})
+        """
+        match = DOT_CALL.match(line.strip())
+        if match is None or match.group(2) not in self.__dot_commands:
+            return super().default(line)
+        class_name, command, arguments = match.groups()
+
+        # A dictionary is the last argument, passed on as written
+        brace = arguments.find("{")
+        dictionary = arguments[brace:] if brace >= 0 else ""
+        if brace >= 0:
+            arguments = arguments[:brace]
+        lexer = shlex.shlex(arguments, posix=True)
+        lexer.whitespace += ","
+        lexer.whitespace_split = True
+        try:
+            arguments = [shlex.quote(argument) for argument in lexer]
+        except ValueError:
+            return super().default(line)
+        return getattr(self, "do_" + command)(
+                " ".join([class_name] + arguments + [dictionary]).strip())
 
+    @stats.instrumented("console.validate_class_and_id")
     def validate_class_and_id(self, args):
         """
         Validates class name and id for various commands
@@ -35,9 +100,9 @@ class HBNBCommand(cmd.Cmd):
             args (list): List of argumenenst from the command
 
         Returns:
-            tuple: (is_valid, error_message)
+            tuple: (is_valid, result)
             - is_valid: Bolean indicating validation is passed
-            - error_message: String Erorr (None if no erro)
+            - result: The instance, or the error message if not valid
         """
 
         # Checks if class name is provided
@@ -52,21 +117,24 @@ class HBNBCommand(cmd.Cmd):
         if len(args) < 2:
             return False, "** instance id missing **"
 
-        # Construct the key and get all objects
-        key = "{}.{}".format(args[0], args[1])
-        all_objs = storage.all()
+        # Look the instance up without loading every object
+        instance = storage.get(args[0], args[1])
 
-        if key not in all_objs:
+        if instance is None:
             return False, "** no instance found **"
 
-        return True, key
+        return True, instance
 
     def do_update(self, arg):
         """
-        Updates an instance by adding or updating an attribute
+        Updates an instance by adding or updating an attribute, or
+        several at once from a dictionary, saving it once
         Usage: update <class name> <id> <attribute name> '<attribute value>'
+               update <class name> <id> <dictionary>
+        Example: update Place 1234-1234 {"name": "Loft", "max_guest": 4}
         """
-        args = shlex.split(arg)
+        match = DICT_ARGS.match(arg)
+        args = split(match.group(1)) if match else split(arg)
 
         # Validate class name and id
         is_valid, result = self.validate_class_and_id(args)
@@ -75,60 +143,287 @@ class HBNBCommand(cmd.Cmd):
             print(result)
             return
 
-        # Check for missing attribute name
-        if len(args) < 3:
-            print("** attribute name missing **")
-            return
+        if match is not None:
+            attributes = self.__parse_dict(match.group(2))
+            if attributes is None:
+                print("** invalid dictionary **")
+                return
+        else:
+            # Check for missing attribute name
+            if len(args) < 3:
+                print("** attribute name missing **")
+                return
 
-        # Check for missing attribute value
-        if len(args) < 4:
-            print("** value missing **")
-            return
+            # Check for missing attribute value
+            if len(args) < 4:
+                print("** value missing **")
+                return
 
-        all_objs = storage.all()
-        key = result
-        instance = all_objs[key]
-        protected_attr = ["id", "created_at", "updated_at"]
+            attributes = {args[2]: args[3].strip('"')}
 
-        attr_name, attr_value = args[2], args[3].strip('"')
+        instance = result
+        protected_attr = ["id", "created_at", "updated_at"]
 
-        if attr_name in protected_attr:
-            return
+        for attr_name, attr_value in attributes.items():
+            if attr_name in protected_attr:
+                continue
+            setattr(instance, attr_name, self.__cast(attr_value))
+        instance.save()
 
+    @staticmethod
+    def __cast(value):
+        """Returns a string value as an int or a float if it is written
+        as one, any other value as is"""
+        if not isinstance(value, str):
+            return value
+        # Negative numbers too, e.g. longitudes west of Greenwich
+        digits = value[1:] if value[:1] == "-" else value
         try:
-            if attr_value.isdigit():
-                attr_value = int(attr_value)
-            elif (attr_value.replace('.', '').isdigit() and
-                    attr_value.count('.') == 1):
-                attr_value = float(attr_value)
+            if digits.isdigit():
+                return int(value)
+            if digits.replace('.', '').isdigit() and digits.count('.') == 1:
+                return float(value)
         except ValueError:
             pass
+        return value
 
-        setattr(instance, attr_name, attr_value)
-        instance.save()
+    @staticmethod
+    def __parse_dict(text):
+        """Returns the dictionary written in JSON or as a Python literal,
+        None if text is not one with string keys"""
+        try:
+            value = json.loads(text)
+        except ValueError:
+            try:
+                value = ast.literal_eval(text)
+            except (ValueError, SyntaxError):
+                return None
+        if not isinstance(value, dict) or not all(
+                isinstance(key, str) for key in value):
+            return None
+        return value
 
     def do_all(self, arg):
         """
-        Prints string representation of all instances
-        Usage: all [ClassName]
+        Prints string representation of all instances, a page of them
+        with limit, offset or after (the id of the last instance of the
+        previous page, <class name>.<id> without a class name), sorted by
+        an attribute with order
+        Usage: all [ClassName] [order <attribute>] [limit <number>]
+               [offset <number>] [after <id>]
+        Example: all Review order created_at limit 20 after 1234-1234
+        """
+        args = split(arg)
+        class_name = None
+        if args and args[0] not in ("order", "limit", "offset", "after"):
+            class_name = args.pop(0)
+            if class_name not in self.__classes:
+                print("** class doesn't exist **")
+                return
+
+        options = {}
+        while len(args) >= 2 and args[0] in ("order", "limit", "offset",
+                                             "after"):
+            options[args[0]] = args[1]
+            args = args[2:]
+        if args:
+            print("** invalid query **")
+            return
+        for name in ("limit", "offset"):
+            if name in options:
+                if not options[name].isdigit():
+                    print("** invalid number **")
+                    return
+                options[name] = int(options[name])
+        if "after" in options:
+            after = options["after"]
+            if class_name is not None:
+                after = f"{class_name}.{after}"
+            if "." not in after or storage.get(
+                    *after.split(".", 1)) is None:
+                print("** no instance found **")
+                return
+            options["after"] = after
+
+        # Printed as the list of the strings, one instance at a time
+        objs = storage.stream(class_name, **options)
+        print("[", end="")
+        for i, (key, obj) in enumerate(objs):
+            print(", " if i else "", repr(str(obj)), sep="", end="")
+        print("]")
+
+    def do_count(self, arg):
+        """
+        Prints the number of instances, of a class only if given
+        Usage: count [<class name>]
         """
-        args = shlex.split(arg)
-        all_objs = storage.all()
-        obj_str_list = []
+        if arg and arg not in self.__classes:
+            print("** class doesn't exist **")
+            return
+        print(storage.count(arg or None))
+
+    def do_lookup(self, arg):
+        """
+        Prints all instances of a class whose attribute equals a value
+        Usage: lookup <class name> <attribute name> <value>
+        Example: lookup City state_id 1234-1234-1234
+        """
+        args = split(arg)
 
         if len(args) == 0:
-            for obj in all_objs.values():
-                obj_str_list.append(str(obj))
-        else:
-            if arg not in self.__classes:
-                print("** class doesn't exist **")
+            print("** class name missing **")
+            return
+        if args[0] not in self.__classes:
+            print("** class doesn't exist **")
+            return
+        if len(args) < 2:
+            print("** attribute name missing **")
+            return
+        if len(args) < 3:
+            print("** value missing **")
+            return
+
+        objs = storage.lookup(args[0], args[1], args[2])
+        print([str(obj) for obj in objs.values()])
+
+    def do_query(self, arg):
+        """
+        Prints the instances of a class matching conditions, or an
+        aggregate (count, sum, avg, min, max) over them
+        Usage: query <class name> [<aggregate> [<attribute>]]
+               [by <attribute>] [where <attribute><operator><value> ...]
+        Operators: = != < <= > >=
+        Example: query Place avg price_by_night by city_id
+        Example: query Place count where max_guest>=4 latitude>=37.7
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** class name missing **")
+            return
+        if args[0] not in self.__classes:
+            print("** class doesn't exist **")
+            return
+
+        class_name, args = args[0], args[1:]
+        function = attr = group_by = None
+        if args and args[0] in AGGREGATES:
+            function = args.pop(0)
+            if function != "count":
+                if not args or args[0] in ("by", "where"):
+                    print("** attribute name missing **")
+                    return
+                attr = args.pop(0)
+        if args and args[0] == "by":
+            if len(args) < 2:
+                print("** attribute name missing **")
                 return
+            group_by = args[1]
+            args = args[2:]
+
+        conditions = []
+        if args and args[0] == "where":
+            args = args[1:]
+            for condition in args:
+                match = re.fullmatch(r"(\w+)(<=|>=|!=|=|<|>)(.*)", condition)
+                if match is None:
+                    break
+                name, op, value = match.groups()
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+                conditions.append((name, op, value))
+            else:
+                args = []
+        if args:
+            print("** invalid query **")
+            return
 
-            for key, obj in all_objs.items():
-                if key.startswith(f"{arg}."):
-                    obj_str_list.append(str(obj))
+        result = storage.query(class_name, conditions, function, attr,
+                               group_by)
+        if function is None:
+            print([str(obj) for obj in result.values()])
+        else:
+            print(result)
 
-        print(obj_str_list)
+    def __spatial_args(self, arg):
+        """
+        Parses <class name> <latitude> <longitude> <number>
+
+        Returns:
+            tuple: (class name, latitude, longitude, number), None after
+            printing the error if the arguments are not valid
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** class name missing **")
+            return None
+        if args[0] not in self.__classes:
+            print("** class doesn't exist **")
+            return None
+        if len(args) < 4:
+            print("** coordinates missing **")
+            return None
+        try:
+            latitude, longitude, number = (float(value)
+                                           for value in args[1:4])
+        except ValueError:
+            print("** invalid number **")
+            return None
+        return args[0], latitude, longitude, number
+
+    def do_near(self, arg):
+        """
+        Prints the instances of a class within a distance of a point,
+        nearest first
+        Usage: near <class name> <latitude> <longitude> <km>
+        Example: near Place 37.77 -122.42 5
+        """
+        args = self.__spatial_args(arg)
+        if args is None:
+            return
+        objs = storage.within_radius(*args)
+        print([str(obj) for obj in objs.values()])
+
+    def do_nearest(self, arg):
+        """
+        Prints the instances of a class nearest to a point
+        Usage: nearest <class name> <latitude> <longitude> <count>
+        Example: nearest Place 37.77 -122.42 10
+        """
+        args = self.__spatial_args(arg)
+        if args is None:
+            return
+        class_name, latitude, longitude, count = args
+        if count < 1 or not count.is_integer():
+            print("** invalid number **")
+            return
+        objs = storage.nearest(class_name, latitude, longitude, int(count))
+        print([str(obj) for obj in objs.values()])
+
+    def do_search(self, arg):
+        """
+        Prints the instances of a class using words of a text, the most
+        relevant first
+        Usage: search <class name> <words>
+        Example: search Review quiet clean
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** class name missing **")
+            return
+        if args[0] not in self.__classes:
+            print("** class doesn't exist **")
+            return
+        if len(args) < 2:
+            print("** words missing **")
+            return
+
+        objs = storage.search(args[0], " ".join(args[1:]))
+        print([str(obj) for obj in objs.values()])
 
     def do_destroy(self, arg):
         """
@@ -136,20 +431,19 @@ class HBNBCommand(cmd.Cmd):
 
         Usage: destroy BaseModel 1234-1234-1234
         """
-        args = shlex.split(arg)
+        args = split(arg)
         is_valid, result = self.validate_class_and_id(args)
 
         if not is_valid:
             print(result)
             return
 
-        all_objs = storage.all()
-        del all_objs[result]
+        storage.delete(result)
         storage.save()
 
     def do_show(self, arg):
         """Prints string representation of an instance"""
-        args = shlex.split(arg)
+        args = split(arg)
 
         is_valid, result = self.validate_class_and_id(args)
 
@@ -157,8 +451,7 @@ class HBNBCommand(cmd.Cmd):
             print(result)
             return
 
-        all_objs = storage.all()
-        print(all_objs[result])
+        print(result)
 
     def do_create(self, arg):
         """Creates a new instance of BaseModel"""
@@ -175,6 +468,143 @@ class HBNBCommand(cmd.Cmd):
         new_model.save()
         print(new_model.id)
 
+    def do_export(self, arg):
+        """
+        Writes all instances of a class to a file, one JSON per line
+        Usage: export <class name> <file name>
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** class name missing **")
+            return
+        if args[0] not in self.__classes:
+            print("** class doesn't exist **")
+            return
+        if len(args) < 2:
+            print("** file name missing **")
+            return
+
+        with open(args[1], "w") as f:
+            for _, obj in storage.stream(args[0]):
+                f.write(json.dumps(obj.to_dict()) + "\n")
+
+    def do_import(self, arg):
+        """
+        Creates or replaces instances from a file, one JSON per line as
+        written by export, and saves them all at once. A line without
+        an id creates a new instance with the given attributes, missing
+        time stamps are set to the time of the import.
+        Usage: import <file name>
+        Prints the number of instances imported
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** file name missing **")
+            return
+        try:
+            f = open(args[0], "r")
+        except OSError:
+            print("** file doesn't exist **")
+            return
+
+        count = 0
+        with f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    cls = self.__classes[record["__class__"]]
+                    if "id" in record:
+                        if not isinstance(record["id"], str):
+                            raise ValueError("the id must be a string")
+                        record.setdefault("created_at",
+                                          datetime.now().isoformat())
+                        record.setdefault("updated_at",
+                                          record["created_at"])
+                        storage.new(cls(**record))
+                    else:
+                        # Checked before the instance is created
+                        for name in ("created_at", "updated_at"):
+                            if name in record:
+                                record[name] = datetime.fromisoformat(
+                                        record[name])
+                        obj = cls()
+                        for name, value in record.items():
+                            if name != "__class__":
+                                setattr(obj, name, value)
+                except io.UnsupportedOperation:
+                    raise
+                except (ValueError, KeyError, TypeError):
+                    print(f"** invalid record on line {line_number} **")
+                    continue
+                count += 1
+
+        storage.save()
+        print(count)
+
+    def do_convert(self, arg):
+        """
+        Converts a JSON or binary storage file to the other format
+        Usage: convert json|binary <source file> <destination file>
+        """
+        args = split(arg)
+
+        if len(args) == 0:
+            print("** format missing **")
+            return
+        if args[0] not in ("json", "binary"):
+            print("** unknown format **")
+            return
+        if len(args) < 3:
+            print("** file name missing **")
+            return
+        try:
+            binary_format.convert(*args[:3])
+        except FileNotFoundError:
+            print("** file doesn't exist **")
+        except ValueError:
+            print("** invalid file **")
+
+    def do_begin(self, arg):
+        """
+        Buffers the changes of the next commands until commit
+        Usage: begin [number of changes between two writes]
+        """
+        flush_every = None
+        if arg:
+            if not arg.isdigit() or int(arg) == 0:
+                print("** invalid number **")
+                return
+            flush_every = int(arg)
+        storage.begin(flush_every)
+
+    def do_commit(self, arg):
+        """Writes the changes buffered since begin to storage"""
+        storage.commit()
+
+    def do_stats(self, arg):
+        """
+        Prints the number of runs, latencies and bytes written of the
+        storage and console operations since the start or the last reset
+        Usage: stats [reset]
+        """
+        if arg == "reset":
+            stats.reset()
+            return
+        report = stats.report()
+        if not report:
+            return
+        width = max(len(name) for name in report)
+        columns = list(next(iter(report.values())))
+        print(f"{'operation':<{width}}  " +
+              "  ".join(f"{column:>10}" for column in columns))
+        for name, figures in report.items():
+            print(f"{name:<{width}}  " +
+                  "  ".join(f"{figures[column]:>10}" for column in columns))
+
     def do_quit(self, arg):
         """Quit command to exit the programme"""
         return True
@@ -189,4 +619,22 @@ class HBNBCommand(cmd.Cmd):
 
 
 if __name__ == '__main__':
+    # --batch[=N]: write the storage once at exit (or every N changes)
+    # instead of after every command, e.g. to load a script of commands
+    batch = [arg for arg in sys.argv[1:] if arg.startswith("--batch")]
+    # --profile[=path]: write the cProfile statistics of the session to
+    # path (hbnb.prof by default), to read with pstats
+    profile = [arg for arg in sys.argv[1:] if arg.startswith("--profile")]
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if batch:
+        HBNBCommand().onecmd("begin " + batch[0][len("--batch="):])
     HBNBCommand().cmdloop()
+    if batch:
+        HBNBCommand().onecmd("commit")
+    storage.close()
+    if profile:
+        profiler.disable()
+        profiler.dump_stats(profile[0][len("--profile="):] or "hbnb.prof")
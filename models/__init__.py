@@ -1,10 +1,49 @@
 #!/usr/bin/python3
-""" Module contains instantiation of the FileStorage class"""
-from models.engine.file_storage import FileStorage
+""" Module contains instantiation of the storage class"""
+from os import getenv
 
 
 # Create a unique storage instance for the entire application
-storage = FileStorage()
+# HBNB_TYPE_STORAGE=db stores the objects in the SQLite database
+# HBNB_DB_PATH (hbnb.db by default), otherwise they go to file.json
+# HBNB_STORAGE_JOURNAL=1 appends changes to a journal instead of
+# rewriting the whole JSON file on every save
+# HBNB_STORAGE_LAZY=1 creates the reloaded objects on first access
+# HBNB_STORAGE_SHARDED=1 saves every class to its own file
+# HBNB_STORAGE_DURABILITY=file|dir fsyncs the saved files (and their
+# directory) before returning, default none
+# HBNB_STORAGE_FLUSH_INTERVAL=<seconds> and/or
+# HBNB_STORAGE_FLUSH_THRESHOLD=<saves> make save() return at once and
+# leave the writes to a background thread
+# HBNB_STORAGE_THREAD_SAFE=1 makes all() return a copy for callers
+# iterating it while other threads add objects
+# HBNB_STORAGE_SHARED=1 lets several processes use the same file
+# HBNB_STORAGE_BINARY=1 writes the file in the compact binary format
+# HBNB_STORAGE_READ_ONLY=1 maps a binary file and only decodes the
+# objects used, for sessions that do not change anything
+# HBNB_STATS=1 also records the latencies of BaseModel.__init__ and
+# to_dict, see models.engine.stats and the console stats command
+flush_interval = getenv("HBNB_STORAGE_FLUSH_INTERVAL")
+flush_threshold = getenv("HBNB_STORAGE_FLUSH_THRESHOLD")
+
+if getenv("HBNB_TYPE_STORAGE") == "db":
+    from models.engine.db_storage import DBStorage
+    storage = DBStorage(getenv("HBNB_DB_PATH", "hbnb.db"))
+else:
+    from models.engine.file_storage import FileStorage
+    storage = FileStorage(journal=bool(getenv("HBNB_STORAGE_JOURNAL")),
+                          lazy=bool(getenv("HBNB_STORAGE_LAZY")),
+                          sharded=bool(getenv("HBNB_STORAGE_SHARDED")),
+                          durability=getenv("HBNB_STORAGE_DURABILITY",
+                                            "none"),
+                          flush_interval=(float(flush_interval)
+                                          if flush_interval else None),
+                          flush_threshold=(int(flush_threshold)
+                                           if flush_threshold else None),
+                          thread_safe=bool(getenv("HBNB_STORAGE_THREAD_SAFE")),
+                          shared=bool(getenv("HBNB_STORAGE_SHARED")),
+                          binary=bool(getenv("HBNB_STORAGE_BINARY")),
+                          read_only=bool(getenv("HBNB_STORAGE_READ_ONLY")))
 
 # Reload existing data if any
 storage.reload()
@@ -1,27 +1,78 @@
 #!/usr/bin/python3
-"""This module contains the base Model"""
+"""This module contains the base Model
+
+With HBNB_COMPACT_MODELS=1 set before models is imported, the attributes
+declared on the model classes are stored in __slots__ rather than in the
+instance dictionary, which only holds the other attributes (set by the
+console update command for instance) and is only created for them. The
+foreign keys (city_id, ...) of reloaded objects are also interned.
+"""
+import copy
+import sys
 import uuid
 from datetime import datetime
+from os import getenv
 import models
+from models.engine import stats
+
+COMPACT = bool(getenv("HBNB_COMPACT_MODELS"))
+# Stands for an attribute the instance did not hold
+_MISSING = object()
+
+
+class ModelMeta(type):
+    """Metaclass of the models
+
+    Records the declared attributes of a class and their default values
+    in _defaults, and in compact mode turns them into __slots__, the
+    defaults being returned by BaseModel.__getattr__ until they are set.
+    _slots lists the slots of the class and of its bases.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        """Creates a model class"""
+        defaults = {}
+        for base in bases:
+            defaults.update(getattr(base, "_defaults", {}))
+        declared = {key: value for key, value in namespace.items()
+                    if not key.startswith("_") and not callable(value)}
+        defaults.update(declared)
+
+        if COMPACT and "__slots__" not in namespace:
+            for key in declared:
+                del namespace[key]
+            namespace["__slots__"] = tuple(declared)
+        namespace["_defaults"] = defaults
 
+        cls = super().__new__(mcs, name, bases, namespace)
+        cls._slots = tuple(slot for klass in reversed(cls.__mro__)
+                           for slot in vars(klass).get("__slots__", ())
+                           if slot != "__dict__")
+        return cls
 
-class BaseModel:
+
+class BaseModel(metaclass=ModelMeta):
     """Defines a simple base class that other model can inherit from"""
+    if COMPACT:
+        __slots__ = ("id", "created_at", "updated_at", "__dict__")
 
+    @stats.instrumented("BaseModel.__init__", hot=True)
     def __init__(self, *args, **kwargs):
         """Initialize a new BaseModel instance"""
-        time_format = "%Y-%m-%dT%H:%M:%S.%f"
-
         if kwargs:
             # If created from a dictionary (e.g., from JSON)
             for key, value in kwargs.items():
                 if key != '__class__':
-                    if key in ['created_at', 'updated_at']:
-                        # Converts string time stamp to datetime
-                        setattr(self, key,
-                                datetime.strptime(value, time_format))
-                    else:
-                        setattr(self, key, value)
+                    if key in ('created_at', 'updated_at'):
+                        # Converts string time stamp to datetime,
+                        # with or without microseconds
+                        value = datetime.fromisoformat(value)
+                    elif (COMPACT and key.endswith('_id') and
+                            isinstance(value, str)):
+                        # Objects with the same parent share its id
+                        value = sys.intern(value)
+                    # Not stored yet, no need to flag it as changed
+                    object.__setattr__(self, key, value)
         else:
             # New Instance creation
             self.id = str(uuid.uuid4())
@@ -29,18 +80,73 @@ class BaseModel:
             self.updated_at = datetime.now()
             models.storage.new(self)
 
+    def __setattr__(self, name, value):
+        """Set an attribute and flag the instance as changed in storage,
+        restoring it if the storage refuses the change"""
+        if name in self._slots:
+            try:
+                old = object.__getattribute__(self, name)
+            except AttributeError:
+                old = _MISSING
+        else:
+            old = self.__dict__.get(name, _MISSING)
+        super().__setattr__(name, value)
+        try:
+            models.storage.mark_dirty(self, name)
+        except Exception:
+            if old is _MISSING:
+                object.__delattr__(self, name)
+            else:
+                object.__setattr__(self, name, old)
+            raise
+
+    def __delattr__(self, name):
+        """Delete an attribute and flag the instance as changed in storage"""
+        super().__delattr__(name)
+        models.storage.mark_dirty(self, name)
+
+    def __getattr__(self, name):
+        """Return the default of a declared attribute not set yet, a copy
+        of it if it is a list or a dictionary, kept by the instance so
+        that changing it in place is not lost (compact mode only)"""
+        try:
+            default = type(self)._defaults[name]
+        except KeyError:
+            raise AttributeError(
+                    f"'{type(self).__name__}' object has no attribute "
+                    f"'{name}'") from None
+        if isinstance(default, (list, dict)):
+            default = copy.copy(default)
+            object.__setattr__(self, name, default)
+        return default
+
+    def __attributes(self):
+        """Return the instance attributes, slots included"""
+        if not COMPACT:
+            return self.__dict__
+        attributes = {}
+        for name in self._slots:
+            try:
+                attributes[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        attributes.update(self.__dict__)
+        return attributes
+
     def __str__(self):
         """Return string representation of BaseModel instance"""
-        return f"[{self.__class__.__name__}] ({self.id}) {self.__dict__}"
+        return (f"[{self.__class__.__name__}] ({self.id}) "
+                f"{self.__attributes()}")
 
     def save(self):
         """Update updated_at with current datetime"""
         self.updated_at = datetime.now()
         models.storage.save()
 
+    @stats.instrumented("BaseModel.to_dict", hot=True)
     def to_dict(self):
         """Return dictionary representation of BaseModel instance"""
-        obj_dict = self.__dict__.copy()
+        obj_dict = self.__attributes().copy()
         obj_dict['__class__'] = self.__class__.__name__
 
         obj_dict['created_at'] = self.created_at.isoformat()
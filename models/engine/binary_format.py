@@ -0,0 +1,380 @@
+#!/usr/bin/python3
+"""This module defines the binary snapshot format of FileStorage
+
+convert() turns a snapshot into the other format, see also the convert
+command of the console.
+
+A binary snapshot holds the same dictionaries as a JSON one:
+    header: b"HBNB", version, the interned strings (class and field
+        names) and one schema per class, the list of its fields
+    records: the class of the object, the number of fields of the
+        schema it was encoded with then, for each of them, a one byte
+        type tag and the value. Timestamps are stored as int64
+        microseconds and UUIDs as their 16 bytes, values that would not
+        read back identical are stored as strings or JSON.
+    index: (8 byte hash of the key, offset, length) of every record,
+        sorted by hash, to find a record without reading the others
+    trailer: offsets of the records and of the index, record count
+
+An Encoder only ever appends fields to a schema, so the records it
+encoded for a snapshot can be written as is in the next ones, the
+fields added since being missing from them. Version 1 records have
+every field of their schema and no number of fields.
+"""
+import hashlib
+import json
+import struct
+from datetime import datetime, timedelta
+
+MAGIC = b"HBNB"
+VERSION = 2
+EPOCH = datetime(1970, 1, 1)
+
+HEADER = struct.Struct("<4sB")
+COUNT = struct.Struct("<I")
+SHORT = struct.Struct("<H")
+INT = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+INDEX_ENTRY = struct.Struct("<8sQI")
+TRAILER = struct.Struct("<QQQ4s")
+
+MISSING, STR, INTEGER, REAL, UUID, TIME, JSON = range(7)
+
+
+def key_hash(key):
+    """Returns the 8 byte hash of a key used by the index"""
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+def is_binary(path):
+    """Returns True if the file at path is a binary snapshot"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except FileNotFoundError:
+        return False
+
+
+def _encode_value(value):
+    """Returns the tagged bytes of a field value"""
+    if isinstance(value, str):
+        if (len(value) == 36 and value[8] == value[13] == value[18] ==
+                value[23] == "-" and value == value.lower()):
+            try:
+                raw = bytes.fromhex(value.replace("-", ""))
+            except ValueError:
+                raw = b""
+            if len(raw) == 16:
+                return bytes((UUID,)) + raw
+        if len(value) >= 19 and value[10:11] == "T":
+            try:
+                time = datetime.fromisoformat(value)
+            except ValueError:
+                time = None
+            if (time is not None and time.tzinfo is None and
+                    time.isoformat() == value):
+                return (bytes((TIME,)) +
+                        INT.pack((time - EPOCH) // timedelta(microseconds=1)))
+        data = value.encode()
+        return bytes((STR,)) + COUNT.pack(len(data)) + data
+    if (isinstance(value, int) and not isinstance(value, bool) and
+            -2 ** 63 <= value < 2 ** 63):
+        return bytes((INTEGER,)) + INT.pack(value)
+    if isinstance(value, float):
+        return bytes((REAL,)) + FLOAT.pack(value)
+    data = json.dumps(value).encode()
+    return bytes((JSON,)) + COUNT.pack(len(data)) + data
+
+
+def _decode_value(buf, offset):
+    """Returns the value read at offset and the offset following it"""
+    tag = buf[offset]
+    offset += 1
+    if tag == STR or tag == JSON:
+        size, = COUNT.unpack_from(buf, offset)
+        offset += COUNT.size
+        text = bytes(buf[offset:offset + size]).decode()
+        offset += size
+        return (text if tag == STR else json.loads(text)), offset
+    if tag == UUID:
+        h = bytes(buf[offset:offset + 16]).hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}", \
+            offset + 16
+    if tag == TIME:
+        micro, = INT.unpack_from(buf, offset)
+        time = EPOCH + timedelta(microseconds=micro)
+        return time.isoformat(), offset + INT.size
+    if tag == INTEGER:
+        return INT.unpack_from(buf, offset)[0], offset + INT.size
+    if tag == REAL:
+        return FLOAT.unpack_from(buf, offset)[0], offset + FLOAT.size
+    raise ValueError(f"unknown value tag {tag}")
+
+
+class Encoder:
+    """Encodes records and writes them in snapshots, keeping the schemas
+    from one snapshot to the next"""
+
+    def __init__(self):
+        """Initialize an encoder without any schema"""
+        # {class name: {field name: position}}, in class id order
+        self.schemas = {}
+        self.class_ids = {}
+
+    def record(self, key, value):
+        """Returns the bytes of the record of an object
+
+        Args:
+            key (str): <class>.<id> of the object
+            value (dict): Its dictionary, as FileStorage writes it to the
+                JSON file
+
+        Raises:
+            ValueError: If key is not <__class__>.<id> of value
+        """
+        class_name = value["__class__"]
+        if key != f"{class_name}.{value.get('id')}":
+            raise ValueError(f"key {key} does not match its object")
+        fields = self.schemas.get(class_name)
+        if fields is None:
+            fields = self.schemas[class_name] = {}
+            self.class_ids[class_name] = len(self.class_ids)
+        for name in value:
+            if name != "__class__" and name not in fields:
+                fields[name] = len(fields)
+
+        record = [SHORT.pack(self.class_ids[class_name]),
+                  SHORT.pack(len(fields))]
+        for name in fields:
+            if name in value:
+                record.append(_encode_value(value[name]))
+            else:
+                record.append(bytes((MISSING,)))
+        return b"".join(record)
+
+    def dumps(self, records):
+        """Returns the binary snapshot of records
+
+        Args:
+            records (iterable): (key, bytes of its record) pairs, the
+                records encoded by this encoder
+        """
+        strings = []
+        string_ids = {}
+
+        def intern(name):
+            if name not in string_ids:
+                string_ids[name] = len(strings)
+                strings.append(name)
+            return string_ids[name]
+
+        parts = [HEADER.pack(MAGIC, VERSION)]
+        header = [SHORT.pack(len(self.schemas))]
+        for class_name, fields in self.schemas.items():
+            header.append(SHORT.pack(intern(class_name)))
+            header.append(SHORT.pack(len(fields)))
+            header.extend(SHORT.pack(intern(name)) for name in fields)
+        parts.append(COUNT.pack(len(strings)))
+        for name in strings:
+            data = name.encode()
+            parts.append(SHORT.pack(len(data)) + data)
+        parts.extend(header)
+
+        offset = sum(len(part) for part in parts)
+        records_offset = offset
+        index = []
+        for key, record in records:
+            parts.append(record)
+            index.append((key_hash(key), offset, len(record)))
+            offset += len(record)
+
+        index.sort()
+        parts.extend(INDEX_ENTRY.pack(*entry) for entry in index)
+        parts.append(TRAILER.pack(records_offset, offset, len(index),
+                                  MAGIC))
+        return b"".join(parts)
+
+
+def dumps(obj_dict):
+    """Returns the binary snapshot of serialized objects
+
+    Args:
+        obj_dict (dict): Object dictionaries keyed by <class>.<id>, as
+            FileStorage writes them to the JSON file
+
+    Raises:
+        ValueError: If a key is not <__class__>.<id> of its dictionary
+    """
+    encoder = Encoder()
+    records = [(key, encoder.record(key, value))
+               for key, value in obj_dict.items()]
+    return encoder.dumps(records)
+
+
+class Snapshot:
+    """Reads the records of a binary snapshot held in a buffer"""
+
+    def __init__(self, buf):
+        """Reads the header of a snapshot
+
+        Args:
+            buf: bytes, memoryview or mmap holding the whole snapshot
+
+        Raises:
+            ValueError: If buf is not a binary snapshot
+        """
+        magic, version = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or not 1 <= version <= VERSION:
+            raise ValueError("not a binary snapshot")
+        self.buf = buf
+        self.version = version
+
+        offset = HEADER.size
+        count, = COUNT.unpack_from(buf, offset)
+        offset += COUNT.size
+        strings = []
+        for _ in range(count):
+            size, = SHORT.unpack_from(buf, offset)
+            offset += SHORT.size
+            strings.append(bytes(buf[offset:offset + size]).decode())
+            offset += size
+
+        count, = SHORT.unpack_from(buf, offset)
+        offset += SHORT.size
+        self.schemas = []
+        for _ in range(count):
+            name, size = struct.unpack_from("<HH", buf, offset)
+            offset += 2 * SHORT.size
+            fields = struct.unpack_from(f"<{size}H", buf, offset)
+            offset += size * SHORT.size
+            self.schemas.append((strings[name],
+                                 [strings[i] for i in fields]))
+
+        (self.records_offset, self.index_offset, self.count,
+         magic) = TRAILER.unpack_from(buf, len(buf) - TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError("truncated binary snapshot")
+        self.__counts = None
+
+    def record(self, offset):
+        """Returns the (key, dictionary) of the record at offset"""
+        return self.__decode(offset)[:2]
+
+    def items(self, class_names=None):
+        """Returns the (key, dictionary) pairs in file order
+
+        Args:
+            class_names (set): Only decode the records of these classes
+        """
+        items = []
+        if class_names is None:
+            offset = self.records_offset
+            for _ in range(self.count):
+                key, value, offset = self.__decode(offset)
+                items.append((key, value))
+            return items
+
+        wanted = {i for i, (name, fields) in enumerate(self.schemas)
+                  if name in class_names}
+        if not wanted:
+            return items
+        index = self.buf[self.index_offset:
+                         self.index_offset + self.count * INDEX_ENTRY.size]
+        for offset in sorted(entry[1] for entry in
+                             INDEX_ENTRY.iter_unpack(index)):
+            if SHORT.unpack_from(self.buf, offset)[0] in wanted:
+                items.append(self.record(offset))
+        return items
+
+    def counts(self):
+        """Returns the {class name: number of records} of the snapshot,
+        reading the index and the class of every record but no value"""
+        if self.__counts is None:
+            counts = {name: 0 for name, fields in self.schemas}
+            index = self.buf[self.index_offset:
+                             self.index_offset + self.count * INDEX_ENTRY.size]
+            for entry in INDEX_ENTRY.iter_unpack(index):
+                class_id, = SHORT.unpack_from(self.buf, entry[1])
+                counts[self.schemas[class_id][0]] += 1
+            self.__counts = counts
+        return self.__counts
+
+    def find(self, key):
+        """Returns the dictionary of the object stored under key, None if
+        there is none, reading only that record and the index"""
+        digest = key_hash(key)
+        size = INDEX_ENTRY.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            position = self.index_offset + middle * size
+            if self.buf[position:position + len(digest)] < digest:
+                low = middle + 1
+            else:
+                high = middle
+
+        # Keys whose hash collide are next to each other
+        for i in range(low, self.count):
+            entry_digest, offset, length = INDEX_ENTRY.unpack_from(
+                    self.buf, self.index_offset + i * size)
+            if entry_digest != digest:
+                break
+            record_key, value = self.record(offset)
+            if record_key == key:
+                return value
+        return None
+
+    def __decode(self, offset):
+        """Returns the key and dictionary of the record at offset and the
+        offset of the next record"""
+        buf = self.buf
+        class_id, = SHORT.unpack_from(buf, offset)
+        offset += SHORT.size
+        class_name, fields = self.schemas[class_id]
+        if self.version > 1:
+            size, = SHORT.unpack_from(buf, offset)
+            offset += SHORT.size
+            fields = fields[:size]
+
+        value = {}
+        for name in fields:
+            if buf[offset] == MISSING:
+                offset += 1
+                continue
+            value[name], offset = _decode_value(buf, offset)
+        value["__class__"] = class_name
+        return f"{class_name}.{value.get('id')}", value, offset
+
+
+def loads(data):
+    """Returns the object dictionaries of a binary snapshot, keyed by
+    <class>.<id>"""
+    return dict(Snapshot(data).items())
+
+
+def convert(target, src, dst):
+    """Converts a JSON or binary snapshot to a format
+
+    Args:
+        target (str): Format to write, "json" or "binary"
+        src (str): Path of the snapshot to convert
+        dst (str): Path of the converted snapshot
+
+    Raises:
+        ValueError: If target is not a format or src cannot be decoded
+    """
+    if target not in ("json", "binary"):
+        raise ValueError(f"unknown format: {target}")
+    if is_binary(src):
+        with open(src, "rb") as f:
+            obj_dict = loads(f.read())
+    else:
+        with open(src, "r") as f:
+            obj_dict = json.load(f)
+
+    if target == "binary":
+        with open(dst, "wb") as f:
+            f.write(dumps(obj_dict))
+    else:
+        with open(dst, "w") as f:
+            json.dump(obj_dict, f)
@@ -0,0 +1,312 @@
+#!/usr/bin/python3
+"""This module defines the queries over stored objects and the columnar
+view of the Place objects answering them without going through the
+objects
+
+A query keeps the objects matching every (attribute, operator, value)
+condition, operators being those of OPERATORS, then either returns them
+or computes one of AGGREGATES over an attribute, optionally per value
+of another attribute. Values that are not numbers are left out of the
+aggregates and never match a condition on a number.
+
+page() cuts the objects into pages, in the order of an attribute.
+
+PlaceColumns is maintained by FileStorage like the indexes of
+models.engine.indexes.
+"""
+import heapq
+import itertools
+import math
+import operator
+from array import array
+from models.engine.indexes import value_of
+
+OPERATORS = {
+        "=": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        "<=": operator.le,
+        ">": operator.gt,
+        ">=": operator.ge
+}
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+
+def number(value):
+    """Returns value as a float, NaN if it is not a number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return math.nan
+
+
+def check(conditions, function):
+    """Raises ValueError if an operator or the aggregate is unknown"""
+    for attr, op, value in conditions:
+        if op not in OPERATORS:
+            raise ValueError(f"unknown operator: {op}")
+    if function is not None and function not in AGGREGATES:
+        raise ValueError(f"unknown aggregate: {function}")
+
+
+def matches(compare, actual, value):
+    """Returns compare(actual, value), False if they cannot be compared"""
+    try:
+        return compare(actual, value)
+    except TypeError:
+        return False
+
+
+def aggregate(function, values):
+    """Returns count, sum, avg, min or max of values, None if there is
+    no number to compute it on"""
+    if function == "count":
+        return len(values)
+    values = [value for value in values if not math.isnan(value)]
+    if not values:
+        return None
+    if function == "sum":
+        return math.fsum(values)
+    if function == "avg":
+        return math.fsum(values) / len(values)
+    return min(values) if function == "min" else max(values)
+
+
+def evaluate(items, conditions=(), function=None, attr=None, group_by=None):
+    """Runs a query by going through the objects
+
+    Args:
+        items (iterable): (key, object or dictionary) pairs
+        conditions (list): (attribute, operator, value) triples
+        function (str): Aggregate to compute, None to get the objects
+        attr (str): Attribute to aggregate, unused by count
+        group_by (str): Attribute whose values make the groups
+
+    Returns:
+        list: Keys of the matching objects if function is None
+        The aggregate otherwise, a {group value: aggregate} dictionary
+        with group_by
+    """
+    check(conditions, function)
+    tests = []
+    for name, op, value in conditions:
+        convert = number if isinstance(value, (int, float)) else None
+        tests.append((name, OPERATORS[op], value, convert))
+
+    keys = []
+    groups = {}
+    for key, obj in items:
+        for name, compare, value, convert in tests:
+            actual = value_of(obj, name)
+            if convert is not None:
+                actual = convert(actual)
+            if not matches(compare, actual, value):
+                break
+        else:
+            keys.append(key)
+            if function is not None:
+                group = value_of(obj, group_by) if group_by else None
+                groups.setdefault(group, []).append(
+                        number(value_of(obj, attr)) if attr else 0.0)
+
+    if function is None:
+        return keys
+    if group_by is None:
+        return aggregate(function, groups.get(None, []))
+    return {group: aggregate(function, values)
+            for group, values in groups.items()}
+
+
+def sort_key(value):
+    """Returns a key ordering values of any type: numbers first, then
+    strings and timestamps (compared as ISO strings, the way they are
+    saved), then the other values by their repr and None last"""
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    if isinstance(value, str):
+        return (1, value)
+    if isinstance(value, (int, float)) and not math.isnan(value):
+        return (0, value)
+    if value is None:
+        return (3, "")
+    return (2, repr(value))
+
+
+def page(items, order=None, offset=0, limit=None, after=None):
+    """Yields a page of (key, object or dictionary) pairs
+
+    Without order the pairs keep the order of items and are only read as
+    the page is consumed, otherwise only offset + limit of them are kept
+    when sorting.
+
+    Args:
+        items (iterable): (key, object or dictionary) pairs
+        order (str): Attribute ordering the pairs, then the keys
+        offset (int): Number of pairs skipped
+        limit (int): Maximum number of pairs, None for all the others
+        after (tuple): (key, object) of the last pair of the previous
+            page, the page starting right after it
+    """
+    stop = None if limit is None else offset + limit
+    if order is None:
+        items = iter(items)
+        if after is not None:
+            for key, obj in items:
+                if key == after[0]:
+                    break
+        yield from itertools.islice(items, offset, stop)
+        return
+
+    def rank(item):
+        return sort_key(value_of(item[1], order)), item[0]
+
+    if after is not None:
+        bound = rank(after)
+        items = (item for item in items if rank(item) > bound)
+    if stop is None:
+        items = sorted(items, key=rank)
+    else:
+        items = heapq.nsmallest(stop, items, key=rank)
+    yield from itertools.islice(items, offset, None)
+
+
+class PlaceColumns:
+    """Columns of the Place attributes used by analytic queries
+
+    The numbers are kept in float arrays, NaN standing for a value that
+    is not a number, and city_id as a code in an integer array. Rows of
+    deleted objects are filled with the last row. Grouping by a number
+    column holding other values is left to evaluate(), which groups
+    them by their actual value.
+    """
+    numbers = ("price_by_night", "number_rooms", "max_guest",
+               "latitude", "longitude")
+    codes = ("city_id",)
+
+    def __init__(self):
+        """Initialize empty columns"""
+        self.clear()
+
+    def clear(self):
+        """Drops every row"""
+        self.__keys = []
+        self.__rows = {}
+        self.__columns = {name: array("d") for name in self.numbers}
+        self.__columns.update({name: array("q") for name in self.codes})
+        self.__values = {name: [] for name in self.codes}
+        self.__value_codes = {name: {} for name in self.codes}
+        # Keys of the objects whose value is NaN, per number column
+        self.__not_numbers = {name: set() for name in self.numbers}
+
+    def __code(self, name, value):
+        """Returns the code of a value of a coded column"""
+        if not isinstance(value, (str, int, float)):
+            value = None
+        value_codes = self.__value_codes[name]
+        if value not in value_codes:
+            value_codes[value] = len(self.__values[name])
+            self.__values[name].append(value)
+        return value_codes[value]
+
+    def add(self, key, obj):
+        """Stores the attributes of the object stored under key"""
+        row = self.__rows.get(key)
+        if row is None:
+            row = self.__rows[key] = len(self.__keys)
+            self.__keys.append(key)
+            for column in self.__columns.values():
+                column.append(0)
+        for name in self.numbers:
+            value = number(value_of(obj, name))
+            self.__columns[name][row] = value
+            if math.isnan(value):
+                self.__not_numbers[name].add(key)
+            else:
+                self.__not_numbers[name].discard(key)
+        for name in self.codes:
+            self.__columns[name][row] = self.__code(name,
+                                                    value_of(obj, name))
+
+    def update(self, key, obj, name=None):
+        """Stores the attributes again if one of the columns changed"""
+        if name is None or name in self.__columns:
+            self.add(key, obj)
+
+    def remove(self, key):
+        """Drops the row of the object stored under key"""
+        row = self.__rows.pop(key, None)
+        if row is None:
+            return
+        for keys in self.__not_numbers.values():
+            keys.discard(key)
+        last = len(self.__keys) - 1
+        if row != last:
+            moved = self.__keys[last]
+            self.__keys[row] = moved
+            self.__rows[moved] = row
+            for column in self.__columns.values():
+                column[row] = column[last]
+        self.__keys.pop()
+        for column in self.__columns.values():
+            column.pop()
+
+    def supports(self, conditions=(), attr=None, group_by=None,
+                 function=None):
+        """Returns True if the columns can answer a query, see query()"""
+        if attr in self.codes and function != "count":
+            # The codes are not the values, which are not numbers
+            return False
+        for name, op, value in conditions:
+            if name in self.codes:
+                continue
+            if (name not in self.__columns or
+                    not isinstance(value, (int, float))):
+                return False
+        if group_by in self.__not_numbers and self.__not_numbers[group_by]:
+            return False
+        return all(name in self.__columns
+                   for name in (attr, group_by) if name)
+
+    def query(self, conditions=(), function=None, attr=None,
+              group_by=None):
+        """Runs a query on the columns, see evaluate()
+
+        Raises:
+            KeyError: If an attribute has no column
+            TypeError: If a number column is compared with something
+                else than a number
+        """
+        check(conditions, function)
+        rows = range(len(self.__keys))
+        for name, op, value in conditions:
+            compare = OPERATORS[op]
+            column = self.__columns[name]
+            if name in self.codes:
+                # Compare the values once, then the rows by code
+                codes = {code for code, actual in enumerate(
+                         self.__values[name])
+                         if matches(compare, actual, value)}
+                rows = [row for row in rows if column[row] in codes]
+            else:
+                rows = [row for row in rows if compare(column[row], value)]
+
+        if function is None:
+            return [self.__keys[row] for row in rows]
+
+        values = self.__columns[attr] if attr else None
+        if group_by is None:
+            return aggregate(function, [values[row] if values else 0.0
+                                        for row in rows])
+
+        groups = {}
+        column = self.__columns[group_by]
+        for row in rows:
+            groups.setdefault(column[row], []).append(
+                    values[row] if values else 0.0)
+        if group_by in self.codes:
+            names = self.__values[group_by]
+            groups = {names[code]: group for code, group in groups.items()}
+        else:
+            groups = {int(group) if group.is_integer() else group: values
+                      for group, values in groups.items()}
+        return {group: aggregate(function, values)
+                for group, values in groups.items()}
@@ -0,0 +1,526 @@
+#!/usr/bin/python3
+"""This module defines the SQLite storage engine"""
+import heapq
+import itertools
+import json
+import sqlite3
+from models.amenity import Amenity
+from models.base_model import BaseModel
+from models.city import City
+from models.engine import columns, stats
+from models.engine.geo import GeoIndex
+from models.engine.indexes import value_of
+from models.engine.text import TextIndex
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+class DBStorage:
+    """Stores the objects in a SQLite database, one table per class
+
+    A table has an id, created_at and updated_at column, one column per
+    attribute declared on the class (Place.city_id, ...) and an extra
+    column holding the JSON of any other attribute or of values SQLite
+    cannot store as is, like Place.amenity_ids. The foreign-key columns
+    are indexed.
+
+    Only the objects used in the session are kept in memory. Changed
+    objects are written when save() is called, in one transaction.
+    """
+    __classes = {
+            'Amenity': Amenity,
+            'BaseModel': BaseModel,
+            'City': City,
+            'Place': Place,
+            'Review': Review,
+            'State': State,
+            'User': User
+    }
+    __foreign_keys = ("state_id", "city_id", "user_id", "place_id")
+    __text = {
+            'Amenity': ('name',),
+            'City': ('name',),
+            'Place': ('name', 'description'),
+            'Review': ('text',),
+            'State': ('name',)
+    }
+
+    def __init__(self, path="hbnb.db"):
+        """Initialize the storage
+
+        Args:
+            path (str): Path of the SQLite database file
+        """
+        self.__path = path
+        self.__connection = None
+        self.__objects = {}
+        self.__dirty = set()
+        self.__deleted = set()
+        self.__batch = None
+        self.__flush_every = None
+
+    def __columns(self, class_name):
+        """Returns the names of the attributes declared on a class"""
+        return list(self.__classes[class_name]._defaults)
+
+    @stats.instrumented("DBStorage.reload")
+    def reload(self):
+        """Opens the database and creates the missing tables"""
+        if self.__connection is not None:
+            self.__connection.close()
+        self.__connection = sqlite3.connect(self.__path)
+
+        with self.__connection:
+            for class_name in self.__classes:
+                columns = ["id TEXT PRIMARY KEY", "created_at TEXT",
+                           "updated_at TEXT", "extra TEXT"]
+                columns.extend(f'"{name}"'
+                               for name in self.__columns(class_name))
+                self.__connection.execute(
+                        f'CREATE TABLE IF NOT EXISTS "{class_name}" '
+                        f'({", ".join(columns)})')
+
+                for name in self.__columns(class_name):
+                    if name in self.__foreign_keys:
+                        self.__connection.execute(
+                                f'CREATE INDEX IF NOT EXISTS '
+                                f'"{class_name}_{name}" '
+                                f'ON "{class_name}" ("{name}")')
+
+    def close(self):
+        """Closes the database, unsaved changes are lost"""
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+    def __to_row(self, obj):
+        """Returns the column values of an object, in table order"""
+        values = obj.to_dict()
+        del values["__class__"]
+        row = [values.pop("id"), values.pop("created_at"),
+               values.pop("updated_at"), None]
+
+        for name in self.__columns(obj.__class__.__name__):
+            value = values.get(name)
+            if value is None or isinstance(value, (str, int, float)):
+                row.append(values.pop(name, None))
+            else:
+                row.append(None)
+        if values:
+            row[3] = json.dumps(values)
+        return row
+
+    def __from_row(self, class_name, row, keep=True):
+        """Returns the object of a row, the one in memory if loaded
+
+        Args:
+            class_name (str): Name of the class of the row
+            row (tuple): Column values, in table order
+            keep (bool): Keep the object created in memory
+        """
+        key = f"{class_name}.{row[0]}"
+        if key in self.__objects:
+            return self.__objects[key]
+        if key in self.__deleted:
+            return None
+
+        kwargs = {"id": row[0], "created_at": row[1], "updated_at": row[2]}
+        for name, value in zip(self.__columns(class_name), row[4:]):
+            if value is not None:
+                kwargs[name] = value
+        if row[3] is not None:
+            kwargs.update(json.loads(row[3]))
+
+        obj = self.__classes[class_name](**kwargs)
+        if keep:
+            self.__objects[key] = obj
+        return obj
+
+    def __select(self, class_name, where="", params=()):
+        """Returns the objects of the rows of a class matching where"""
+        rows = self.__connection.execute(
+                f'SELECT * FROM "{class_name}" {where}', params)
+        objs = {}
+        for row in rows:
+            obj = self.__from_row(class_name, row)
+            if obj is not None:
+                objs[f"{class_name}.{obj.id}"] = obj
+        return objs
+
+    def all(self, cls=None):
+        """Returns the stored objects
+
+        Args:
+            cls (type or str): Only return the objects of this class,
+                given as the class or its name
+
+        Returns:
+            dict: Objects keyed by <class name>.<object id>. Unlike
+            FileStorage this is a new dictionary, use new() and delete()
+            to change what is stored.
+        """
+        if cls is None:
+            class_names = self.__classes
+        elif isinstance(cls, str):
+            class_names = [cls] if cls in self.__classes else []
+        else:
+            class_names = [cls.__name__]
+
+        objs = {}
+        for class_name in class_names:
+            objs.update(self.__select(class_name))
+            # Objects not saved yet
+            for key, obj in self.__objects.items():
+                if key.startswith(f"{class_name}."):
+                    objs[key] = obj
+        return objs
+
+    def count(self, cls=None):
+        """Returns the number of stored objects, of class cls only if
+        given, counting the rows in SQL and the changes not saved yet"""
+        if cls is None:
+            return sum(self.count(class_name)
+                       for class_name in self.__classes)
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if cls not in self.__classes:
+            return 0
+
+        table = f'"{cls}"'
+        count = self.__connection.execute(
+                f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for key in self.__dirty | self.__deleted:
+            class_name, obj_id = key.split(".", 1)
+            if class_name != cls:
+                continue
+            saved = self.__connection.execute(
+                    f"SELECT 1 FROM {table} WHERE id = ?",
+                    (obj_id,)).fetchone() is not None
+            if key in self.__deleted and saved:
+                count -= 1
+            elif key in self.__dirty and not saved:
+                count += 1
+        return count
+
+    def stream(self, cls=None, order=None, offset=0, limit=None,
+               after=None):
+        """Yields a page of the objects of class cls, see
+        FileStorage.stream
+
+        The rows of a class are read by one query, ordered in SQL by id
+        or by the column of order, starting after after and limited to
+        offset + limit rows, as the page is consumed. Their objects are
+        not kept in memory, the objects in memory are merged in instead
+        of their row. Orders on attributes without a column in every
+        class go through columns.page, which keeps offset + limit
+        objects to sort them.
+        """
+        if cls is None:
+            class_names = list(self.__classes)
+        else:
+            if not isinstance(cls, str):
+                cls = cls.__name__
+            class_names = [cls] if cls in self.__classes else []
+        if after is not None:
+            class_name, obj_id = after.split(".", 1)
+            after = (after, self.__peek(class_name, obj_id))
+        stop = None if limit is None else offset + limit
+
+        if order is not None and not all(self.__sortable(name, order)
+                                         for name in class_names):
+            items = ((key, self.__object(key, value))
+                     for name in class_names
+                     for rank, key, value in self.__rows(name))
+            yield from columns.page(items, order, offset, limit, after)
+            return
+
+        if order is None:
+            if after is not None:
+                # The classes come one after the other, from that of after
+                name = after[0].split(".", 1)[0]
+                class_names = class_names[class_names.index(name):] \
+                    if name in class_names else []
+            items = itertools.chain.from_iterable(
+                    self.__rows(name, None, None if i else after, stop)
+                    for i, name in enumerate(class_names))
+        else:
+            items = heapq.merge(*(self.__rows(name, order, after, stop)
+                                  for name in class_names),
+                                key=lambda item: item[0])
+        for rank, key, value in itertools.islice(items, offset, stop):
+            yield key, self.__object(key, value)
+
+    def __sortable(self, class_name, order):
+        """Tells whether the objects of a class can be ordered in SQL by
+        the column of order, the way columns.sort_key orders them"""
+        if order in ("id", "created_at", "updated_at"):
+            return True
+        default = self.__classes[class_name]._defaults.get(order)
+        return (order in self.__columns(class_name) and
+                isinstance(default, (str, int, float)))
+
+    def __rows(self, class_name, order=None, after=None, stop=None):
+        """Yields (rank, key, row or object) for the objects of a class,
+        by rank: their key, or (columns.sort_key of order, key)
+
+        Args:
+            class_name (str): Name of the class
+            order (str): Attribute with a column ordering the objects
+            after (tuple): (key, object) the objects come after
+            stop (int): Number of objects needed, None for all of them
+        """
+        table = f'"{class_name}"'
+        prefix = f"{class_name}."
+        if order is None:
+            query = f"SELECT 0, '', * FROM {table}"
+        else:
+            value = f'"{order}"'
+            default = self.__classes[class_name]._defaults.get(order)
+            if default is not None:
+                # Unset attributes are NULL and read as the class default
+                if isinstance(default, str):
+                    literal = "'" + default.replace("'", "''") + "'"
+                else:
+                    literal = repr(default)
+                value = f"COALESCE({value}, {literal})"
+            group = (f"CASE typeof({value}) WHEN 'integer' THEN 0 "
+                     f"WHEN 'real' THEN 0 WHEN 'text' THEN 1 "
+                     f"WHEN 'null' THEN 3 ELSE 2 END")
+            query = (f"SELECT * FROM (SELECT {group} AS _group, "
+                     f"COALESCE({value}, '') AS _value, * FROM {table})")
+
+        def rank(key, obj):
+            if order is None:
+                return key
+            return columns.sort_key(value_of(obj, order)), key
+
+        where = ""
+        params = []
+        bound = None
+        if after is not None:
+            bound = rank(*after)
+            if order is None:
+                where = "WHERE id > ?"
+                params.append(after[0].split(".", 1)[1])
+            else:
+                (after_group, after_value), after_key = bound
+                params.extend((after_group, after_value))
+                if after_key.startswith(prefix):
+                    where = "WHERE (_group, _value, id) > (?, ?, ?)"
+                    params.append(after_key[len(prefix):])
+                elif prefix > after_key:
+                    where = "WHERE (_group, _value) >= (?, ?)"
+                else:
+                    where = "WHERE (_group, _value) > (?, ?)"
+
+        # The objects in memory replace their row
+        memory = sorted((rank(key, obj), key, obj)
+                        for key, obj in self.__objects.items()
+                        if key.startswith(prefix))
+        if bound is not None:
+            memory = [item for item in memory if item[0] > bound]
+        replaced = {key for key in self.__objects if key.startswith(prefix)}
+        replaced.update(key for key in self.__deleted
+                        if key.startswith(prefix))
+
+        ordering = "id" if order is None else "_group, _value, id"
+        limit = ""
+        if stop is not None:
+            limit = "LIMIT ?"
+            params.append(stop + len(replaced))
+        cursor = self.__connection.execute(
+                f"{query} {where} ORDER BY {ordering} {limit}", params)
+
+        def rows():
+            for row in cursor:
+                key = prefix + row[2]
+                if key in replaced:
+                    continue
+                if order is None:
+                    yield key, key, row[2:]
+                else:
+                    yield ((row[0], row[1]), key), key, row[2:]
+
+        yield from heapq.merge(rows(), memory, key=lambda item: item[0])
+
+    def __object(self, key, value):
+        """Returns the object of a row yielded by __rows without keeping
+        it, or the object in memory"""
+        if isinstance(value, tuple):
+            return self.__from_row(key.split(".", 1)[0], value, keep=False)
+        return value
+
+    def __peek(self, class_name, obj_id):
+        """Returns the object of class_name with the given id without
+        keeping it in memory, None if there is none"""
+        key = f"{class_name}.{obj_id}"
+        if key in self.__objects:
+            return self.__objects[key]
+        if class_name not in self.__classes or key in self.__deleted:
+            return None
+        row = self.__connection.execute(
+                f'SELECT * FROM "{class_name}" WHERE id = ?',
+                (obj_id,)).fetchone()
+        if row is None:
+            return None
+        return self.__from_row(class_name, row, keep=False)
+
+    def get(self, cls, id):
+        """Returns the object of class cls with the given id, or None"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        key = f"{cls}.{id}"
+        if key in self.__objects:
+            return self.__objects[key]
+        if cls not in self.__classes:
+            return None
+        return self.__select(cls, "WHERE id = ?", (id,)).get(key)
+
+    def lookup(self, cls, attr, value):
+        """Returns the objects of class cls whose attr equals value
+
+        Declared attributes are looked up in their column, which is
+        indexed for the foreign keys, other attributes with a scan.
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if cls not in self.__classes:
+            return {}
+
+        if attr in self.__columns(cls):
+            where = f'WHERE "{attr}" = ?'
+            if value == self.__classes[cls]._defaults[attr]:
+                # Unset attributes are NULL and read as the class default
+                where += f' OR "{attr}" IS NULL'
+            objs = self.__select(cls, where, (value,))
+        else:
+            objs = self.__select(cls)
+        # Objects changed but not saved yet
+        for key, obj in self.__objects.items():
+            if key.startswith(f"{cls}."):
+                objs[key] = obj
+
+        return {key: obj for key, obj in objs.items()
+                if value_of(obj, attr) == value}
+
+    def query(self, cls, conditions=(), function=None, attr=None,
+              group_by=None):
+        """Returns the objects of class cls matching conditions, or an
+        aggregate over them, see FileStorage.query
+
+        The objects are gone through rather than queried in SQL, so that
+        the changes not saved yet are taken into account.
+        """
+        objs = self.all(cls)
+        result = columns.evaluate(list(objs.items()), conditions,
+                                  function, attr, group_by)
+        if function is not None:
+            return result
+        return {key: objs[key] for key in result}
+
+    def within_radius(self, cls, latitude, longitude, km):
+        """Returns the objects of class cls within km of a point, nearest
+        first, see FileStorage.within_radius"""
+        return self.__spatial(cls, "within_radius", latitude, longitude, km)
+
+    def within_bbox(self, cls, min_latitude, min_longitude, max_latitude,
+                    max_longitude):
+        """Returns the objects of class cls inside a bounding box"""
+        return self.__spatial(cls, "within_bbox", min_latitude,
+                              min_longitude, max_latitude, max_longitude)
+
+    def nearest(self, cls, latitude, longitude, k):
+        """Returns the k objects of class cls nearest to a point"""
+        return self.__spatial(cls, "nearest", latitude, longitude, k)
+
+    def __spatial(self, cls, method, *args):
+        """Runs a search on a geospatial index built for the objects"""
+        objs = self.all(cls)
+        index = GeoIndex()
+        for key, obj in objs.items():
+            index.add(key, obj)
+        hits = getattr(index, method)(*args)
+        keys = [hit if isinstance(hit, str) else hit[0] for hit in hits]
+        return {key: objs[key] for key in keys}
+
+    def search(self, cls, text, limit=None):
+        """Returns the objects of class cls using words of text, the most
+        relevant first, see FileStorage.search"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        if cls not in self.__text:
+            return {}
+        objs = self.all(cls)
+        index = TextIndex(*self.__text[cls])
+        for key, obj in objs.items():
+            index.add(key, obj)
+        return {key: objs[key] for key, score in index.search(text, limit)}
+
+    @stats.instrumented("DBStorage.new")
+    def new(self, obj):
+        """Adds an object to the storage"""
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__objects[key] = obj
+        self.__deleted.discard(key)
+        self.__dirty.add(key)
+
+    def mark_dirty(self, obj, name=None):
+        """Flags an object as changed since the last save"""
+        key = f"{obj.__class__.__name__}.{getattr(obj, 'id', None)}"
+        if self.__objects.get(key) is obj:
+            self.__dirty.add(key)
+
+    def delete(self, obj=None):
+        """Removes an object from the storage"""
+        if obj is None:
+            return
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        self.__objects.pop(key, None)
+        self.__dirty.discard(key)
+        self.__deleted.add(key)
+
+    def begin(self, flush_every=None):
+        """Starts a batch: save() only writes every flush_every calls,
+        or not at all until commit() if flush_every is None"""
+        self.__batch = 0
+        self.__flush_every = flush_every
+
+    def commit(self):
+        """Ends the batch and writes everything changed during it"""
+        self.__batch = None
+        self.save()
+
+    @stats.instrumented("DBStorage.save")
+    def save(self):
+        """Writes the changed and deleted objects in one transaction"""
+        if self.__batch is not None:
+            self.__batch += 1
+            if (self.__flush_every is None or
+                    self.__batch < self.__flush_every):
+                return
+            self.__batch = 0
+
+        rows = {}
+        for key in self.__dirty:
+            class_name = key.split(".", 1)[0]
+            rows.setdefault(class_name, []).append(
+                    self.__to_row(self.__objects[key]))
+        deleted = {}
+        for key in self.__deleted:
+            class_name, obj_id = key.split(".", 1)
+            deleted.setdefault(class_name, []).append((obj_id,))
+
+        with self.__connection:
+            for class_name, values in rows.items():
+                marks = ", ".join("?" * len(values[0]))
+                self.__connection.executemany(
+                        f'INSERT OR REPLACE INTO "{class_name}" '
+                        f'VALUES ({marks})', values)
+            for class_name, ids in deleted.items():
+                self.__connection.executemany(
+                        f'DELETE FROM "{class_name}" WHERE id = ?', ids)
+
+        self.__dirty.clear()
+        self.__deleted.clear()
@@ -1,63 +1,1236 @@
 #!/usr/bin/python3
 """This module Defines the file storage class"""
+import atexit
+import contextlib
+import io
 import json
+import mmap
 import os
+import struct
+import tempfile
+import threading
+import time
+import types
+import warnings
 from models.amenity import Amenity
 from models.base_model import BaseModel
 from models.city import City
+from models.engine import binary_format, columns, stats
+from models.engine.columns import PlaceColumns
+from models.engine.geo import GeoIndex
+from models.engine.indexes import ForeignKeyIndex, value_of
+from models.engine.journal import Journal
+from models.engine.text import TextIndex
 from models.place import Place
 from models.review import Review
 from models.state import State
 from models.user import User
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# os.umask() can only be read by changing it, read it once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 class FileStorage:
-    """Defines how objects are stored and retrieved from a json file"""
+    """Defines how objects are stored and retrieved from a json file
+
+    Objects flag themselves as changed (see mark_dirty) and the JSON text
+    of every unchanged object is cached, so a save only serializes what
+    changed since the previous one. Mutating an attribute in place, e.g.
+    appending to a list, is not seen: assign the attribute or call the
+    object's save() afterwards.
+
+    In lazy mode reload() only keeps the dictionaries read from the file
+    and an object is created the first time it is looked up with get(),
+    or when all() is called.
+
+    Objects are also indexed by their foreign keys (City.state_id,
+    Place.city_id, ...), see lookup(), and partitioned by class so that
+    all(cls) does not go through the objects of other classes.
+
+    The words of the names and descriptions are indexed for search(),
+    the index of a class being built on its first search so that
+    sessions that do not search pay nothing for it. Once built, it is
+    saved to <file>.<class>.text by close() and compactions, and the
+    next time it is built the objects whose text did not change reuse
+    its words. Read only mode never reads nor writes those files.
+
+    Files are written to a temporary file renamed over the previous one,
+    so a crash never leaves a half written file behind. The durability
+    level adds an fsync of the file ("file") and of its directory
+    ("dir") before the save returns, to survive power loss as well.
+
+    With a flush interval or threshold, save() returns at once and a
+    background thread writes the changes of many saves together, every
+    flush_interval seconds or once flush_threshold saves are waiting.
+    flush() and close() write them right away.
+
+    The storage can be shared by threads. Changes to the stored objects
+    are serialized by a lock, lookups take no lock and only work on
+    copies made atomically, and a save copies what it has to write
+    under the lock then serializes it without holding it. all()
+    returns a read only view of the storage dictionary, and in thread
+    safe mode a copy of it, for callers iterating it while other
+    threads add objects.
+
+    In sharded mode every class is saved to its own file next to the
+    JSON file (file.json keeps the State objects in file.State.json) and
+    a save only rewrites the files of the classes that changed. Combined
+    with lazy mode, a class file is only read when its objects are used.
+
+    In shared mode several processes can use the same files. A save holds
+    an exclusive lock on <file>.lock, first merging what the others saved
+    since this process last read the files, and lookups merge those
+    changes too whenever the files changed (by inode, mtime and size).
+    With the journal only the records appended since are read, otherwise
+    the file is read again and only the objects whose updated_at differs
+    are recreated. Objects changed locally and not saved yet are kept.
+
+    In binary mode the files are written in the compact format of
+    models.engine.binary_format rather than as JSON. Either format is
+    read whatever the mode, the journal always holds JSON records. The
+    encoded record of every object is cached like its JSON text, so a
+    save only encodes the objects that changed.
+
+    In read only mode a binary file is memory-mapped rather than read:
+    get() finds the object through the index of the file and only
+    decodes its record, all(cls) and lookup() decode the records of the
+    class. Nothing can be saved. A JSON file is reloaded as usual. The
+    mapped file is not followed as other processes save, so read only
+    mode cannot be combined with shared mode.
+    """
     __file_path = "file.json"
     __objects = {}
+    __pending = {}
+    __partitions = {}
+    __partitioned = None
+    __unloaded = set()
+    __dirty = set()
+    __cache = {}
+    __encoder = binary_format.Encoder()
+    __classes = {
+            'Amenity': Amenity,
+            'BaseModel': BaseModel,
+            'City': City,
+            'Place': Place,
+            'Review': Review,
+            'State': State,
+            'User': User
+    }
+    __indexes = {
+            'City': [ForeignKeyIndex('state_id')],
+            'Place': [ForeignKeyIndex('city_id'), ForeignKeyIndex('user_id'),
+                      PlaceColumns(), GeoIndex()],
+            'Review': [ForeignKeyIndex('place_id'), ForeignKeyIndex('user_id')]
+    }
+    # Only built, then maintained with __indexes, on the first search()
+    __text_indexes = {
+            'Amenity': TextIndex('name'),
+            'City': TextIndex('name'),
+            'Place': TextIndex('name', 'description'),
+            'Review': TextIndex('text'),
+            'State': TextIndex('name')
+    }
+
+    __durability_levels = ("none", "file", "dir")
+    __lock = threading.RLock()
+    __io_lock = threading.Lock()
+
+    def __init__(self, journal=False, compact_bytes=1 << 20, lazy=False,
+                 sharded=False, durability="none", flush_interval=None,
+                 flush_threshold=None, thread_safe=False, shared=False,
+                 binary=False, read_only=False):
+        """Initialize the storage
+
+        Args:
+            journal (bool): Append changed objects to a journal on save
+                instead of rewriting the whole JSON file
+            compact_bytes (int): Minimum journal size before it is
+                compacted into the JSON file in the background
+            lazy (bool): Create the reloaded objects on first access
+            sharded (bool): Save every class to its own file
+            durability (str): "none", "file" or "dir", see above
+            flush_interval (float): Seconds between background writes
+            flush_threshold (int): Number of saves triggering a
+                background write before the interval is over
+            thread_safe (bool): Make all() return a copy, see above
+            shared (bool): Share the files with other processes
+            binary (bool): Write the files in the binary format
+            read_only (bool): Map the binary file instead of reading it
+
+        Raises:
+            ValueError: If durability is not a known level, or if shared
+                mode is asked for with sharded mode or without fcntl,
+                or read only mode with sharded or shared mode
+        """
+        if durability not in self.__durability_levels:
+            raise ValueError(f"unknown durability level: {durability}")
+        if shared and (sharded or fcntl is None):
+            raise ValueError("shared mode needs fcntl and a single file")
+        if read_only and sharded:
+            raise ValueError("read only mode needs a single file")
+        if read_only and shared:
+            # Merging the saves of the others would decode every record
+            raise ValueError("read only mode cannot be shared")
+        self.__journaled = journal
+        self.__compact_bytes = compact_bytes
+        self.__compactor = None
+        self.__lazy = lazy
+        self.__sharded = sharded
+        self.__batch = None
+        self.__flush_every = None
+        self.__durability = durability
+        self.__thread_safe = thread_safe
+        self.__shared = shared
+        self.__binary = binary
+        self.__read_only = read_only
+        self.__snapshot = None
+        self.__overlay = {}
+        self.__seen = None
+        self.__journal_offset = 0
+
+        self.__flusher = None
+        self.__flush_error = None
+        if flush_interval is not None or flush_threshold is not None:
+            self.__flush_interval = flush_interval
+            self.__flush_threshold = flush_threshold
+            self.__flush_condition = threading.Condition()
+            self.__requested = 0
+            self.__stopping = False
+            self.__flusher = threading.Thread(target=self.__flush_loop,
+                                              daemon=True)
+            self.__flusher.start()
+            atexit.register(self.close)
+
+    def all(self, cls=None):
+        """Returns the dictionary of all stored objects
+
+        Args:
+            cls (type or str): Only return the objects of this class,
+                given as the class or its name
+
+        Returns:
+            dict: Objects keyed by <class name>.<object id>. Without cls
+            this is a read only view of the storage dictionary, a copy
+            in thread safe mode, use new() and delete() to change what
+            is stored.
+        """
+        self.__sync()
+        if cls is not None:
+            if not isinstance(cls, str):
+                cls = cls.__name__
+            partition = self.__partition(cls)
+            for key, obj in list(partition.items()):
+                if isinstance(obj, dict):
+                    self.__hydrate(key)
+            return dict(partition)
+
+        if self.__snapshot is not None and self.__unloaded:
+            # Decode every record in a single pass over the file
+            self.__load_mapped(set(self.__unloaded))
+        for class_name in list(self.__unloaded):
+            self.__partition(class_name)
+        for key in list(self.__pending):
+            self.__hydrate(key)
+        if self.__thread_safe:
+            return dict(self.__objects)
+        # The partitions and indexes would not see changes made to it
+        return types.MappingProxyType(self.__objects)
+
+    def count(self, cls=None):
+        """Returns the number of stored objects, of class cls only if
+        given, in constant time once the objects of the class are loaded
+
+        The partition of every class is kept up to date by new() and
+        delete(), so this is the size of one dictionary per class. In
+        read only mode the objects of a class not loaded yet are counted
+        in the index of the mapped file, without decoding them.
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        self.__sync()
+        total = 0
+        for class_name in ([cls] if cls else self.__classes):
+            if self.__snapshot is not None and class_name in self.__unloaded:
+                total += self.__count_mapped(class_name)
+            else:
+                total += len(self.__partition(class_name))
+        return total
+
+    def stream(self, cls=None, order=None, offset=0, limit=None,
+               after=None):
+        """Yields the stored objects one at a time, a page of them with
+        offset, limit or after
+
+        Objects not created yet are only created as they are yielded,
+        and without order nothing is copied but the keys of the class
+        being gone through.
+
+        Args:
+            cls (type or str): Only yield the objects of this class
+            order (str): Attribute ordering the objects, then their key
+            offset (int): Number of objects skipped
+            limit (int): Maximum number of objects yielded
+            after (str): Key of the last object of the previous page,
+                the page starting right after it
+
+        Yields:
+            (key, object) pairs
+        """
+        if cls is not None and not isinstance(cls, str):
+            cls = cls.__name__
+        self.__sync()
+        if after is not None:
+            class_name, obj_id = after.split(".", 1)
+            after = (after, self.get(class_name, obj_id))
+
+        def items():
+            for class_name in [cls] if cls else list(self.__classes):
+                partition = self.__partition(class_name)
+                for key in list(partition):
+                    value = partition.get(key)
+                    if value is not None:
+                        yield key, value
+
+        for key, value in columns.page(items(), order, offset, limit,
+                                       after):
+            obj = self.get(*key.split(".", 1))
+            if obj is not None:
+                yield key, obj
+
+    def __partition(self, class_name, load=True):
+        """Returns the {key: object} partition of a class, objects not
+        created yet being represented by their dictionary
+
+        Args:
+            class_name (str): Name of the class
+            load (bool): Read the objects of the class if not done yet
+        """
+        if load and class_name in self.__unloaded:
+            if self.__snapshot is not None:
+                self.__load_mapped({class_name})
+            else:
+                with self.__lock:
+                    if class_name in self.__unloaded:
+                        # First use of a class whose file was not read yet
+                        self.__unloaded.discard(class_name)
+                        self.__load(self.__shard_path(class_name),
+                                    class_name)
+
+        if FileStorage.__partitioned is not self.__objects:
+            with self.__lock:
+                # The storage dictionary was replaced, partition and
+                # index it again
+                self.__partitions.clear()
+                for indexes in self.__indexes.values():
+                    for index in indexes:
+                        index.clear()
+                for key, obj in self.__items():
+                    name = key.split(".", 1)[0]
+                    self.__partitions.setdefault(name, {})[key] = obj
+                    for index in self.__indexes.get(name, ()):
+                        index.add(key, obj)
+                FileStorage.__partitioned = self.__objects
+
+        return self.__partitions.setdefault(class_name, {})
+
+    def get(self, cls, id):
+        """Returns the object of class cls with the given id
+
+        Args:
+            cls (type or str): Class of the object or its name
+            id (str): Id of the object
+
+        Returns:
+            The object, or None if it is not stored
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        key = f"{cls}.{id}"
+        self.__sync()
+        if cls in self.__unloaded:
+            if self.__snapshot is not None:
+                self.__get_mapped(key)
+            else:
+                self.__partition(cls)
 
-    def all(self):
-        """Returns the dictionary of all stored objects"""
-        return self.__objects
+        obj = self.__objects.get(key)
+        if obj is None and key in self.__pending:
+            obj = self.__hydrate(key)
+        return obj
 
+    def lookup(self, cls, attr, value):
+        """Returns the objects of class cls whose attr equals value
+
+        Uses the foreign-key index of attr when there is one, so the cost
+        is proportional to the number of objects returned.
+
+        Args:
+            cls (type or str): Class of the objects or its name
+            attr (str): Name of the attribute
+            value: Value to look for
+
+        Returns:
+            dict: Matching objects keyed by <class name>.<object id>
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        self.__sync()
+        partition = self.__partition(cls)
+
+        for index in self.__indexes.get(cls, ()):
+            if getattr(index, "attr", None) == attr:
+                keys = index.lookup(value)
+                break
+        else:
+            keys = partition
+
+        objs = {}
+        for key in list(keys):
+            obj = self.get(cls, key[len(cls) + 1:])
+            if obj is not None and value_of(obj, attr) == value:
+                objs[key] = obj
+        return objs
+
+    def query(self, cls, conditions=(), function=None, attr=None,
+              group_by=None):
+        """Returns the objects of class cls matching conditions, or an
+        aggregate over them
+
+        Uses the columnar view of the class when it has one covering the
+        attributes of the query (Place), see models.engine.columns.
+
+        Args:
+            cls (type or str): Class of the objects or its name
+            conditions (list): (attribute, operator, value) triples
+            function (str): "count", "sum", "avg", "min" or "max", None
+                to get the objects
+            attr (str): Attribute to aggregate, unused by count
+            group_by (str): Attribute whose values make the groups
+
+        Returns:
+            dict: Matching objects keyed by <class name>.<object id> if
+            function is None, otherwise the aggregate, or a dictionary of
+            the aggregate of every group with group_by
+
+        Raises:
+            ValueError: If an operator or the aggregate is unknown
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        self.__sync()
+        partition = self.__partition(cls)
+
+        for index in self.__indexes.get(cls, ()):
+            if (hasattr(index, "supports") and
+                    index.supports(conditions, attr, group_by,
+                                   function)):
+                with self.__lock:
+                    # The columns must not change while they are read
+                    result = index.query(conditions, function, attr,
+                                         group_by)
+                break
+        else:
+            result = columns.evaluate(list(partition.items()), conditions,
+                                      function, attr, group_by)
+
+        if function is not None:
+            return result
+        objs = {}
+        for key in result:
+            obj = self.get(cls, key[len(cls) + 1:])
+            if obj is not None:
+                objs[key] = obj
+        return objs
+
+    def within_radius(self, cls, latitude, longitude, km):
+        """Returns the objects of class cls within km of a point
+
+        Uses the geospatial index of the class (Place), the objects of
+        other classes are gone through.
+
+        Returns:
+            dict: Objects keyed by <class name>.<object id>, nearest first
+        """
+        return self.__spatial(cls, "within_radius", latitude, longitude, km)
+
+    def within_bbox(self, cls, min_latitude, min_longitude, max_latitude,
+                    max_longitude):
+        """Returns the objects of class cls inside a bounding box, which
+        crosses the antimeridian if min_longitude > max_longitude"""
+        return self.__spatial(cls, "within_bbox", min_latitude,
+                              min_longitude, max_latitude, max_longitude)
+
+    def nearest(self, cls, latitude, longitude, k):
+        """Returns the k objects of class cls nearest to a point, nearest
+        first"""
+        return self.__spatial(cls, "nearest", latitude, longitude, k)
+
+    def __spatial(self, cls, method, *args):
+        """Runs a search of the geospatial index of a class, or of an
+        index built for it if the class has none"""
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        self.__sync()
+        partition = self.__partition(cls)
+
+        for index in self.__indexes.get(cls, ()):
+            if isinstance(index, GeoIndex):
+                with self.__lock:
+                    hits = getattr(index, method)(*args)
+                break
+        else:
+            index = GeoIndex()
+            for key, obj in list(partition.items()):
+                index.add(key, obj)
+            hits = getattr(index, method)(*args)
+
+        objs = {}
+        for hit in hits:
+            key = hit if isinstance(hit, str) else hit[0]
+            obj = self.get(cls, key[len(cls) + 1:])
+            if obj is not None:
+                objs[key] = obj
+        return objs
+
+    def search(self, cls, text, limit=None):
+        """Returns the objects of class cls using words of text, the most
+        relevant first
+
+        Uses the text index of the class (Review.text, Place.name and
+        description, and the name of the other classes), so the cost is
+        proportional to the number of objects using the words. Nothing
+        is found in the other classes.
+
+        Args:
+            cls (type or str): Class of the objects or its name
+            text (str): Words to look for, case insensitive
+            limit (int): Maximum number of objects returned
+
+        Returns:
+            dict: Objects keyed by <class name>.<object id>
+        """
+        if not isinstance(cls, str):
+            cls = cls.__name__
+        index = self.__text_indexes.get(cls)
+        if index is None:
+            return {}
+        self.__sync()
+        partition = self.__partition(cls)
+
+        with self.__lock:
+            indexes = self.__indexes.setdefault(cls, [])
+            if index not in indexes:
+                # First search of the class, from now on the index is
+                # maintained like the others
+                if not self.__read_only:
+                    self.__load_text(cls, index)
+                for key, obj in list(partition.items()):
+                    index.add(key, obj)
+                indexes.append(index)
+            hits = index.search(text, limit)
+
+        objs = {}
+        for key, score in hits:
+            obj = self.get(cls, key[len(cls) + 1:])
+            if obj is not None:
+                objs[key] = obj
+        return objs
+
+    def __hydrate(self, key):
+        """Creates the object of a reloaded dictionary not accessed yet"""
+        with self.__lock:
+            value = self.__pending.pop(key, None)
+            if value is None:
+                # Created by another thread in the meantime
+                return self.__objects.get(key)
+            obj = self.__classes[value["__class__"]](**value)
+            self.__objects[key] = obj
+            self.__partition(value["__class__"])[key] = obj
+            self.__dirty.discard(key)
+        return obj
+
+    @stats.instrumented("FileStorage.new")
     def new(self, obj):
         """Adds a new object to the storage dictionary
-        Uses the format: <class name>.<object id> as the key"""
+        Uses the format: <class name>.<object id> as the key
+
+        Raises:
+            io.UnsupportedOperation: In read only mode
+        """
+        if self.__read_only:
+            raise io.UnsupportedOperation("the storage is read only")
         key = f"{obj.__class__.__name__}.{obj.id}"
-        self.__objects[key] = obj
+        with self.__lock:
+            self.__pending.pop(key, None)
+            self.__objects[key] = obj
+            self.__partition(obj.__class__.__name__)[key] = obj
+            self.__dirty.add(key)
+            for index in self.__indexes.get(obj.__class__.__name__, ()):
+                index.add(key, obj)
+
+    def mark_dirty(self, obj, name=None):
+        """Flags a stored object as changed since the last save
+
+        Args:
+            obj: The changed object
+            name (str): Name of the changed attribute, None if unknown
+
+        Raises:
+            io.UnsupportedOperation: In read only mode
+        """
+        class_name = obj.__class__.__name__
+        key = f"{class_name}.{getattr(obj, 'id', None)}"
+        if key in self.__objects:
+            if self.__read_only:
+                raise io.UnsupportedOperation("the storage is read only")
+            with self.__lock:
+                self.__dirty.add(key)
+                for index in self.__indexes.get(class_name, ()):
+                    index.update(key, obj, name)
+
+    def delete(self, obj=None):
+        """Removes an object from the storage dictionary
+
+        Raises:
+            io.UnsupportedOperation: In read only mode
+        """
+        if obj is None:
+            return
+        if self.__read_only:
+            raise io.UnsupportedOperation("the storage is read only")
+        key = f"{obj.__class__.__name__}.{obj.id}"
+        with self.__lock:
+            self.__pending.pop(key, None)
+            self.__objects.pop(key, None)
+            self.__partition(obj.__class__.__name__).pop(key, None)
+            self.__dirty.add(key)
+            for index in self.__indexes.get(obj.__class__.__name__, ()):
+                index.remove(key)
+
+    def begin(self, flush_every=None):
+        """Starts a batch: save() only writes every flush_every calls,
+        or not at all until commit() if flush_every is None"""
+        self.__batch = 0
+        self.__flush_every = flush_every
+
+    def commit(self):
+        """Ends the batch and writes everything changed during it"""
+        self.__batch = None
+        self.save()
 
+    @stats.instrumented("FileStorage.save")
     def save(self):
         """Serializes __objects to the JSON file
-        converts objects to their dictionary representation"""
-        serialized_objects = {}
-        for key, obj in self.__objects.items():
-            serialized_objects[key] = obj.to_dict()
+        converts objects to their dictionary representation
 
-        with open(self.__file_path, "w") as f:
-            json.dump(serialized_objects, f)
+        Raises:
+            io.UnsupportedOperation: In read only mode
+        """
+        if self.__read_only:
+            raise io.UnsupportedOperation("the storage is read only")
+        if self.__batch is not None:
+            self.__batch += 1
+            if (self.__flush_every is None or
+                    self.__batch < self.__flush_every):
+                return
+            self.__batch = 0
 
+        if self.__flusher is not None:
+            # Leave the write to the background thread
+            with self.__flush_condition:
+                self.__requested += 1
+                self.__flush_condition.notify()
+            return
+
+        self.__save_now()
+
+    def flush(self):
+        """Writes the changes waiting for the background thread now
+
+        Raises:
+            Exception: The error of the background thread if it failed
+                to write since the last flush(), once the changes are
+                written
+        """
+        if self.__read_only:
+            raise io.UnsupportedOperation("the storage is read only")
+        if self.__flusher is not None:
+            with self.__flush_condition:
+                self.__requested = 0
+        self.__save_now()
+        self.__raise_flush_error()
+
+    def __raise_flush_error(self):
+        """Raises the error the background thread hit, if any"""
+        error, self.__flush_error = self.__flush_error, None
+        if error is not None:
+            raise error
+
+    def __flush_due(self):
+        """Tells the background thread whether to write before the end
+        of the interval"""
+        return self.__stopping or (
+                self.__flush_threshold is not None and
+                self.__requested >= self.__flush_threshold)
+
+    def __flush_loop(self):
+        """Body of the background thread writing the requested saves"""
+        while True:
+            with self.__flush_condition:
+                self.__flush_condition.wait_for(self.__flush_due,
+                                                self.__flush_interval)
+                if self.__stopping:
+                    # close() writes what is left
+                    return
+                requested = self.__requested
+                self.__requested = 0
+            if requested:
+                try:
+                    self.__save_now()
+                except Exception as error:
+                    # The changes stay dirty for the next write, the
+                    # error is raised by the next flush() or close()
+                    self.__flush_error = error
+
+    def __save_now(self):
+        """Writes the changes to the JSON file(s) or to the journal"""
+        with self.__io_lock, self.__file_lock(exclusive=True):
+            if self.__shared:
+                # Keep what the other processes saved in the meantime
+                self.__refresh()
+            with self.__lock:
+                # Copy what has to be written, it is serialized below
+                # without keeping other threads from changing objects
+                dirty = set(self.__dirty)
+                self.__dirty.clear()
+                self.__forget_deleted(dirty)
+                if self.__journaled:
+                    items = [(key, self.__objects.get(key)) for key in dirty]
+                elif self.__sharded:
+                    # Only the files of the classes that changed
+                    files = {}
+                    for key in dirty:
+                        name = key.split(".", 1)[0]
+                        path = self.__shard_path(name)
+                        if path not in files:
+                            files[path] = list(self.__partition(name).items())
+                else:
+                    files = {self.__file_path: self.__items()}
+
+            try:
+                if self.__journaled:
+                    self.__save_journal(items, dirty)
+                else:
+                    for path, items in files.items():
+                        self.__write(path, items, dirty)
+            except BaseException:
+                # Not written, keep them for the next save
+                self.__dirty.update(dirty)
+                raise
+
+            if not self.__journaled:
+                # The snapshot now holds everything the journal did
+                journal = Journal(self.__file_path)
+                if journal.exists():
+                    journal.discard()
+            if self.__shared:
+                self.__remember()
+
+    @contextlib.contextmanager
+    def __file_lock(self, exclusive):
+        """Holds the lock file shared with the other processes, if any
+
+        Args:
+            exclusive (bool): Lock for writing rather than for reading
+        """
+        if not self.__shared:
+            yield
+            return
+        with open(self.__file_path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def __signatures(self):
+        """Returns (inode, mtime, size) of the JSON file, of the rotated
+        journal and of the journal, None for the missing ones"""
+        journal = Journal(self.__file_path)
+        signatures = []
+        for path in (self.__file_path, journal.old_path, journal.path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signatures.append(None)
+            else:
+                signatures.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        return tuple(signatures)
+
+    def __remember(self):
+        """Records the files as read up to date by this process"""
+        self.__seen = self.__signatures()
+        active = self.__seen[2]
+        self.__journal_offset = active[2] if active is not None else 0
+
+    def __sync(self):
+        """Merges the changes saved by other processes in shared mode"""
+        if self.__shared and self.__signatures() != self.__seen:
+            with self.__file_lock(exclusive=False):
+                self.__refresh()
+
+    def __refresh(self):
+        """Merges what other processes saved since the files were last
+        read, the caller holding the lock file"""
+        seen = self.__seen
+        snapshot, old, active = self.__signatures()
+        if (snapshot, old, active) == seen:
+            return
+
+        journal = Journal(self.__file_path)
+        if (seen is not None and seen[:2] == (snapshot, old) and
+                active is not None and
+                (seen[2] is None or seen[2][0] == active[0])):
+            # Only records were appended to the same journal
+            offset = self.__journal_offset if seen[2] is not None else 0
+            records, offset = journal.tail(offset)
+            with self.__lock:
+                for key, value in records:
+                    self.__apply(key, value)
+            self.__seen = (snapshot, old, active)
+            self.__journal_offset = offset
+            return
+
+        obj_dict = {}
+        try:
+            if snapshot is not None:
+                obj_dict = self.__read(self.__file_path)
+            journal.replay(obj_dict)
+        except ValueError:
+            return
+        with self.__lock:
+            for key, value in obj_dict.items():
+                self.__apply(key, value)
+            for key, obj in self.__items():
+                if key not in obj_dict:
+                    self.__apply(key, None)
+        self.__remember()
+
+    def __apply(self, key, value):
+        """Stores an object as saved by another process, None meaning it
+        was deleted, unless it was changed here and not saved yet"""
+        if key in self.__dirty:
+            return
+        class_name = key.split(".", 1)[0]
+        current = self.__objects.get(key, self.__pending.get(key))
+
+        if value is None:
+            if current is not None:
+                self.__objects.pop(key, None)
+                self.__pending.pop(key, None)
+                self.__partition(class_name).pop(key, None)
+                self.__cache.pop(key, None)
+                for index in self.__indexes.get(class_name, ()):
+                    index.remove(key)
+            return
+
+        if value.get("__class__") not in self.__classes:
+            return
+        if current is not None:
+            updated_at = value_of(current, "updated_at")
+            if hasattr(updated_at, "isoformat"):
+                updated_at = updated_at.isoformat()
+            if updated_at == value.get("updated_at"):
+                return
+
+        self.__store(key, value)
+
+    def __write(self, path, items, dirty):
+        """Writes (key, object) pairs to a file, atomically replacing it
+
+        Args:
+            path (str): Path of the file
+            items (list): (key, object) pairs, see __entry
+            dirty (set): Keys of the objects that changed
+
+        Raises:
+            ValueError: In binary mode, if a key is not <class>.<id> of
+                its object
+        """
+        start = time.perf_counter()
+        tmp_path = path + ".tmp"
+        if self.__binary:
+            data = self.__encoder.dumps([
+                    (key, self.__entry(key, obj, dirty, binary=True))
+                    for key, obj in items])
+        else:
+            data = ("{" + ", ".join(self.__entry(key, obj, dirty)
+                                    for key, obj in items) + "}").encode()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if self.__durability != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        if self.__durability == "dir":
+            # Make the rename itself durable
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        stats.record("FileStorage.write", time.perf_counter() - start,
+                     len(data))
+
+    @staticmethod
+    def __read(path):
+        """Returns the object dictionaries of a JSON or binary file"""
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.strip():
+            return {}
+        if data.startswith(binary_format.MAGIC):
+            return binary_format.loads(data)
+        return json.loads(data)
+
+    def __shard_path(self, class_name):
+        """Returns the path of the file of a class in sharded mode"""
+        root, ext = os.path.splitext(self.__file_path)
+        return f"{root}.{class_name}{ext}"
+
+    def __items(self):
+        """Returns (key, object) pairs of everything stored, with the
+        dictionary itself standing for objects not created yet"""
+        items = list(self.__objects.items())
+        items.extend(self.__pending.items())
+        return items
+
+    def __entry(self, key, obj, dirty, binary=False):
+        """Returns the '"<key>": <json>' text of an object, serializing
+        it again only if it changed since it was cached
+
+        Args:
+            key (str): Key of the object
+            obj: The object, or its dictionary if not created yet
+            dirty (set): Keys of the objects that changed
+            binary (bool): Return the encoded record of the object
+                instead, for the binary format
+        """
+        entry_type = bytes if binary else str
+        cached = self.__cache.get(key)
+        if (cached is not None and cached[0] is obj and
+                key not in dirty and type(cached[1]) is entry_type):
+            return cached[1]
+
+        value = obj if isinstance(obj, dict) else obj.to_dict()
+        if binary:
+            entry = self.__encoder.record(key, value)
+        else:
+            entry = f"{json.dumps(key)}: {json.dumps(value)}"
+        self.__cache[key] = (obj, entry)
+        return entry
+
+    def __forget_deleted(self, dirty):
+        """Drops the cached entry of dirty objects that no longer exist"""
+        for key in dirty:
+            if key not in self.__objects:
+                self.__cache.pop(key, None)
+
+    def __save_journal(self, items, dirty):
+        """Appends the objects changed since the last save to the journal
+        and schedules a compaction once the journal outgrows the file
+
+        Args:
+            items (list): (key, object) pairs, None for deleted objects
+            dirty (set): Keys of the objects that changed
+        """
+        entries = []
+        for key, obj in items:
+            if obj is None:
+                entries.append(f"{json.dumps(key)}: null")
+            else:
+                entries.append(self.__entry(key, obj, dirty))
+
+        if not entries:
+            return
+
+        start = time.perf_counter()
+        journal = Journal(self.__file_path)
+        size = journal.append(entries, self.__durability != "none")
+        # The entries are ASCII, json.dumps escapes the rest
+        stats.record("FileStorage.journal", time.perf_counter() - start,
+                     sum(len(entry) + 3 for entry in entries))
+
+        snapshot_size = 0
+        if os.path.exists(self.__file_path):
+            snapshot_size = os.path.getsize(self.__file_path)
+        if size >= max(self.__compact_bytes, snapshot_size):
+            self.__compact(journal)
+
+    def __compact(self, journal):
+        """Starts a background thread folding the journal into the file"""
+        if self.__compactor is not None and self.__compactor.is_alive():
+            return
+
+        # Every class file gets rewritten, read those not used yet
+        for class_name in list(self.__unloaded):
+            self.__partition(class_name)
+
+        journal.rotate()
+        with self.__lock:
+            items = self.__items()
+        if self.__shared:
+            # Other processes must not append while the file is replaced
+            self.__write_snapshot(items, journal)
+            return
+        self.__compactor = threading.Thread(
+                target=self.__write_snapshot, args=(items, journal))
+        self.__compactor.start()
+
+    def __write_snapshot(self, items, journal):
+        """Writes a full snapshot of items then drops the rotated journal"""
+        if self.__sharded:
+            files = {self.__shard_path(name): [] for name in self.__classes}
+            for key, obj in items:
+                path = self.__shard_path(key.split(".", 1)[0])
+                files.setdefault(path, []).append((key, obj))
+        else:
+            files = {self.__file_path: items}
+
+        for path, items in files.items():
+            self.__write(path, items, self.__dirty)
+        journal.finish()
+        self.__save_text()
+
+    def __text_path(self, class_name):
+        """Returns the path of the file of the text index of a class"""
+        root, ext = os.path.splitext(self.__file_path)
+        return f"{root}.{class_name}.text"
+
+    def __save_text(self):
+        """Writes the built text indexes that changed to their file, the
+        caller holds the exclusive file lock in shared mode"""
+        with self.__lock:
+            data = {name: index.dump()
+                    for name, index in self.__text_indexes.items()
+                    if index.changed and index in self.__indexes.get(name,
+                                                                     ())}
+
+        for name, dump in data.items():
+            path = self.__text_path(name)
+            source = (self.__shard_path(name) if self.__sharded else
+                      self.__file_path)
+            try:
+                mode = os.stat(source).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            # Unique, other processes may write the same index
+            fd, tmp_path = tempfile.mkstemp(
+                    prefix=os.path.basename(path) + ".",
+                    dir=os.path.dirname(os.path.abspath(path)))
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(dump, f)
+                # mkstemp() made it readable by its owner only
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def __load_text(self, class_name, index):
+        """Gives a text index the words saved in its file, the objects
+        added with the same text reuse them"""
+        try:
+            with open(self.__text_path(class_name), "r") as f:
+                index.load(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    def close(self):
+        """Writes the changes still waiting for the background thread
+        and waits for it and for a running compaction to finish
+
+        Raises:
+            Exception: The error of the background thread if it failed
+                to write since the last flush(), once the changes are
+                written
+        """
+        error = None
+        if self.__flusher is not None:
+            with self.__flush_condition:
+                self.__stopping = True
+                requested = self.__requested
+                self.__requested = 0
+                self.__flush_condition.notify()
+            self.__flusher.join()
+            self.__flusher = None
+            atexit.unregister(self.close)
+            error, self.__flush_error = self.__flush_error, None
+            if requested or error is not None:
+                self.__save_now()
+        if self.__compactor is not None:
+            self.__compactor.join()
+            self.__compactor = None
+        if not self.__read_only:
+            with self.__file_lock(exclusive=True):
+                self.__save_text()
+        self.__unmap()
+        if error is not None:
+            raise error
+
+    @stats.instrumented("FileStorage.reload")
     def reload(self):
         """Deserializes JSON file to __objects
         Recreates objects from their dictionary representation"""
+        if self.__read_only:
+            self.__map()
+            return
+        if self.__sharded:
+            self.__unloaded.update(self.__classes)
+            if not self.__lazy:
+                for class_name in self.__classes:
+                    self.__partition(class_name)
+            return
 
-        classes = {
-                'Amenity': Amenity,
-                'BaseModel': BaseModel,
-                'City': City,
-                'Place': Place,
-                'Review': Review,
-                'State': State,
-                'User': User
-        }
+        with self.__file_lock(exclusive=False):
+            self.__load(self.__file_path)
+            if self.__shared:
+                self.__remember()
 
-        if os.path.exists(self.__file_path):
-            try:
-                with open(self.__file_path, 'r') as f:
-                    obj_dict = json.load(f)
-
-                    for key, value in obj_dict.items():
-                        class_name = value["__class__"]
-                        if class_name in classes:
-                            self.__objects[key] = classes[class_name](**value)
-            except Exception:
-                pass
+    def __load(self, path, shard_class=None):
+        """Reads a snapshot file, applies the journal to it and stores
+        the result
+
+        Args:
+            path (str): Path of the snapshot file
+            shard_class (str): Only load the objects of this class
+
+        Raises:
+            ValueError: If the file cannot be read, rather than leaving
+                the storage empty for the next save to replace it
+        """
+        classes = self.__classes
+
+        journal = Journal(self.__file_path)
+        if not (os.path.exists(path) or journal.exists()):
+            return
+
+        with self.__lock:
+            obj_dict = {}
+            if os.path.exists(path):
+                try:
+                    obj_dict = self.__read(path)
+                except (ValueError, struct.error) as error:
+                    raise ValueError(f"cannot read {path}: {error}") \
+                        from error
+                if not isinstance(obj_dict, dict):
+                    raise ValueError(f"cannot read {path}: not an object")
+
+            # Apply the mutations saved since the last snapshot
+            journal.replay(obj_dict, shard_class)
+
+            skipped = []
+            for key, value in obj_dict.items():
+                try:
+                    if value["__class__"] in classes:
+                        self.__store(key, value)
+                except (KeyError, TypeError, ValueError):
+                    skipped.append(key)
+            if skipped:
+                warnings.warn(f"{path}: skipped {len(skipped)} invalid "
+                              f"records, {', '.join(skipped[:5])}"
+                              f"{', ...' if len(skipped) > 5 else ''}")
+
+    def __store(self, key, value):
+        """Stores an object read from a file, keeping its dictionary
+        instead in lazy mode
+
+        Returns:
+            The object, or its dictionary in lazy mode
+        """
+        class_name = value["__class__"]
+        if self.__lazy:
+            self.__objects.pop(key, None)
+            self.__pending[key] = value
+        else:
+            value = self.__classes[class_name](**value)
+            self.__objects[key] = value
+        self.__partition(class_name, load=False)[key] = value
+        self.__dirty.discard(key)
+        for index in self.__indexes.get(class_name, ()):
+            index.add(key, value)
+        return value
+
+    def __map(self):
+        """Maps the binary file for read only mode, reloading a JSON
+        file as usual"""
+        self.__unmap()
+        if not binary_format.is_binary(self.__file_path):
+            self.__load(self.__file_path)
+            return
+
+        with open(self.__file_path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__snapshot = binary_format.Snapshot(buf)
+        # The journal is small, keep its records to apply over the file
+        self.__overlay = dict(Journal(self.__file_path).records())
+        with self.__lock:
+            self.__unloaded.update(self.__classes)
+
+    def __unmap(self):
+        """Closes the mapped file, if any"""
+        if self.__snapshot is not None:
+            self.__snapshot.buf.close()
+            self.__snapshot = None
+            self.__overlay = {}
+
+    def __get_mapped(self, key):
+        """Stores the object of key read from the mapped file, if any"""
+        with self.__lock:
+            if key in self.__objects or key in self.__pending:
+                return
+            if key in self.__overlay:
+                value = self.__overlay[key]
+            else:
+                value = self.__snapshot.find(key)
+            if value is not None and value["__class__"] in self.__classes:
+                self.__store(key, value)
+
+    def __count_mapped(self, class_name):
+        """Returns the number of objects of a class in the mapped file and
+        the journal, without decoding them"""
+        count = self.__snapshot.counts().get(class_name, 0)
+        for key, value in self.__overlay.items():
+            if key.split(".", 1)[0] == class_name:
+                # Added, or deleted (None), since the file was written
+                written = self.__snapshot.find(key) is not None
+                count += (value is not None) - written
+        return count
+
+    def __load_mapped(self, class_names):
+        """Stores every object of the classes read from the mapped file,
+        keeping those already decoded"""
+        with self.__lock:
+            class_names = class_names & self.__unloaded
+            if not class_names:
+                return
+            self.__unloaded.difference_update(class_names)
+            items = self.__snapshot.items(class_names)
+            items.extend(self.__overlay.items())
+
+            for key, value in items:
+                if (key.split(".", 1)[0] not in class_names or
+                        key in self.__objects or key in self.__pending):
+                    continue
+                # Changed or deleted (None) since the file was written
+                value = self.__overlay.get(key, value)
+                if value is not None and value["__class__"] in self.__classes:
+                    self.__store(key, value)
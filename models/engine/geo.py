@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+"""This module defines the geospatial index of the Place objects
+
+The objects are bucketed in a grid of cells of cell_degrees degrees of
+latitude by as many of longitude, so a search only goes through the
+objects of the cells overlapping the area searched. GeoIndex is
+maintained by FileStorage like the indexes of models.engine.indexes.
+"""
+import math
+from models.engine.indexes import value_of
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(latitude1, longitude1, latitude2, longitude2):
+    """Returns the great-circle distance between two points in km"""
+    phi1 = math.radians(latitude1)
+    phi2 = math.radians(latitude2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) *
+         math.sin(math.radians(longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """Grid index of object keys by latitude and longitude"""
+
+    def __init__(self, latitude="latitude", longitude="longitude",
+                 cell_degrees=0.5):
+        """Initialize an empty index
+
+        Args:
+            latitude (str): Name of the latitude attribute
+            longitude (str): Name of the longitude attribute
+            cell_degrees (float): Size of the cells of the grid
+        """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.__size = cell_degrees
+        self.__columns = math.ceil(360 / cell_degrees)
+        self.clear()
+
+    def clear(self):
+        """Drops every indexed key"""
+        self.__cells = {}
+        self.__points = {}
+
+    def __cell(self, latitude, longitude):
+        """Returns the (row, column) of the cell holding a point"""
+        return (math.floor((latitude + 90) / self.__size),
+                math.floor((longitude + 180) / self.__size) % self.__columns)
+
+    def add(self, key, obj):
+        """Indexes the object stored under key by its coordinates"""
+        self.remove(key)
+        latitude = value_of(obj, self.latitude)
+        longitude = value_of(obj, self.longitude)
+        for value in (latitude, longitude):
+            if (not isinstance(value, (int, float)) or
+                    isinstance(value, bool) or not math.isfinite(value)):
+                return
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return
+
+        cell = self.__cell(latitude, longitude)
+        self.__points[key] = (latitude, longitude, cell)
+        self.__cells.setdefault(cell, set()).add(key)
+
+    def update(self, key, obj, name=None):
+        """Re-indexes the object if its coordinates changed"""
+        if name is None or name in (self.latitude, self.longitude):
+            self.add(key, obj)
+
+    def remove(self, key):
+        """Drops the object stored under key from the index"""
+        point = self.__points.pop(key, None)
+        if point is None:
+            return
+        keys = self.__cells[point[2]]
+        keys.discard(key)
+        if not keys:
+            del self.__cells[point[2]]
+
+    def __keys(self, min_latitude, max_latitude, min_longitude,
+               max_longitude):
+        """Yields the keys in the cells overlapping an area, which
+        crosses the antimeridian if min_longitude > max_longitude"""
+        rows = range(self.__cell(max(min_latitude, -90), 0)[0],
+                     self.__cell(min(max_latitude, 90), 0)[0] + 1)
+        first = self.__cell(0, min_longitude)[1]
+        last = self.__cell(0, max_longitude)[1]
+        if min_longitude > max_longitude:
+            columns = set(range(first, self.__columns))
+            columns.update(range(0, last + 1))
+        else:
+            if max_longitude >= 180:
+                # 180 is the first column again
+                last = self.__columns - 1
+            columns = set(range(first, last + 1))
+
+        if len(rows) * len(columns) > len(self.__cells):
+            # Fewer cells are used than the area covers
+            cells = [cell for cell in self.__cells
+                     if cell[0] in rows and cell[1] in columns]
+        else:
+            cells = [(row, column) for row in rows for column in columns
+                     if (row, column) in self.__cells]
+        for cell in cells:
+            yield from self.__cells[cell]
+
+    def within_bbox(self, min_latitude, min_longitude, max_latitude,
+                    max_longitude):
+        """Returns the keys of the objects inside a bounding box, which
+        crosses the antimeridian if min_longitude > max_longitude"""
+        keys = []
+        crosses = min_longitude > max_longitude
+        for key in self.__keys(min_latitude, max_latitude, min_longitude,
+                               max_longitude):
+            latitude, longitude, cell = self.__points[key]
+            if not min_latitude <= latitude <= max_latitude:
+                continue
+            if crosses:
+                inside = (longitude >= min_longitude or
+                          longitude <= max_longitude)
+            else:
+                inside = min_longitude <= longitude <= max_longitude
+            if inside:
+                keys.append(key)
+        return keys
+
+    def within_radius(self, latitude, longitude, km):
+        """Returns (key, distance in km) of the objects within km of a
+        point, nearest first"""
+        angle = km / EARTH_RADIUS_KM
+        delta = math.degrees(angle)
+        min_latitude, max_latitude = latitude - delta, latitude + delta
+        if (angle >= math.pi / 2 or min_latitude <= -90 or
+                max_latitude >= 90):
+            # The circle covers a pole, or half the earth
+            min_longitude, max_longitude = -180, 180
+        else:
+            delta = math.degrees(math.asin(
+                    math.sin(angle) / math.cos(math.radians(latitude))))
+            min_longitude = longitude - delta
+            max_longitude = longitude + delta
+            if min_longitude < -180:
+                min_longitude += 360
+            if max_longitude > 180:
+                max_longitude -= 360
+
+        hits = []
+        for key in self.__keys(min_latitude, max_latitude, min_longitude,
+                               max_longitude):
+            point = self.__points[key]
+            distance = distance_km(latitude, longitude, point[0], point[1])
+            if distance <= km:
+                hits.append((key, distance))
+        hits.sort(key=lambda hit: hit[1])
+        return hits
+
+    def nearest(self, latitude, longitude, k):
+        """Returns (key, distance in km) of the k objects nearest to a
+        point, nearest first
+
+        Searches ever larger circles: once one holds k objects, the
+        objects outside it are all further than those k.
+        """
+        km = self.__size * 111.0
+        while True:
+            hits = self.within_radius(latitude, longitude, km)
+            if len(hits) >= k or km >= math.pi * EARTH_RADIUS_KM:
+                return hits[:k]
+            km *= 2
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""This module defines the secondary indexes maintained by FileStorage
+
+An index is told about every stored object of the classes it is
+registered for through three methods:
+    add(key, obj): the object was stored (or stored again)
+    update(key, obj, name): attribute name changed, None if unknown
+    remove(key): the object was deleted
+    clear(): every object is about to be added again
+obj is either a model instance or, for objects reloaded lazily and not
+created yet, the dictionary read from the file.
+"""
+
+
+def value_of(obj, name):
+    """Returns attribute name of an instance or of its dictionary"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class ForeignKeyIndex:
+    """Hash index of object keys by the value of a foreign-key attribute"""
+
+    def __init__(self, attr):
+        """Initialize an empty index
+
+        Args:
+            attr (str): Name of the indexed attribute, e.g. "state_id"
+        """
+        self.attr = attr
+        self.clear()
+
+    def clear(self):
+        """Drops every indexed key"""
+        self.__keys = {}
+        self.__values = {}
+
+    def add(self, key, obj):
+        """Indexes the object stored under key"""
+        value = value_of(obj, self.attr)
+        if key in self.__values:
+            if self.__values[key] == value:
+                return
+            self.remove(key)
+        if value == "" or not isinstance(value, (str, int, float)):
+            return
+        self.__values[key] = value
+        self.__keys.setdefault(value, set()).add(key)
+
+    def update(self, key, obj, name=None):
+        """Re-indexes the object if the indexed attribute changed"""
+        if name is None or name == self.attr:
+            self.add(key, obj)
+
+    def remove(self, key):
+        """Drops the object stored under key from the index"""
+        value = self.__values.pop(key, None)
+        if value is None:
+            return
+        keys = self.__keys[value]
+        keys.discard(key)
+        if not keys:
+            del self.__keys[value]
+
+    def lookup(self, value):
+        """Returns the set of keys whose attribute equals value"""
+        return self.__keys.get(value, set())
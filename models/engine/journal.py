@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+"""This module defines the append-only journal used by FileStorage"""
+import json
+import os
+
+
+class Journal:
+    """Append-only log of storage mutations kept next to a JSON snapshot
+
+    Every line is a one member JSON object {"<key>": <dict or null>},
+    a null value records a deletion. While a compaction is running the
+    active log is moved aside to <journal>.old so that new records keep
+    going to a fresh log.
+    """
+
+    def __init__(self, snapshot_path):
+        """Initialize a journal for the given snapshot file
+
+        Args:
+            snapshot_path (str): Path of the JSON snapshot
+        """
+        self.path = snapshot_path + ".journal"
+        self.old_path = self.path + ".old"
+
+    def append(self, entries, sync=False):
+        """Appends mutation records to the log
+
+        Args:
+            entries (iterable): JSON encoded '"<key>": <value>' members,
+                the same text FileStorage writes in its snapshot
+            sync (bool): fsync the log before returning
+
+        Returns:
+            int: Size in bytes of the log after the append
+        """
+        lines = ["{" + entry + "}\n" for entry in entries]
+
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+            return f.tell()
+
+    def records(self):
+        """Yields the logged (key, value) records in order, those of the
+        rotated log first, stopping at a truncated last line"""
+        for path in (self.old_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    yield from record.items()
+
+    def replay(self, obj_dict, class_name=None):
+        """Applies the logged records on top of a snapshot dictionary
+
+        Records of the rotated log are applied before the active one.
+        A truncated last line (crash while appending) is ignored.
+
+        Args:
+            obj_dict (dict): Serialized objects keyed by <class>.<id>
+            class_name (str): Only apply the records of this class
+        """
+        prefix = f"{class_name}." if class_name is not None else ""
+        for key, value in self.records():
+            if not key.startswith(prefix):
+                continue
+            if value is None:
+                obj_dict.pop(key, None)
+            else:
+                obj_dict[key] = value
+
+    def tail(self, offset):
+        """Returns the records appended to the active log after offset
+
+        Args:
+            offset (int): Position in the log of the first record to read
+
+        Returns:
+            tuple: ([(key, value), ...], position after the last complete
+            record read)
+        """
+        records = []
+        if not os.path.exists(self.path):
+            return records, offset
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Still being appended
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                records.extend(record.items())
+                offset += len(line)
+        return records, offset
+
+    def rotate(self):
+        """Moves the active log aside before a compaction
+
+        If a previous compaction never finished, the active log is
+        appended to the rotated one so no record is lost.
+        """
+        if not os.path.exists(self.path):
+            return
+        if os.path.exists(self.old_path):
+            with open(self.path, "r") as src, open(self.old_path, "a") as dst:
+                dst.write(src.read())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.old_path)
+
+    def finish(self):
+        """Drops the rotated log once its records are in the snapshot"""
+        if os.path.exists(self.old_path):
+            os.remove(self.old_path)
+
+    def discard(self):
+        """Drops both logs after a full snapshot has been written"""
+        for path in (self.path, self.old_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def exists(self):
+        """Returns True if there is any log to replay"""
+        return os.path.exists(self.path) or os.path.exists(self.old_path)
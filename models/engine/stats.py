@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+"""This module records how often and how long operations run
+
+Every operation has a Histogram of its latencies, with four buckets per
+doubling of the latency, and the number of bytes it wrote. The storage
+engines and the console commands are always recorded. The methods of
+the models run once per object, so they are only recorded with
+HBNB_STATS=1 set before models is imported, to keep reloads fast.
+"""
+import functools
+import math
+import threading
+import time
+from os import getenv
+
+ENABLED = bool(getenv("HBNB_STATS"))
+# Buckets per doubling of the latency
+STEPS = 4
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    """Latencies and bytes written of one operation"""
+
+    def __init__(self):
+        """Initialize an empty histogram"""
+        self.count = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.buckets = {}
+
+    def add(self, seconds):
+        """Records one run of the operation"""
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        microseconds = seconds * 10 ** 6
+        bucket = 0
+        if microseconds > 1:
+            bucket = int(math.log2(microseconds) * STEPS)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, percent):
+        """Returns the upper bound in seconds of the bucket holding the
+        given percentile of the latencies, 0 if there is none"""
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= max(rank, 1):
+                return min(2 ** ((bucket + 1) / STEPS) / 10 ** 6, self.max)
+        return 0.0
+
+    def summary(self):
+        """Returns the figures of the histogram, in milliseconds"""
+        mean = self.seconds / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "total_ms": round(self.seconds * 1000, 3),
+            "mean_ms": round(mean * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "bytes": self.bytes
+        }
+
+
+def _histogram(name):
+    """Returns the histogram of an operation, created if needed"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def record(name, seconds, nbytes=0):
+    """Records a run of an operation
+
+    Args:
+        name (str): Name of the operation
+        seconds (float): Time it took
+        nbytes (int): Number of bytes it wrote
+    """
+    with _lock:
+        histogram = _histogram(name)
+        histogram.add(seconds)
+        histogram.bytes += nbytes
+
+
+def instrumented(name, hot=False):
+    """Decorator recording the runs of a function under name
+
+    Args:
+        name (str): Name of the operation
+        hot (bool): The function runs once per object, only record it
+            if ENABLED
+    """
+    def decorator(function):
+        if hot and not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def report():
+    """Returns {operation: figures} of every recorded operation, see
+    Histogram.summary"""
+    with _lock:
+        return {name: histogram.summary()
+                for name, histogram in sorted(_histograms.items())}
+
+
+def reset():
+    """Forgets everything recorded"""
+    with _lock:
+        _histograms.clear()
@@ -0,0 +1,154 @@
+#!/usr/bin/python3
+"""This module defines the full-text index of the stored objects
+
+The text of the indexed attributes is split into lowercase words and
+every word has a postings list: the keys of the objects using it and how
+many times. A search only reads the postings of its words and ranks the
+objects with BM25. TextIndex is maintained by FileStorage like the
+indexes of models.engine.indexes.
+"""
+import heapq
+import math
+import re
+import zlib
+from models.engine.indexes import value_of
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Returns the lowercase words of a text"""
+    return WORD.findall(text.casefold())
+
+
+class TextIndex:
+    """Inverted index of object keys by the words of text attributes
+
+    Every object also keeps the CRC of its text, so adding an object
+    whose text did not change does not split it into words again, which
+    load() extends to the objects of a previously dumped index.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, *attrs):
+        """Initialize an empty index
+
+        Args:
+            attrs (str): Names of the indexed attributes
+        """
+        self.attrs = attrs
+        self.changed = False
+        self.__documents = {}
+        self.__saved = {}
+        self.clear()
+
+    def clear(self):
+        """Drops every indexed key"""
+        if self.__documents:
+            self.changed = True
+        self.__postings = {}
+        self.__documents = {}
+        self.__lengths = {}
+        self.__length = 0
+
+    def __text(self, obj):
+        """Returns the text of the indexed attributes of an object"""
+        values = (value_of(obj, attr) for attr in self.attrs)
+        return "\n".join(value for value in values
+                         if isinstance(value, str))
+
+    def __index(self, key, crc, counts):
+        """Adds the word counts of an object to the postings"""
+        self.__documents[key] = (crc, counts)
+        self.__lengths[key] = length = sum(counts.values())
+        self.__length += length
+        for word, count in counts.items():
+            self.__postings.setdefault(word, {})[key] = count
+
+    def add(self, key, obj):
+        """Indexes the words of the object stored under key"""
+        text = self.__text(obj)
+        crc = zlib.crc32(text.encode())
+        document = self.__documents.get(key)
+        if document is not None and document[0] == crc:
+            return
+        self.remove(key)
+
+        saved = self.__saved.pop(key, None)
+        if saved is not None and saved[0] == crc:
+            counts = saved[1]
+        else:
+            counts = {}
+            for word in tokenize(text):
+                counts[word] = counts.get(word, 0) + 1
+            self.changed = True
+        self.__index(key, crc, counts)
+
+    def update(self, key, obj, name=None):
+        """Re-indexes the object if an indexed attribute changed"""
+        if name is None or name in self.attrs:
+            self.add(key, obj)
+
+    def remove(self, key):
+        """Drops the object stored under key from the index"""
+        document = self.__documents.pop(key, None)
+        if document is None:
+            return
+        self.__length -= self.__lengths.pop(key)
+        for word in document[1]:
+            postings = self.__postings[word]
+            del postings[key]
+            if not postings:
+                del self.__postings[word]
+        self.changed = True
+
+    def search(self, text, limit=None):
+        """Returns (key, score) of the objects using words of text, best
+        first
+
+        Args:
+            text (str): Words to look for, an object using any of them
+                is a hit
+            limit (int): Maximum number of hits returned
+        """
+        count = len(self.__documents)
+        if not count:
+            return []
+        average = self.__length / count
+
+        scores = {}
+        for word in set(tokenize(text)):
+            postings = self.__postings.get(word)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) /
+                           (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                length = self.__lengths[key]
+                norm = self.k1 * (1 - self.b + self.b * length / average)
+                scores[key] = scores.get(key, 0.0) + idf * (
+                        frequency * (self.k1 + 1) / (frequency + norm))
+
+        hits = ((score, key) for key, score in scores.items())
+        if limit is None:
+            ranked = sorted(hits, key=lambda hit: (-hit[0], hit[1]))
+        else:
+            ranked = heapq.nsmallest(limit, hits,
+                                     key=lambda hit: (-hit[0], hit[1]))
+        return [(key, score) for score, key in ranked]
+
+    def dump(self):
+        """Returns the index as a JSON serializable dictionary"""
+        self.changed = False
+        return {"attrs": list(self.attrs),
+                "documents": {key: [crc, counts] for key, (crc, counts)
+                              in self.__documents.items()}}
+
+    def load(self, data):
+        """Keeps a dictionary returned by dump(), ignored if it was made
+        for other attributes: the objects added afterwards whose text did
+        not change reuse its words"""
+        if tuple(data.get("attrs", ())) == self.attrs:
+            self.__saved = {key: (crc, counts) for key, (crc, counts)
+                            in data["documents"].items()}
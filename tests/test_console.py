@@ -0,0 +1,425 @@
+#!/usr/bin/python3
+"""Test suite for the HBNBCommand console"""
+import glob
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import unittest
+from io import StringIO
+from unittest.mock import patch
+from console import HBNBCommand
+from models import storage
+from models.city import City
+from models.engine.file_storage import FileStorage
+from models.state import State
+
+
+def run(command):
+    """Runs a console command and returns what it printed"""
+    with patch('sys.stdout', new=StringIO()) as f:
+        HBNBCommand().onecmd(command)
+    return f.getvalue().strip()
+
+
+class TestConsole(unittest.TestCase):
+    """Test cases for the console commands"""
+
+    def setUp(self):
+        """Use an empty storage on a test file"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = "test_file.json"
+
+    def tearDown(self):
+        """Remove the test file"""
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_create_and_show(self):
+        """Test create prints an id show can find"""
+        obj_id = run("create State")
+        self.assertIn(f"[State] ({obj_id})", run(f"show State {obj_id}"))
+
+    def test_show_errors(self):
+        """Test the error messages of show"""
+        self.assertEqual(run("show"), "** class name missing **")
+        self.assertEqual(run("show Foo"), "** class doesn't exist **")
+        self.assertEqual(run("show State"), "** instance id missing **")
+        self.assertEqual(run("show State 1234"), "** no instance found **")
+
+    def test_update(self):
+        """Test update sets and casts an attribute"""
+        obj_id = run("create Place")
+        run(f'update Place {obj_id} max_guest "4"')
+        run(f'update Place {obj_id} name "My house"')
+        place = storage.get("Place", obj_id)
+        self.assertEqual(place.max_guest, 4)
+        self.assertEqual(place.name, "My house")
+
+    def test_all(self):
+        """Test all lists every instance or those of one class"""
+        state_id = run("create State")
+        city_id = run("create City")
+
+        output = run("all")
+        self.assertIn(state_id, output)
+        self.assertIn(city_id, output)
+
+        output = run("all State")
+        self.assertIn(state_id, output)
+        self.assertNotIn(city_id, output)
+        self.assertEqual(run("all Foo"), "** class doesn't exist **")
+
+    def test_destroy(self):
+        """Test destroy removes the instance"""
+        obj_id = run("create City")
+        run(f"destroy City {obj_id}")
+        self.assertEqual(run(f"show City {obj_id}"),
+                         "** no instance found **")
+
+    def test_begin_commit(self):
+        """Test changes between begin and commit are written once"""
+        run("begin")
+        obj_id = run("create State")
+        run(f'update State {obj_id} name "Lagos"')
+        self.assertFalse(os.path.exists("test_file.json"))
+        run("commit")
+        with open("test_file.json", "r") as f:
+            self.assertIn(obj_id, f.read())
+        self.assertEqual(run("begin x"), "** invalid number **")
+
+    def test_export_import(self):
+        """Test instances exported to a file can be imported back"""
+        state_id = run("create State")
+        run(f'update State {state_id} name "Lagos"')
+        run("create City")
+        run("export State test_export.json")
+        try:
+            with open("test_export.json", "r") as f:
+                lines = f.readlines()
+            self.assertEqual(len(lines), 1)
+            self.assertEqual(json.loads(lines[0])["name"], "Lagos")
+
+            FileStorage._FileStorage__objects = {}
+            self.assertEqual(run("import test_export.json"), "1")
+            self.assertEqual(storage.get("State", state_id).name, "Lagos")
+        finally:
+            os.remove("test_export.json")
+
+    def test_import_without_id(self):
+        """Test records without an id create new instances"""
+        with open("test_import.json", "w") as f:
+            f.write('{"__class__": "Place", "name": "Loft", "max_guest": 2}\n')
+            f.write('{"__class__": "Foo"}\n')
+            f.write('\n')
+        try:
+            output = run("import test_import.json")
+        finally:
+            os.remove("test_import.json")
+
+        self.assertEqual(output.splitlines(),
+                         ["** invalid record on line 2 **", "1"])
+        place = list(storage.all("Place").values())[0]
+        self.assertEqual(place.name, "Loft")
+        self.assertEqual(place.max_guest, 2)
+        with open("test_file.json", "r") as f:
+            self.assertIn(place.id, f.read())
+
+    def test_import_invalid_records(self):
+        """Test records are checked before instances are created"""
+        with open("test_import.json", "w") as f:
+            f.write('{"__class__": "User", "id": "u1"}\n')
+            f.write('{"__class__": "State", "name": "Lagos",'
+                    ' "created_at": "2017-06-14T22:31:03.285259"}\n')
+            f.write('{"__class__": "State", "id": "s1",'
+                    ' "created_at": "yesterday"}\n')
+            f.write('{"__class__": "State", "updated_at": 3}\n')
+            f.write('{"__class__": "State", "id": 1}\n')
+        try:
+            output = run("import test_import.json")
+        finally:
+            os.remove("test_import.json")
+
+        self.assertEqual(output.splitlines(),
+                         ["** invalid record on line 3 **",
+                          "** invalid record on line 4 **",
+                          "** invalid record on line 5 **", "2"])
+        user = storage.get("User", "u1")
+        self.assertEqual(user.created_at, user.updated_at)
+        state = list(storage.all("State").values())[0]
+        self.assertEqual(state.name, "Lagos")
+        self.assertEqual(state.created_at.year, 2017)
+        self.assertEqual(len(storage.all()), 2)
+        with open("test_file.json", "r") as f:
+            self.assertEqual(len(json.load(f)), 2)
+
+    def test_read_only(self):
+        """Test the commands changing the storage are refused"""
+        state_id = run("create State")
+        before = storage.get("State", state_id).to_dict()
+        read_only = FileStorage(read_only=True)
+        with patch("console.storage", read_only), \
+                patch("models.storage", read_only):
+            for command in ("create State", f"destroy State {state_id}",
+                            f'update State {state_id} name "Lagos"',
+                            f'update State {state_id} {{"name": "Lagos"}}',
+                            f'State.destroy("{state_id}")'):
+                self.assertEqual(run(command), "** storage is read only **")
+            self.assertNotIn("Lagos", run(f"show State {state_id}"))
+        self.assertEqual(storage.get("State", state_id).to_dict(), before)
+        self.assertEqual(len(storage.all()), 1)
+
+    def test_convert(self):
+        """Test converting the storage file to binary and back"""
+        run("create State")
+        try:
+            self.assertEqual(run("convert binary test_file.json "
+                                 "test_file.bin"), "")
+            self.assertEqual(run("convert json test_file.bin "
+                                 "test_back.json"), "")
+            with open("test_file.json", "r") as f, \
+                    open("test_back.json", "r") as back:
+                self.assertEqual(json.load(back), json.load(f))
+        finally:
+            for path in ("test_file.bin", "test_back.json"):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.assertEqual(run("convert"), "** format missing **")
+        self.assertEqual(run("convert xml a b"), "** unknown format **")
+        self.assertEqual(run("convert json a"), "** file name missing **")
+        self.assertEqual(run("convert json nowhere.bin b"),
+                         "** file doesn't exist **")
+
+    def test_export_import_errors(self):
+        """Test the error messages of export and import"""
+        self.assertEqual(run("export"), "** class name missing **")
+        self.assertEqual(run("export Foo"), "** class doesn't exist **")
+        self.assertEqual(run("export State"), "** file name missing **")
+        self.assertEqual(run("import"), "** file name missing **")
+        self.assertEqual(run("import nowhere.json"),
+                         "** file doesn't exist **")
+
+    def test_lookup(self):
+        """Test lookup lists the instances with a foreign key"""
+        state = State()
+        city1 = City()
+        city1.state_id = state.id
+        city2 = City()
+
+        output = run(f"lookup City state_id {state.id}")
+        self.assertIn(city1.id, output)
+        self.assertNotIn(city2.id, output)
+
+        city2.state_id = state.id
+        self.assertIn(city2.id, run(f"lookup City state_id {state.id}"))
+
+    def test_query(self):
+        """Test query prints matching instances or aggregates"""
+        ids = []
+        for guests, price in ((2, 100), (4, 300)):
+            obj_id = run("create Place")
+            run(f"update Place {obj_id} max_guest {guests}")
+            run(f"update Place {obj_id} price_by_night {price}")
+            run(f"update Place {obj_id} city_id c1")
+            ids.append(obj_id)
+
+        output = run("query Place where max_guest>=4 price_by_night<1000")
+        self.assertIn(ids[1], output)
+        self.assertNotIn(ids[0], output)
+        self.assertEqual(run("query Place count"), "2")
+        self.assertEqual(run("query Place avg price_by_night by city_id"),
+                         "{'c1': 200.0}")
+        self.assertEqual(run("query State count where name=Lagos"), "0")
+
+    def test_query_errors(self):
+        """Test the error messages of query"""
+        self.assertEqual(run("query"), "** class name missing **")
+        self.assertEqual(run("query Foo"), "** class doesn't exist **")
+        self.assertEqual(run("query Place avg"),
+                         "** attribute name missing **")
+        self.assertEqual(run("query Place count by"),
+                         "** attribute name missing **")
+        self.assertEqual(run("query Place where max_guest"),
+                         "** invalid query **")
+        self.assertEqual(run("query Place median max_guest"),
+                         "** invalid query **")
+
+    def test_near(self):
+        """Test near and nearest follow the updated coordinates"""
+        paris = run("create Place")
+        run(f"update Place {paris} latitude 48.8566")
+        run(f"update Place {paris} longitude 2.3522")
+        london = run("create Place")
+        run(f"update Place {london} latitude 51.5074")
+        run(f"update Place {london} longitude -0.1278")
+        self.assertEqual(storage.get("Place", london).longitude, -0.1278)
+
+        output = run("near Place 48.85 2.35 100")
+        self.assertIn(paris, output)
+        self.assertNotIn(london, output)
+        output = run("nearest Place 51.5 -0.12 1")
+        self.assertIn(london, output)
+        self.assertNotIn(paris, output)
+
+        self.assertEqual(run("near"), "** class name missing **")
+        self.assertEqual(run("near Foo"), "** class doesn't exist **")
+        self.assertEqual(run("near Place 1 2"), "** coordinates missing **")
+        self.assertEqual(run("near Place a b c"), "** invalid number **")
+        self.assertEqual(run("nearest Place 1 2 0.5"),
+                         "** invalid number **")
+
+    def test_search(self):
+        """Test search ranks the instances using the words"""
+        loft = run("create Place")
+        run(f'update Place {loft} name "Sunny loft"')
+        run(f'update Place {loft} description "Loft near the beach"')
+        house = run("create Place")
+        run(f'update Place {house} name "Beach house"')
+
+        output = run("search Place loft beach")
+        self.assertLess(output.index(loft), output.index(house))
+        output = run("search Place house")
+        self.assertIn(house, output)
+        self.assertNotIn(loft, output)
+        self.assertEqual(run("search Place pool"), "[]")
+
+        self.assertEqual(run("search"), "** class name missing **")
+        self.assertEqual(run("search Foo"), "** class doesn't exist **")
+        self.assertEqual(run("search Place"), "** words missing **")
+
+    def test_all_pages(self):
+        """Test all prints pages in the order asked for"""
+        ids = {}
+        for name in ("b", "c", "a"):
+            obj_id = run("create State")
+            run(f'update State {obj_id} name "{name}"')
+            ids[name] = obj_id
+
+        output = run("all State order name")
+        self.assertEqual(eval(output), [str(storage.get("State", ids[name]))
+                                        for name in ("a", "b", "c")])
+        output = run("all State order name limit 1 offset 1")
+        self.assertEqual(len(eval(output)), 1)
+        self.assertIn(ids["b"], output)
+        output = run(f"all State order name after {ids['b']}")
+        self.assertIn(ids["c"], output)
+        self.assertNotIn(ids["a"], output)
+        output = run(f"all order name limit 5 after State.{ids['a']}")
+        self.assertEqual(len(eval(output)), 2)
+        self.assertEqual(run("all City limit 2"), "[]")
+
+        self.assertEqual(run("all State limit x"), "** invalid number **")
+        self.assertEqual(run("all State after 1234"),
+                         "** no instance found **")
+        self.assertEqual(run("all after 1234"), "** no instance found **")
+        self.assertEqual(run("all State order"), "** invalid query **")
+
+    def test_count(self):
+        """Test count and the dot calls"""
+        self.assertEqual(run("count State"), "0")
+        state_ids = [run("create State") for _ in range(3)]
+        run("create City")
+        self.assertEqual(run("count State"), "3")
+        self.assertEqual(run("count"), "4")
+        self.assertEqual(run("State.count()"), "3")
+        run(f"destroy State {state_ids[0]}")
+        self.assertEqual(run("State.count()"), "2")
+
+        output = run("State.all()")
+        self.assertEqual(output, run("all State"))
+        self.assertEqual(len(eval(output)), 2)
+        self.assertIn(state_ids[1], run(f'State.show("{state_ids[1]}")'))
+        run(f'State.destroy("{state_ids[1]}")')
+        self.assertEqual(run("count State"), "1")
+
+        self.assertEqual(run("count Foo"), "** class doesn't exist **")
+        self.assertEqual(run("Foo.count()"), "** class doesn't exist **")
+        self.assertEqual(run("State.show()"), "** instance id missing **")
+        self.assertEqual(run("State.fly()"), "*** Unknown syntax: State.fly()")
+
+    def test_update_dict(self):
+        """Test a dictionary update sets every attribute in one save"""
+        obj_id = run("create Place")
+        with patch.object(storage, "save", wraps=storage.save) as save:
+            run(f'update Place {obj_id} {{"name": "Loft", '
+                f'"max_guest": 4, "latitude": "-12.5", "id": "x"}}')
+        self.assertEqual(save.call_count, 1)
+        place = storage.get("Place", obj_id)
+        self.assertEqual((place.name, place.max_guest, place.latitude),
+                         ("Loft", 4, -12.5))
+        with open("test_file.json", "r") as f:
+            self.assertEqual(json.load(f)[f"Place.{obj_id}"]["name"],
+                             "Loft")
+
+        # Python literals and the dot call
+        run(f"update Place {obj_id} {{'number_rooms': '3'}}")
+        self.assertEqual(place.number_rooms, 3)
+        run(f'Place.update("{obj_id}", {{"name": "Cabin, by the lake"}})')
+        self.assertEqual(place.name, "Cabin, by the lake")
+        run(f'Place.update("{obj_id}", "description", "Quiet, clean")')
+        self.assertEqual(place.description, "Quiet, clean")
+
+        self.assertEqual(run(f"update Place {obj_id} {{name}}"),
+                         "** invalid dictionary **")
+        self.assertEqual(run(f"update Place {obj_id} {{1: 2}}"),
+                         "** invalid dictionary **")
+        self.assertEqual(run('update Place 1234 {"name": "Loft"}'),
+                         "** no instance found **")
+        self.assertEqual(run('Place.update()'), "** instance id missing **")
+
+    def test_stats(self):
+        """Test stats prints the operations run since the last reset"""
+        run("stats reset")
+        obj_id = run("create State")
+        run(f"show State {obj_id}")
+        run("nothing")
+
+        lines = run("stats").splitlines()
+        self.assertEqual(lines[0].split(),
+                         ["operation", "count", "total_ms", "mean_ms",
+                          "p50_ms", "p99_ms", "max_ms", "bytes"])
+        rows = {line.split()[0]: line.split()[1:] for line in lines[1:]}
+        for name in ("console.create", "console.show", "console.default",
+                     "console.split", "console.validate_class_and_id",
+                     "FileStorage.new", "FileStorage.save",
+                     "FileStorage.write"):
+            self.assertEqual(rows[name][0], "1")
+        self.assertEqual(int(rows["FileStorage.write"][-1]),
+                         os.path.getsize("test_file.json"))
+
+        # Only the reset itself is left
+        run("stats reset")
+        lines = run("stats").splitlines()
+        self.assertEqual([line.split()[:2] for line in lines[1:]],
+                         [["console.stats", "1"]])
+
+    def test_profile(self):
+        """Test --profile writes the statistics of the session"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "session.prof")
+            subprocess.run([sys.executable,
+                            os.path.join(root, "console.py"),
+                            f"--profile={path}"],
+                           input="create State\nquit\n", cwd=tmp_dir,
+                           check=True, capture_output=True, text=True)
+            profile = pstats.Stats(path)
+            self.assertTrue(any(function[2] == "do_create"
+                                for function in profile.stats))
+
+    def test_lookup_errors(self):
+        """Test the error messages of lookup"""
+        self.assertEqual(run("lookup"), "** class name missing **")
+        self.assertEqual(run("lookup Foo"), "** class doesn't exist **")
+        self.assertEqual(run("lookup City"), "** attribute name missing **")
+        self.assertEqual(run("lookup City state_id"), "** value missing **")
+
+
+if __name__ == '__main__':
+    unittest.main()
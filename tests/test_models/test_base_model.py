@@ -1,6 +1,12 @@
 import unittest
 from models.base_model import BaseModel
+from models.place import Place
 from datetime import datetime
+import glob
+import json
+import os
+import subprocess
+import sys
 import uuid
 
 class TestBaseModel(unittest.TestCase):
@@ -35,5 +41,78 @@ class TestBaseModel(unittest.TestCase):
         self.assertEqual(model_dict["created_at"], model.created_at.isoformat())
         self.assertEqual(model_dict["updated_at"], model.updated_at.isoformat())
 
+    def test_kwargs_timestamps(self):
+        """Test created_at/updated_at are parsed from their isoformat."""
+        model = BaseModel()
+        copy = BaseModel(**model.to_dict())
+        self.assertEqual(copy.created_at, model.created_at)
+        self.assertEqual(copy.updated_at, model.updated_at)
+        self.assertEqual(copy.to_dict(), model.to_dict())
+
+    def test_kwargs_timestamps_without_microseconds(self):
+        """Test timestamps without microseconds are accepted."""
+        model = BaseModel(id="1234", created_at="2024-05-01T10:20:30",
+                          updated_at="2024-05-01T10:20:30.000500")
+        self.assertEqual(model.created_at, datetime(2024, 5, 1, 10, 20, 30))
+        self.assertEqual(model.updated_at.microsecond, 500)
+
+    def test_defaults(self):
+        """Test the declared attributes and defaults are recorded."""
+        self.assertEqual(BaseModel._defaults, {})
+        self.assertEqual(Place._defaults["number_rooms"], 0)
+        self.assertEqual(Place._defaults["amenity_ids"], [])
+
+
+class TestCompactModels(unittest.TestCase):
+    """Test the models with HBNB_COMPACT_MODELS set, in a new process."""
+
+    script = """
+import json
+from models.engine.file_storage import FileStorage
+from models.place import Place
+FileStorage._FileStorage__file_path = "test_file.json"
+storage = FileStorage()
+place = Place()
+place.name = "Loft"
+place.amenity_ids.append("kept")
+place.extra = 1
+storage.save()
+FileStorage._FileStorage__objects = {}
+storage.reload()
+copy = storage.get(Place, place.id)
+print(json.dumps({
+    "slots": hasattr(Place, "__slots__"),
+    "dict": place.__dict__,
+    "default": place.number_rooms,
+    "amenity_ids": place.amenity_ids,
+    "str": str(place) == str(copy),
+    "to_dict": place.to_dict() == copy.to_dict(),
+    "keys": sorted(copy.to_dict())
+}))
+"""
+
+    def tearDown(self):
+        """Remove the test file."""
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_compact(self):
+        """Test slots hold the declared attributes, the rest still works."""
+        env = dict(os.environ, HBNB_COMPACT_MODELS="1")
+        output = subprocess.run([sys.executable, "-c", self.script],
+                                env=env, check=True, capture_output=True,
+                                text=True).stdout
+        result = json.loads(output)
+        self.assertTrue(result["slots"])
+        self.assertEqual(result["dict"], {"extra": 1})
+        self.assertEqual(result["default"], 0)
+        self.assertEqual(result["amenity_ids"], ["kept"])
+        self.assertTrue(result["str"])
+        self.assertTrue(result["to_dict"])
+        self.assertEqual(result["keys"], ["__class__", "amenity_ids",
+                                          "created_at", "extra", "id",
+                                          "name", "updated_at"])
+
 if __name__ == "__main__":
     unittest.main()
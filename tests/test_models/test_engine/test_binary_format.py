@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+"""Test suite for the binary snapshot format"""
+import json
+import os
+import unittest
+from models.engine import binary_format
+from models.place import Place
+from models.user import User
+
+
+class TestBinaryFormat(unittest.TestCase):
+    """Test cases for the binary snapshot format"""
+
+    def setUp(self):
+        """Build the dictionaries of a few objects"""
+        place = Place()
+        place.name = "Loft"
+        place.number_rooms = 3
+        place.latitude = 37.77
+        place.amenity_ids = ["a", "b"]
+        user = User()
+        user.email = "été@example.com"
+        user.id = "not-a-uuid"
+        self.obj_dict = {f"Place.{place.id}": place.to_dict(),
+                         f"User.{user.id}": user.to_dict()}
+
+    def tearDown(self):
+        """Remove the converted files"""
+        for path in ("test_file.json", "test_file.bin", "test_back.json"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def test_round_trip(self):
+        """Test loads returns exactly what dumps was given"""
+        data = binary_format.dumps(self.obj_dict)
+        self.assertEqual(binary_format.loads(data), self.obj_dict)
+
+    def test_values_kept_as_is(self):
+        """Test values the compact encodings cannot hold read back
+        identical"""
+        value = {"id": "1", "__class__": "BaseModel",
+                 "created_at": "2020-01-01T00:00:00+00:00",
+                 "updated_at": "2020-01-01T00:00:00",
+                 "flag": True, "none": None, "big": 2 ** 70,
+                 "upper": "A7C3B7A3-4D8E-4A1B-9F5E-2C3D4E5F6A7B"}
+        data = binary_format.dumps({"BaseModel.1": value})
+        self.assertEqual(binary_format.loads(data), {"BaseModel.1": value})
+
+    def test_smaller_than_json(self):
+        """Test the binary snapshot is smaller than the JSON one"""
+        data = binary_format.dumps(self.obj_dict)
+        self.assertLess(len(data), len(json.dumps(self.obj_dict)))
+
+    def test_index(self):
+        """Test every record is found through the index"""
+        snapshot = binary_format.Snapshot(
+                binary_format.dumps(self.obj_dict))
+        self.assertEqual(snapshot.count, len(self.obj_dict))
+        for i in range(snapshot.count):
+            digest, offset, size = binary_format.INDEX_ENTRY.unpack_from(
+                    snapshot.buf, snapshot.index_offset +
+                    i * binary_format.INDEX_ENTRY.size)
+            key, value = snapshot.record(offset)
+            self.assertEqual(binary_format.key_hash(key), digest)
+            self.assertEqual(value, self.obj_dict[key])
+
+    def test_encoder_keeps_records(self):
+        """Test records encoded before a schema grew are written as is"""
+        encoder = binary_format.Encoder()
+        key, value = next(iter(self.obj_dict.items()))
+        record = encoder.record(key, value)
+        other = dict(value, id="other", description="new field")
+        records = [(key, record),
+                   ("Place.other", encoder.record("Place.other", other))]
+        self.assertEqual(binary_format.loads(encoder.dumps(records)),
+                         {key: value, "Place.other": other})
+
+    def test_version_1(self):
+        """Test snapshots of the first version, without the number of
+        fields of every record, are still read"""
+        fmt = binary_format
+        value = {"id": "1", "__class__": "BaseModel", "name": "first"}
+        data = fmt.dumps({"BaseModel.1": value})
+        snapshot = fmt.Snapshot(data)
+        start = snapshot.records_offset
+        end = snapshot.index_offset
+        # Drop the number of fields following the class of the record
+        record = data[start:start + 2] + data[start + 4:end]
+        digest, offset, size = fmt.INDEX_ENTRY.unpack_from(data, end)
+        data = (fmt.HEADER.pack(fmt.MAGIC, 1) +
+                data[fmt.HEADER.size:start] + record +
+                fmt.INDEX_ENTRY.pack(digest, offset, len(record)) +
+                fmt.TRAILER.pack(start, start + len(record), 1, fmt.MAGIC))
+        self.assertEqual(fmt.loads(data), {"BaseModel.1": value})
+        self.assertEqual(fmt.Snapshot(data).find("BaseModel.1"), value)
+
+    def test_mismatched_key(self):
+        """Test a key that is not <class>.<id> is rejected"""
+        value = next(iter(self.obj_dict.values()))
+        with self.assertRaises(ValueError):
+            binary_format.dumps({"Place.other": value})
+
+    def test_not_binary(self):
+        """Test a JSON snapshot is not taken for a binary one"""
+        with self.assertRaises(ValueError):
+            binary_format.Snapshot(b"{}" + bytes(40))
+        self.assertFalse(binary_format.is_binary("test_file.json"))
+
+    def test_conversion(self):
+        """Test converting JSON to binary and back"""
+        with open("test_file.json", "w") as f:
+            json.dump(self.obj_dict, f)
+        binary_format.convert("binary", "test_file.json", "test_file.bin")
+        self.assertTrue(binary_format.is_binary("test_file.bin"))
+        binary_format.convert("json", "test_file.bin", "test_back.json")
+        with open("test_back.json", "r") as f:
+            self.assertEqual(json.load(f), self.obj_dict)
+        with self.assertRaises(ValueError):
+            binary_format.convert("xml", "test_file.json", "test_file.xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""Test suite for the queries and the columnar view of the Places"""
+import unittest
+from datetime import datetime
+from models.engine.columns import PlaceColumns, evaluate, page
+
+
+def place(city_id, price, guests, latitude=0.0):
+    """Returns the dictionary of a Place"""
+    return {"__class__": "Place", "city_id": city_id,
+            "price_by_night": price, "max_guest": guests,
+            "latitude": latitude}
+
+
+class TestColumns(unittest.TestCase):
+    """Test cases for evaluate and PlaceColumns"""
+
+    def setUp(self):
+        """Index a few places"""
+        self.items = [("Place.1", place("a", 100, 2, 37.5)),
+                      ("Place.2", place("a", 200, 4, 37.9)),
+                      ("Place.3", place("b", 50, 6, 40.1)),
+                      ("Place.4", place("b", "free", "many"))]
+        self.columns = PlaceColumns()
+        for key, obj in self.items:
+            self.columns.add(key, obj)
+
+    def check(self, *query):
+        """Test the columns and a scan give the same result"""
+        expected = evaluate(self.items, *query)
+        result = self.columns.query(*query)
+        if isinstance(expected, list):
+            self.assertEqual(sorted(result), sorted(expected))
+        else:
+            self.assertEqual(result, expected)
+        return result
+
+    def test_filter(self):
+        """Test conditions on numbers and codes"""
+        self.assertEqual(sorted(self.check([("max_guest", ">=", 4)])),
+                         ["Place.2", "Place.3"])
+        self.assertEqual(self.check([("city_id", "=", "b"),
+                                     ("price_by_night", "<", 100)]),
+                         ["Place.3"])
+        self.check([("latitude", ">", 37.6), ("latitude", "<", 40)])
+        self.check([("city_id", "=", 3)])
+        self.assertEqual(evaluate(self.items, [("max_guest", "=", "many")]),
+                         ["Place.4"])
+
+    def test_aggregates(self):
+        """Test the aggregates skip values that are not numbers"""
+        self.assertEqual(self.check([], "count"), 4)
+        self.assertEqual(self.check([], "avg", "price_by_night"), 350 / 3)
+        self.assertEqual(self.check([], "max", "max_guest"), 6)
+        self.assertIsNone(self.check([("city_id", "=", "c")], "min",
+                                     "max_guest"))
+        self.assertEqual(self.check([], "sum", "price_by_night", "city_id"),
+                         {"a": 300, "b": 50})
+
+    def test_update_and_remove(self):
+        """Test the rows follow the changes of the objects"""
+        obj = place("c", 10, 1)
+        self.columns.update("Place.5", obj)
+        obj["price_by_night"] = 20
+        self.columns.update("Place.5", obj, "price_by_night")
+        self.columns.remove("Place.1")
+        self.columns.remove("Place.1")
+        self.assertEqual(sorted(self.columns.query()),
+                         ["Place.2", "Place.3", "Place.4", "Place.5"])
+        self.assertEqual(self.columns.query([], "sum", "price_by_night",
+                                            "city_id"),
+                         {"a": 200, "b": 50, "c": 20})
+
+        self.columns.clear()
+        self.assertEqual(self.columns.query([], "count"), 0)
+
+    def test_group_by_number(self):
+        """Test groups by a number column holding other values are left
+        to evaluate"""
+        self.assertFalse(self.columns.supports([], None, "max_guest"))
+        self.assertEqual(evaluate(self.items, [], "count", None,
+                                  "max_guest"),
+                         {2: 1, 4: 1, 6: 1, "many": 1})
+        self.columns.remove("Place.4")
+        self.items.pop()
+        self.assertTrue(self.columns.supports([], None, "max_guest"))
+        self.assertEqual(self.check([], "count", None, "max_guest"),
+                         {2: 1, 4: 1, 6: 1})
+
+    def test_aggregate_codes(self):
+        """Test aggregates of city_id are left to evaluate, but count"""
+        for function in ("max", "sum", "avg"):
+            self.assertFalse(self.columns.supports([], "city_id", None,
+                                                   function))
+            self.assertIsNone(evaluate(self.items, [], function,
+                                       "city_id"))
+        self.assertTrue(self.columns.supports([], "city_id", None,
+                                              "count"))
+        self.assertEqual(self.check([], "count", "city_id"), 4)
+
+    def test_unknown(self):
+        """Test unknown operators and aggregates are rejected"""
+        with self.assertRaises(ValueError):
+            self.columns.query([("max_guest", "~", 1)])
+        with self.assertRaises(ValueError):
+            evaluate(self.items, [], "median", "max_guest")
+        self.assertFalse(self.columns.supports([("name", "=", "Loft")]))
+        self.assertFalse(self.columns.supports([("max_guest", "=", "x")]))
+        self.assertTrue(self.columns.supports([("city_id", "=", "a")],
+                                              "max_guest", "city_id"))
+
+    def test_page(self):
+        """Test pages follow the order and start after the cursor"""
+        keys = [key for key, obj in page(self.items)]
+        self.assertEqual(keys, ["Place.1", "Place.2", "Place.3", "Place.4"])
+        self.assertEqual([key for key, obj in page(self.items, offset=1,
+                                                   limit=2)],
+                         ["Place.2", "Place.3"])
+        self.assertEqual([key for key, obj in page(
+                          self.items, after=self.items[2])], ["Place.4"])
+
+        # Numbers first, then strings, the keys breaking ties
+        ordered = [key for key, obj in page(self.items, "price_by_night")]
+        self.assertEqual(ordered, ["Place.3", "Place.1", "Place.2",
+                                   "Place.4"])
+        self.assertEqual([key for key, obj in page(
+                          self.items, "city_id", 1, 2)],
+                         ["Place.2", "Place.3"])
+        self.assertEqual([key for key, obj in page(
+                          self.items, "price_by_night", limit=2,
+                          after=self.items[0])], ["Place.2", "Place.4"])
+        self.assertEqual(list(page(self.items, limit=0)), [])
+
+    def test_page_timestamps(self):
+        """Test objects and dictionaries sort by timestamp together"""
+        items = [("Place.1", {"created_at": "2020-01-02T00:00:00"}),
+                 ("Place.2", {"created_at": datetime(2020, 1, 1)}),
+                 ("Place.3", {"created_at": None})]
+        self.assertEqual([key for key, obj in page(items, "created_at")],
+                         ["Place.2", "Place.1", "Place.3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
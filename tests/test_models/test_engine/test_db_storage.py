@@ -0,0 +1,244 @@
+#!/usr/bin/python3
+"""Test suite for the DBStorage class"""
+import os
+import sqlite3
+import unittest
+from models.engine.db_storage import DBStorage
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.user import User
+
+
+class TestDBStorage(unittest.TestCase):
+    """Test cases for the DBStorage class"""
+
+    def setUp(self):
+        """Set up a storage on a test database"""
+        self.storage = DBStorage("test_file.db")
+        self.storage.reload()
+
+    def tearDown(self):
+        """Remove the test database"""
+        self.storage.close()
+        try:
+            os.remove("test_file.db")
+        except FileNotFoundError:
+            pass
+
+    def reopen(self):
+        """Returns a new storage on the test database"""
+        self.storage.close()
+        self.storage = DBStorage("test_file.db")
+        self.storage.reload()
+        return self.storage
+
+    def test_tables_and_indexes(self):
+        """Test there is one table per class and foreign-key indexes"""
+        connection = sqlite3.connect("test_file.db")
+        names = {row[0] for row in connection.execute(
+                "SELECT name FROM sqlite_master")}
+        connection.close()
+        for name in ("User", "Place", "Review", "State", "City", "Amenity",
+                     "BaseModel", "Place_city_id", "Review_place_id",
+                     "City_state_id"):
+            self.assertIn(name, names)
+
+    def test_save_and_get(self):
+        """Test saved objects are read back with all their attributes"""
+        place = Place()
+        place.name = "Loft"
+        place.max_guest = 4
+        place.latitude = 6.5
+        place.amenity_ids = ["a1", "a2"]
+        place.custom = {"pool": True}
+        self.storage.new(place)
+        self.storage.save()
+
+        loaded = self.reopen().get(Place, place.id)
+        self.assertIsNot(loaded, place)
+        self.assertEqual(loaded.to_dict(), place.to_dict())
+        self.assertIsNone(self.storage.get("Place", "1234"))
+
+    def test_all(self):
+        """Test all() returns saved and new objects"""
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        place = Place()
+        self.storage.new(place)
+
+        self.assertEqual(set(self.storage.all()),
+                         {f"State.{state.id}", f"Place.{place.id}"})
+        self.assertEqual(list(self.storage.all(State)),
+                         [f"State.{state.id}"])
+        self.assertEqual(list(self.reopen().all("State")),
+                         [f"State.{state.id}"])
+        self.assertEqual(self.storage.all("Foo"), {})
+
+    def test_delete(self):
+        """Test deleted objects are removed on save"""
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.delete(self.storage.get(State, state.id))
+        self.assertIsNone(self.storage.get(State, state.id))
+        self.storage.save()
+        self.assertIsNone(self.reopen().get(State, state.id))
+
+    def test_lookup(self):
+        """Test lookup() finds objects by foreign key"""
+        review1 = Review()
+        review1.place_id = "p1"
+        review2 = Review()
+        review2.place_id = "p2"
+        self.storage.new(review1)
+        self.storage.new(review2)
+        self.storage.save()
+
+        storage = self.reopen()
+        self.assertEqual(list(storage.lookup(Review, "place_id", "p1")),
+                         [f"Review.{review1.id}"])
+        self.assertEqual(len(storage.lookup("Review", "text", "")), 2)
+        self.assertEqual(storage.lookup("Review", "text", "Nice"), {})
+
+    def test_query(self):
+        """Test query() filters and aggregates saved and unsaved objects"""
+        for price, city_id in ((100, "c1"), (200, "c1"), (50, "c2")):
+            place = Place()
+            place.price_by_night = price
+            place.city_id = city_id
+            self.storage.new(place)
+        self.storage.save()
+        self.storage.new(Place())
+
+        self.assertEqual(self.storage.query(Place, [], "count"), 4)
+        self.assertEqual(
+                len(self.storage.query(Place, [("price_by_night", ">", 60)])),
+                2)
+        self.assertEqual(self.reopen().query("Place", [], "avg",
+                                             "price_by_night", "city_id"),
+                         {"c1": 150, "c2": 50})
+
+    def test_spatial_search(self):
+        """Test the geospatial searches"""
+        paris = Place()
+        paris.latitude, paris.longitude = 48.8566, 2.3522
+        london = Place()
+        london.latitude, london.longitude = 51.5074, -0.1278
+        self.storage.new(paris)
+        self.storage.new(london)
+        self.storage.save()
+
+        storage = self.reopen()
+        self.assertEqual(list(storage.within_radius(Place, 48.85, 2.35, 100)),
+                         [f"Place.{paris.id}"])
+        self.assertEqual(list(storage.nearest(Place, 52, 0, 1)),
+                         [f"Place.{london.id}"])
+        self.assertEqual(len(storage.within_bbox(Place, 40, -5, 55, 5)), 2)
+
+    def test_count(self):
+        """Test count() adds the changes not saved to the rows"""
+        states = [State() for _ in range(3)]
+        for state in states:
+            self.storage.new(state)
+        self.assertEqual(self.storage.count(State), 3)
+        self.storage.save()
+
+        storage = self.reopen()
+        self.assertEqual(storage.count("State"), 3)
+        storage.delete(storage.get(State, states[0].id))
+        storage.new(State())
+        storage.new(User())
+        self.assertEqual(storage.count(State), 3)
+        self.assertEqual(storage.count(), 4)
+        storage.save()
+        self.assertEqual(storage.count(State), 3)
+        self.assertEqual(storage.count("Foo"), 0)
+
+    def test_stream(self):
+        """Test stream() pages through the saved and new objects"""
+        states = []
+        for name in ("b", "c", "a"):
+            state = State()
+            state.name = name
+            self.storage.new(state)
+            states.append(state)
+        self.storage.save()
+        storage = self.reopen()
+        state = State()
+        state.name = "d"
+        storage.new(state)
+
+        names = [obj.name for key, obj in storage.stream(State, "name")]
+        self.assertEqual(names, ["a", "b", "c", "d"])
+        page = list(storage.stream(State, "name", limit=2,
+                                   after=f"State.{states[0].id}"))
+        self.assertEqual([obj.name for key, obj in page], ["c", "d"])
+        self.assertEqual(len(list(storage.stream(offset=2))), 2)
+
+    def test_stream_keeps_no_object(self):
+        """Test stream() reads the rows without keeping their objects"""
+        states = []
+        for name in ("b", "c", "a", "e"):
+            state = State()
+            state.name = name
+            self.storage.new(state)
+            states.append(state)
+        self.storage.save()
+        storage = self.reopen()
+        changed = storage.get(State, states[0].id)
+        changed.name = "f"
+        storage.delete(storage.get(State, states[1].id))
+
+        names = [obj.name for key, obj in storage.stream(State, "name")]
+        self.assertEqual(names, ["a", "e", "f"])
+        self.assertEqual(len(list(storage.stream(State))), 3)
+        page = storage.stream(State, "name", limit=1,
+                              after=f"State.{states[2].id}")
+        self.assertEqual([key for key, obj in page],
+                         [f"State.{states[3].id}"])
+        self.assertEqual(len(storage._DBStorage__objects), 1)
+
+    def test_search(self):
+        """Test the text search ranks the objects using the words"""
+        loft = Place()
+        loft.name = "Sunny loft"
+        loft.description = "A loft near the beach"
+        house = Place()
+        house.name = "Beach house"
+        self.storage.new(loft)
+        self.storage.new(house)
+        self.storage.save()
+
+        storage = self.reopen()
+        self.assertEqual(list(storage.search(Place, "beach loft")),
+                         [f"Place.{loft.id}", f"Place.{house.id}"])
+        self.assertEqual(list(storage.search("Place", "house", 1)),
+                         [f"Place.{house.id}"])
+        self.assertEqual(storage.search(User, "loft"), {})
+
+    def test_batch(self):
+        """Test saves are deferred until commit() in a batch"""
+        self.storage.begin()
+        state = State()
+        self.storage.new(state)
+        self.storage.save()
+        self.storage.close()
+        self.assertIsNone(self.reopen().get(State, state.id))
+
+        self.storage.begin(1)
+        self.storage.new(state)
+        self.storage.save()
+        self.assertIsNotNone(self.reopen().get(State, state.id))
+
+    def test_mark_dirty(self):
+        """Test only objects of the storage are flagged"""
+        state = State()
+        self.storage.mark_dirty(state)
+        self.storage.save()
+        self.assertIsNone(self.reopen().get(State, state.id))
+
+
+if __name__ == '__main__':
+    unittest.main()
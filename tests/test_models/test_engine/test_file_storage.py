@@ -1,8 +1,21 @@
 import unittest
+import glob
+import io
 import os
 import json
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
 from models.base_model import BaseModel
+from models.city import City
+from models.place import Place
+from models.review import Review
+from models.state import State
+from models.engine import binary_format
 from models.engine.file_storage import FileStorage
+from models.engine.journal import Journal
 
 class TestFileStorage(unittest.TestCase):
     def setUp(self):
@@ -16,10 +29,14 @@ class TestFileStorage(unittest.TestCase):
     def tearDown(self):
         """Clean up after each test method"""
         # Remove the test file if it exists
-        try:
-            os.remove(FileStorage._FileStorage__file_path)
-        except FileNotFoundError:
-            pass
+        for path in ([FileStorage._FileStorage__file_path] +
+                     glob.glob("test_file.*.text")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        # Remove the journal files if any
+        Journal(FileStorage._FileStorage__file_path).discard()
         # Reset the storage
         FileStorage._FileStorage__objects = {}
 
@@ -48,6 +65,13 @@ class TestFileStorage(unittest.TestCase):
         self.assertIn(expected_key, self.storage.all())
         self.assertEqual(self.storage.all()[expected_key], test_obj)
 
+    def test_all_read_only(self):
+        """Test all() cannot be changed behind the storage's back"""
+        obj = BaseModel()
+        with self.assertRaises(TypeError):
+            del self.storage.all()[f"BaseModel.{obj.id}"]
+        self.assertEqual(self.storage.count(BaseModel), 1)
+
     def test_save_method(self):
         """Test the save() method"""
         # Create a test object
@@ -109,6 +133,29 @@ class TestFileStorage(unittest.TestCase):
         except Exception as e:
             self.fail(f"reload() raised {type(e).__name__} unexpectedly!")
 
+    def test_reload_invalid_record(self):
+        """Test reload() skips the invalid records with a warning"""
+        obj = BaseModel()
+        self.storage.save()
+        with open(FileStorage._FileStorage__file_path, "r") as f:
+            data = json.load(f)
+        data["BaseModel.bad"] = {"__class__": "BaseModel", "id": "bad",
+                                 "created_at": "yesterday"}
+        with open(FileStorage._FileStorage__file_path, "w") as f:
+            json.dump(data, f)
+
+        FileStorage._FileStorage__objects = {}
+        with self.assertWarnsRegex(UserWarning, "BaseModel.bad"):
+            self.storage.reload()
+        self.assertEqual(list(self.storage.all()), [f"BaseModel.{obj.id}"])
+
+    def test_reload_unreadable_file(self):
+        """Test reload() fails on a file it cannot parse"""
+        with open(FileStorage._FileStorage__file_path, "w") as f:
+            f.write('{"BaseModel.1": {')
+        with self.assertRaises(ValueError):
+            self.storage.reload()
+
     def test_multiple_objects(self):
         """Test storing multiple objects"""
         # Create multiple objects
@@ -169,5 +216,1004 @@ class TestFileStorage(unittest.TestCase):
         self.assertEqual(len(objects), 0, 
                         "__objects should be empty")
 
+    def test_save_reuses_unchanged_objects(self):
+        """Test save() only serializes the objects that changed"""
+        obj1 = BaseModel()
+        obj2 = BaseModel()
+        self.storage.save()
+
+        calls = []
+        to_dict = BaseModel.to_dict
+
+        def counting_to_dict(obj):
+            calls.append(obj.id)
+            return to_dict(obj)
+
+        BaseModel.to_dict = counting_to_dict
+        try:
+            obj2.name = "changed"
+            self.storage.save()
+        finally:
+            BaseModel.to_dict = to_dict
+        self.assertEqual(calls, [obj2.id])
+
+        with open(FileStorage._FileStorage__file_path, 'r') as f:
+            saved_data = json.load(f)
+        self.assertEqual(saved_data[f"BaseModel.{obj1.id}"], obj1.to_dict())
+        self.assertEqual(saved_data[f"BaseModel.{obj2.id}"]["name"],
+                         "changed")
+
+    def test_mark_dirty_ignores_unstored_objects(self):
+        """Test objects not in storage are never flagged"""
+        obj = BaseModel(id="1234", created_at="2024-01-01T00:00:00.000001",
+                        updated_at="2024-01-01T00:00:00.000001")
+        self.storage.mark_dirty(obj)
+        self.assertNotIn("BaseModel.1234",
+                         FileStorage._FileStorage__dirty)
+
+    def test_all_with_class(self):
+        """Test all(cls) only returns the objects of that class"""
+        state = State()
+        city = City()
+        base = BaseModel()
+
+        self.assertEqual(self.storage.all(State),
+                         {f"State.{state.id}": state})
+        self.assertEqual(self.storage.all("City"), {f"City.{city.id}": city})
+        self.assertEqual(self.storage.all("Review"), {})
+        self.assertEqual(len(self.storage.all()), 3)
+
+        self.storage.delete(state)
+        self.assertEqual(self.storage.all(State), {})
+        self.assertIn(f"BaseModel.{base.id}", self.storage.all(BaseModel))
+
+    def test_all_with_class_after_reset(self):
+        """Test all(cls) follows a replaced storage dictionary"""
+        State()
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.storage.all(State), {})
+
+    def test_get_method(self):
+        """Test the get() method"""
+        test_obj = BaseModel()
+        self.assertIs(self.storage.get(BaseModel, test_obj.id), test_obj)
+        self.assertIs(self.storage.get("BaseModel", test_obj.id), test_obj)
+        self.assertIsNone(self.storage.get("BaseModel", "1234"))
+
+    def test_lookup_method(self):
+        """Test lookup() finds objects by foreign key"""
+        state = State()
+        city1 = City()
+        city1.state_id = state.id
+        city2 = City()
+        city2.state_id = state.id
+        other = City()
+        other.state_id = "other"
+
+        cities = self.storage.lookup(City, "state_id", state.id)
+        self.assertEqual(set(cities), {f"City.{city1.id}",
+                                       f"City.{city2.id}"})
+
+        self.storage.delete(city2)
+        cities = self.storage.lookup("City", "state_id", state.id)
+        self.assertEqual(list(cities), [f"City.{city1.id}"])
+
+        # Attributes without an index are looked up with a scan
+        city1.name = "Paris"
+        cities = self.storage.lookup("City", "name", "Paris")
+        self.assertEqual(list(cities), [f"City.{city1.id}"])
+
+    def test_lookup_after_reload(self):
+        """Test reloaded objects are indexed"""
+        review = Review()
+        review.place_id = "1234"
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+
+        reviews = self.storage.lookup(Review, "place_id", "1234")
+        self.assertEqual(list(reviews), [f"Review.{review.id}"])
+
+    def test_query(self):
+        """Test query() on the columns of Place and on other classes"""
+        places = []
+        for price, guests in ((100, 2), (200, 4), (300, 6)):
+            place = Place()
+            place.price_by_night = price
+            place.max_guest = guests
+            place.city_id = "c1"
+            places.append(place)
+        places[2].city_id = "c2"
+
+        objs = self.storage.query(Place, [("max_guest", ">=", 4)])
+        self.assertEqual(set(objs), {f"Place.{places[1].id}",
+                                     f"Place.{places[2].id}"})
+        self.assertEqual(self.storage.query(Place, [], "avg",
+                                            "price_by_night", "city_id"),
+                         {"c1": 150, "c2": 300})
+
+        self.storage.delete(places[0])
+        places[1].price_by_night = 250
+        self.assertEqual(self.storage.query(Place, [("city_id", "=", "c1")],
+                                            "sum", "price_by_night"), 250)
+
+        state = State()
+        state.name = "Lagos"
+        self.assertEqual(list(self.storage.query(State,
+                                                 [("name", "=", "Lagos")])),
+                         [f"State.{state.id}"])
+
+        FileStorage._FileStorage__objects = {}
+        self.assertEqual(self.storage.query(Place, [], "count"), 0)
+
+    def test_spatial_search(self):
+        """Test the geospatial index follows the Place coordinates"""
+        paris = Place()
+        paris.latitude, paris.longitude = 48.8566, 2.3522
+        london = Place()
+        london.latitude, london.longitude = 51.5074, -0.1278
+
+        near = self.storage.within_radius(Place, 48.85, 2.35, 100)
+        self.assertEqual(list(near), [f"Place.{paris.id}"])
+        nearest = self.storage.nearest("Place", 50, 0, 2)
+        self.assertEqual(list(nearest), [f"Place.{london.id}",
+                                         f"Place.{paris.id}"])
+        box = self.storage.within_bbox(Place, 45, -5, 55, 0)
+        self.assertEqual(list(box), [f"Place.{london.id}"])
+
+        london.longitude = 2.36
+        london.latitude = 48.86
+        self.assertEqual(len(self.storage.within_radius(Place, 48.85, 2.35,
+                                                        100)), 2)
+        self.storage.delete(paris)
+        self.assertEqual(list(self.storage.nearest(Place, 48.85, 2.35, 5)),
+                         [f"Place.{london.id}"])
+
+        # Classes without a geospatial index are gone through
+        self.assertEqual(self.storage.within_radius(State, 0, 0, 10), {})
+
+    def test_count(self):
+        """Test count() follows new() and delete()"""
+        self.assertEqual(self.storage.count(), 0)
+        state = State()
+        City()
+        City()
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertEqual(self.storage.count("City"), 2)
+        self.assertEqual(self.storage.count(), 3)
+        self.storage.delete(state)
+        self.assertEqual(self.storage.count(State), 0)
+
+        self.storage.save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(), 2)
+
+    def test_stream(self):
+        """Test stream() yields pages in the order asked for"""
+        states = []
+        for name in ("b", "c", "a"):
+            state = State()
+            state.name = name
+            states.append(state)
+        city = City()
+
+        keys = [key for key, obj in self.storage.stream()]
+        self.assertEqual(sorted(keys), sorted(self.storage.all()))
+        self.assertEqual(len(list(self.storage.stream(State))), 3)
+        by_name = [obj for key, obj in self.storage.stream(State, "name")]
+        self.assertEqual([obj.name for obj in by_name], ["a", "b", "c"])
+
+        first = list(self.storage.stream(State, "name", limit=2))
+        self.assertEqual([obj.name for key, obj in first], ["a", "b"])
+        rest = list(self.storage.stream(State, "name", after=first[-1][0]))
+        self.assertEqual([obj.name for key, obj in rest], ["c"])
+        self.assertEqual([obj for key, obj in self.storage.stream(
+                          "State", offset=1, limit=1)], [states[1]])
+        self.assertEqual([key for key, obj in self.storage.stream(
+                          City, "created_at")], [f"City.{city.id}"])
+
+    def test_search(self):
+        """Test the text index follows the objects and is saved"""
+        loft = Place()
+        loft.name = "Sunny loft"
+        loft.description = "A loft near the beach"
+        house = Place()
+        house.name = "Beach house"
+        state = State()
+        state.name = "California"
+
+        self.assertEqual(list(self.storage.search(Place, "loft")),
+                         [f"Place.{loft.id}"])
+        self.assertEqual(list(self.storage.search("Place", "Beach loft")),
+                         [f"Place.{loft.id}", f"Place.{house.id}"])
+        self.assertEqual(len(self.storage.search(Place, "beach", 1)), 1)
+        self.assertEqual(list(self.storage.search(State, "california")),
+                         [f"State.{state.id}"])
+        self.assertEqual(self.storage.search(BaseModel, "loft"), {})
+
+        house.name = "Cabin"
+        self.storage.delete(loft)
+        self.assertEqual(self.storage.search(Place, "loft"), {})
+        self.assertEqual(list(self.storage.search(Place, "cabin")),
+                         [f"Place.{house.id}"])
+
+        self.storage.save()
+        path = "test_file.Place.text"
+        self.assertFalse(os.path.exists(path))
+        os.chmod("test_file.json", 0o640)
+        self.storage.close()
+        with open(path, "r") as f:
+            self.assertIn(f"Place.{house.id}", json.load(f)["documents"])
+        # Readable by whoever can read the storage file
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        # Never searched, so never written
+        self.assertFalse(os.path.exists("test_file.Review.text"))
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(list(self.storage.search(Place, "cabin")),
+                         [f"Place.{house.id}"])
+
+    def test_batch(self):
+        """Test saves are deferred until commit() in a batch"""
+        path = FileStorage._FileStorage__file_path
+        self.storage.begin()
+        obj = BaseModel()
+        self.storage.save()
+        self.storage.save()
+        self.assertFalse(os.path.exists(path))
+
+        self.storage.commit()
+        with open(path, 'r') as f:
+            self.assertIn(f"BaseModel.{obj.id}", json.load(f))
+
+        # Out of the batch saves are written again
+        os.remove(path)
+        self.storage.save()
+        self.assertTrue(os.path.exists(path))
+
+    def test_batch_flush_every(self):
+        """Test a batch writes every flush_every saves"""
+        path = FileStorage._FileStorage__file_path
+        self.storage.begin(2)
+        self.storage.new(BaseModel())
+        self.storage.save()
+        self.assertFalse(os.path.exists(path))
+        self.storage.save()
+        self.assertTrue(os.path.exists(path))
+        self.storage.commit()
+
+    def test_save_replaces_file_atomically(self):
+        """Test save() goes through a temporary file renamed over the
+        previous one"""
+        path = FileStorage._FileStorage__file_path
+        BaseModel()
+        with patch("os.replace", wraps=os.replace) as replace:
+            self.storage.save()
+        replace.assert_called_once_with(path + ".tmp", path)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_durability_levels(self):
+        """Test the number of fsync calls of each durability level"""
+        BaseModel()
+        for durability, fsyncs in (("none", 0), ("file", 1), ("dir", 2)):
+            storage = FileStorage(durability=durability)
+            with patch("os.fsync") as fsync:
+                storage.save()
+            self.assertEqual(fsync.call_count, fsyncs)
+
+        with self.assertRaises(ValueError):
+            FileStorage(durability="always")
+
+    def test_delete_method(self):
+        """Test the delete() method"""
+        test_obj = BaseModel()
+        key = f"BaseModel.{test_obj.id}"
+        self.storage.delete(test_obj)
+        self.assertNotIn(key, self.storage.all())
+
+        # Deleting nothing is a no-op
+        self.storage.delete()
+
+    def test_binary_mode(self):
+        """Test the binary format is saved and reloaded either way"""
+        path = FileStorage._FileStorage__file_path
+        state = State()
+        state.name = "California"
+        FileStorage(binary=True).save()
+        self.assertTrue(binary_format.is_binary(path))
+
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        reloaded = self.storage.get(State, state.id)
+        self.assertEqual(reloaded.to_dict(), state.to_dict())
+
+        # Saved back as JSON by a storage not in binary mode
+        self.storage.save()
+        self.assertFalse(binary_format.is_binary(path))
+
+    def test_binary_save_reuses_unchanged_objects(self):
+        """Test a binary save only encodes the objects that changed, the
+        records of the others staying valid as the schema grows"""
+        storage = FileStorage(binary=True)
+        obj1 = BaseModel()
+        obj2 = BaseModel()
+        storage.save()
+
+        calls = []
+        to_dict = BaseModel.to_dict
+
+        def counting_to_dict(obj):
+            calls.append(obj.id)
+            return to_dict(obj)
+
+        BaseModel.to_dict = counting_to_dict
+        try:
+            obj2.name = "changed"
+            storage.save()
+        finally:
+            BaseModel.to_dict = to_dict
+        self.assertEqual(calls, [obj2.id])
+
+        with open(FileStorage._FileStorage__file_path, 'rb') as f:
+            saved_data = binary_format.loads(f.read())
+        self.assertEqual(saved_data[f"BaseModel.{obj1.id}"], obj1.to_dict())
+        self.assertEqual(saved_data[f"BaseModel.{obj2.id}"]["name"],
+                         "changed")
+
+
+class TestFileStorageJournal(unittest.TestCase):
+    """Test cases for the journaled mode of FileStorage"""
+
+    def setUp(self):
+        """Set up a journaled storage on a test file"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__dirty = set()
+        FileStorage._FileStorage__file_path = "test_file.json"
+        self.storage = FileStorage(journal=True)
+        self.journal = Journal("test_file.json")
+
+    def tearDown(self):
+        """Remove the snapshot and journal files"""
+        self.storage.close()
+        self.journal.discard()
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_save_appends_to_journal(self):
+        """Test save() only appends the changed objects"""
+        obj1 = BaseModel()
+        self.storage.new(obj1)
+        self.storage.save()
+        obj2 = BaseModel()
+        self.storage.new(obj2)
+        self.storage.save()
+
+        self.assertFalse(os.path.exists("test_file.json"))
+        with open(self.journal.path, "r") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([key for r in records for key in r],
+                         [f"BaseModel.{obj1.id}", f"BaseModel.{obj2.id}"])
+
+    def test_reload_replays_journal(self):
+        """Test reload() applies the journal on top of the snapshot"""
+        obj1 = BaseModel()
+        obj2 = BaseModel()
+        self.storage.new(obj1)
+        self.storage.new(obj2)
+        self.storage.save()
+        obj1.name = "updated"
+        self.storage.delete(obj2)
+        self.storage.save()
+
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        objs = self.storage.all()
+        self.assertEqual(list(objs), [f"BaseModel.{obj1.id}"])
+        self.assertEqual(objs[f"BaseModel.{obj1.id}"].name, "updated")
+
+    def test_compaction(self):
+        """Test the journal is folded into the JSON file once it grows"""
+        storage = FileStorage(journal=True, compact_bytes=0)
+        obj = BaseModel()
+        storage.new(obj)
+        storage.save()
+        storage.close()
+
+        self.assertFalse(self.journal.exists())
+        with open("test_file.json", "r") as f:
+            self.assertIn(f"BaseModel.{obj.id}", json.load(f))
+
+    def test_full_save_discards_journal(self):
+        """Test a full rewrite drops the now redundant journal"""
+        self.storage.new(BaseModel())
+        self.storage.save()
+        self.assertTrue(self.journal.exists())
+
+        FileStorage().save()
+        self.assertFalse(self.journal.exists())
+
+
+class TestFileStorageLazy(unittest.TestCase):
+    """Test cases for the lazy reload mode of FileStorage"""
+
+    def setUp(self):
+        """Save two objects then reload them lazily"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = "test_file.json"
+        self.obj1 = BaseModel()
+        self.obj2 = BaseModel()
+        FileStorage().save()
+
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage(lazy=True)
+        self.storage.reload()
+
+    def tearDown(self):
+        """Remove the test file"""
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__pending = {}
+
+    def test_reload_creates_no_object(self):
+        """Test reload() keeps the dictionaries only"""
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual(len(FileStorage._FileStorage__pending), 2)
+
+    def test_get_creates_one_object(self):
+        """Test get() creates only the object asked for"""
+        obj = self.storage.get(BaseModel, self.obj1.id)
+        self.assertIsInstance(obj, BaseModel)
+        self.assertEqual(obj.to_dict(), self.obj1.to_dict())
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         [f"BaseModel.{self.obj1.id}"])
+        self.assertIs(self.storage.get(BaseModel, self.obj1.id), obj)
+
+    def test_stream_creates_objects_as_yielded(self):
+        """Test stream() only creates the objects already yielded"""
+        objs = self.storage.stream(BaseModel)
+        key, obj = next(objs)
+        self.assertEqual(list(FileStorage._FileStorage__objects), [key])
+        self.assertIsInstance(obj, BaseModel)
+        self.assertEqual(len(list(objs)), 1)
+        self.assertEqual(len(FileStorage._FileStorage__objects), 2)
+
+    def test_all_with_class_creates_its_objects(self):
+        """Test all(cls) creates the objects of that class only"""
+        self.assertEqual(self.storage.all(State), {})
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+        self.assertEqual(len(self.storage.all(BaseModel)), 2)
+        self.assertEqual(FileStorage._FileStorage__pending, {})
+
+    def test_all_creates_every_object(self):
+        """Test all() creates the objects not accessed yet"""
+        objs = self.storage.all()
+        self.assertEqual(len(objs), 2)
+        self.assertEqual(FileStorage._FileStorage__pending, {})
+
+    def test_save_keeps_objects_not_accessed(self):
+        """Test save() writes the objects that were never created"""
+        self.storage.get(BaseModel, self.obj1.id).name = "changed"
+        self.storage.save()
+
+        with open("test_file.json", "r") as f:
+            saved_data = json.load(f)
+        self.assertEqual(saved_data[f"BaseModel.{self.obj1.id}"]["name"],
+                         "changed")
+        self.assertEqual(saved_data[f"BaseModel.{self.obj2.id}"],
+                         self.obj2.to_dict())
+
+    def test_delete_object_not_accessed(self):
+        """Test delete() of an object that was never created"""
+        self.storage.delete(self.obj2)
+        self.assertIsNone(self.storage.get(BaseModel, self.obj2.id))
+        self.assertEqual(len(self.storage.all()), 1)
+
+
+class TestFileStorageReadOnly(unittest.TestCase):
+    """Test cases for the read only mode of FileStorage"""
+
+    def setUp(self):
+        """Save a few objects in the binary format then map them"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = "test_file.json"
+        FileStorage._FileStorage__dirty = set()
+        self.state = State()
+        self.state.name = "California"
+        self.cities = [City(), City()]
+        for city in self.cities:
+            city.state_id = self.state.id
+        FileStorage(binary=True).save()
+
+        FileStorage._FileStorage__objects = {}
+        self.storage = FileStorage(read_only=True)
+        self.storage.reload()
+
+    def tearDown(self):
+        """Unmap and remove the test files"""
+        self.storage.close()
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        Journal("test_file.json").discard()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__unloaded = set()
+
+    def test_reload_creates_no_object(self):
+        """Test mapping the file decodes nothing"""
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+
+    def test_get_decodes_one_record(self):
+        """Test get() only creates the object asked for"""
+        state = self.storage.get(State, self.state.id)
+        self.assertEqual(state.to_dict(), self.state.to_dict())
+        self.assertEqual(list(FileStorage._FileStorage__objects),
+                         [f"State.{self.state.id}"])
+        self.assertIs(self.storage.get(State, self.state.id), state)
+        self.assertIsNone(self.storage.get(State, "missing"))
+
+    def test_count_decodes_nothing(self):
+        """Test count() reads the index rather than the records"""
+        self.assertEqual(self.storage.count(City), 2)
+        self.assertEqual(self.storage.count("State"), 1)
+        self.assertEqual(self.storage.count(), 3)
+        self.assertEqual(FileStorage._FileStorage__objects, {})
+
+    def test_all(self):
+        """Test all(cls) and all() decode the records of the file"""
+        self.assertEqual(len(self.storage.all(City)), 2)
+        self.assertEqual(len(self.storage.all()), 3)
+        cities = self.storage.lookup(City, "state_id", self.state.id)
+        self.assertEqual(set(cities),
+                         {f"City.{city.id}" for city in self.cities})
+
+    def test_journal_applied(self):
+        """Test records journaled after the file are applied over it"""
+        self.storage.close()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__unloaded = set()
+        storage = FileStorage(journal=True)
+        storage.reload()
+        storage.get(State, self.state.id).name = "Nevada"
+        storage.delete(storage.get(City, self.cities[0].id))
+        added = City()
+        storage.save()
+
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(self.storage.count(City), 2)
+        self.assertEqual(self.storage.count(State), 1)
+        self.assertEqual(self.storage.get(State, self.state.id).name,
+                         "Nevada")
+        self.assertIsNone(self.storage.get(City, self.cities[0].id))
+        self.assertEqual(set(self.storage.all(City)),
+                         {f"City.{self.cities[1].id}", f"City.{added.id}"})
+        self.assertEqual(self.storage.count(City), 2)
+
+    def test_save_refused(self):
+        """Test nothing can be saved, added or deleted"""
+        with self.assertRaises(io.UnsupportedOperation):
+            self.storage.save()
+        with self.assertRaises(io.UnsupportedOperation):
+            self.storage.new(State(id="1", created_at="2017-06-14T22:31:03",
+                                   updated_at="2017-06-14T22:31:03"))
+        state = self.storage.get(State, self.state.id)
+        with self.assertRaises(io.UnsupportedOperation):
+            self.storage.delete(state)
+        self.assertIs(self.storage.get(State, self.state.id), state)
+        self.assertEqual(len(self.storage.all()), 3)
+        with patch("models.storage", self.storage):
+            with self.assertRaises(io.UnsupportedOperation):
+                state.name = "Nevada"
+            with self.assertRaises(io.UnsupportedOperation):
+                state.capital = "Sacramento"
+        self.assertEqual(state.name, "California")
+        self.assertFalse(hasattr(state, "capital"))
+
+    def test_search_writes_no_file(self):
+        """Test searching builds the text index without its file"""
+        self.assertEqual(list(self.storage.search(State, "california")),
+                         [f"State.{self.state.id}"])
+        self.storage.close()
+        self.assertEqual(glob.glob("test_file.*.text"), [])
+
+    def test_json_file(self):
+        """Test a JSON file is reloaded as usual"""
+        self.storage.all()
+        self.storage.close()
+        FileStorage._FileStorage__unloaded = set()
+        FileStorage().save()
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(len(FileStorage._FileStorage__objects), 3)
+
+
+class TestFileStorageSharded(unittest.TestCase):
+    """Test cases for the sharded mode of FileStorage"""
+
+    def setUp(self):
+        """Set up a sharded storage on a test file"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__dirty = set()
+        FileStorage._FileStorage__file_path = "test_file.json"
+        self.storage = FileStorage(sharded=True)
+
+    def tearDown(self):
+        """Remove the class files"""
+        for name in FileStorage._FileStorage__classes:
+            try:
+                os.remove(f"test_file.{name}.json")
+            except FileNotFoundError:
+                pass
+        for path in glob.glob("test_file.*.text"):
+            os.remove(path)
+        Journal("test_file.json").discard()
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__pending = {}
+        FileStorage._FileStorage__unloaded = set()
+
+    def test_save_writes_one_file_per_class(self):
+        """Test every class is saved to its own file"""
+        state = State()
+        city = City()
+        self.storage.save()
+
+        with open("test_file.State.json", "r") as f:
+            self.assertEqual(list(json.load(f)), [f"State.{state.id}"])
+        with open("test_file.City.json", "r") as f:
+            self.assertEqual(list(json.load(f)), [f"City.{city.id}"])
+        self.assertFalse(os.path.exists("test_file.json"))
+
+    def test_save_only_rewrites_changed_classes(self):
+        """Test the files of unchanged classes are left alone"""
+        State()
+        city = City()
+        self.storage.save()
+        os.remove("test_file.State.json")
+
+        city.name = "Lagos"
+        self.storage.save()
+        self.assertFalse(os.path.exists("test_file.State.json"))
+        with open("test_file.City.json", "r") as f:
+            self.assertEqual(json.load(f)[f"City.{city.id}"]["name"],
+                             "Lagos")
+
+    def test_reload(self):
+        """Test reload() reads every class file"""
+        state = State()
+        city = City()
+        self.storage.save()
+
+        FileStorage._FileStorage__objects = {}
+        self.storage.reload()
+        self.assertEqual(set(self.storage.all()),
+                         {f"State.{state.id}", f"City.{city.id}"})
+
+    def test_lazy_reload_reads_files_on_demand(self):
+        """Test a class file is only read when the class is used"""
+        state = State()
+        city = City()
+        self.storage.save()
+
+        FileStorage._FileStorage__objects = {}
+        storage = FileStorage(sharded=True, lazy=True)
+        storage.reload()
+        self.assertIsNotNone(storage.get(State, state.id))
+        self.assertIn("City", FileStorage._FileStorage__unloaded)
+        self.assertNotIn("State", FileStorage._FileStorage__unloaded)
+
+        self.assertEqual(list(storage.all(City)), [f"City.{city.id}"])
+        self.assertNotIn("City", FileStorage._FileStorage__unloaded)
+
+    def test_journal(self):
+        """Test the journal is replayed into the class files"""
+        storage = FileStorage(sharded=True, journal=True)
+        state = State()
+        storage.save()
+        state.name = "Kano"
+        storage.save()
+
+        FileStorage._FileStorage__objects = {}
+        storage.reload()
+        self.assertEqual(storage.get(State, state.id).name, "Kano")
+
+        storage = FileStorage(sharded=True, journal=True, compact_bytes=0)
+        storage.get(State, state.id).name = "Oyo"
+        storage.save()
+        storage.close()
+        self.assertFalse(Journal("test_file.json").exists())
+        with open("test_file.State.json", "r") as f:
+            self.assertEqual(json.load(f)[f"State.{state.id}"]["name"],
+                             "Oyo")
+
+
+class TestFileStorageBackgroundFlush(unittest.TestCase):
+    """Test cases for the background writes of FileStorage"""
+
+    def setUp(self):
+        """Use an empty storage on a test file"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = "test_file.json"
+
+    def tearDown(self):
+        """Remove the test file"""
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def saved_keys(self):
+        """Returns the keys in the test file"""
+        with open("test_file.json", "r") as f:
+            return set(json.load(f))
+
+    def test_save_returns_before_writing(self):
+        """Test save() leaves the write to flush()"""
+        storage = FileStorage(flush_interval=60)
+        obj = BaseModel()
+        storage.save()
+        self.assertFalse(os.path.exists("test_file.json"))
+
+        storage.flush()
+        self.assertEqual(self.saved_keys(), {f"BaseModel.{obj.id}"})
+        storage.close()
+
+    def test_threshold(self):
+        """Test the thread writes once enough saves are waiting"""
+        storage = FileStorage(flush_threshold=2)
+        obj = BaseModel()
+        storage.save()
+        storage.save()
+        for _ in range(100):
+            if os.path.exists("test_file.json"):
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.saved_keys(), {f"BaseModel.{obj.id}"})
+        storage.close()
+
+    def test_interval(self):
+        """Test the thread writes once the interval is over"""
+        storage = FileStorage(flush_interval=0.01)
+        obj = BaseModel()
+        storage.save()
+        for _ in range(100):
+            if os.path.exists("test_file.json"):
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.saved_keys(), {f"BaseModel.{obj.id}"})
+        storage.close()
+
+    def test_close_writes_waiting_changes(self):
+        """Test close() writes the saves not written yet"""
+        storage = FileStorage(flush_interval=60)
+        obj = BaseModel()
+        storage.save()
+        storage.close()
+        self.assertEqual(self.saved_keys(), {f"BaseModel.{obj.id}"})
+
+    def check_failed_write(self, end):
+        """Test a failed write keeps the thread and the changes"""
+        storage = FileStorage(flush_threshold=1)
+        obj = BaseModel()
+        with patch.object(FileStorage, "_FileStorage__write",
+                          side_effect=OSError("disk full")):
+            storage.save()
+            for _ in range(100):
+                if storage._FileStorage__flush_error is not None:
+                    break
+                time.sleep(0.01)
+        self.assertTrue(storage._FileStorage__flusher.is_alive())
+        self.assertFalse(os.path.exists("test_file.json"))
+
+        with self.assertRaises(OSError):
+            end(storage)
+        self.assertEqual(self.saved_keys(), {f"BaseModel.{obj.id}"})
+        storage.close()
+
+    def test_failed_write_flush(self):
+        """Test flush() writes the changes then raises the error"""
+        self.check_failed_write(FileStorage.flush)
+
+    def test_failed_write_close(self):
+        """Test close() writes the changes then raises the error"""
+        self.check_failed_write(FileStorage.close)
+
+
+class TestFileStorageThreads(unittest.TestCase):
+    """Stress test of FileStorage shared by threads"""
+
+    def setUp(self):
+        """Use an empty storage on a test file"""
+        FileStorage._FileStorage__objects = {}
+        FileStorage._FileStorage__file_path = "test_file.json"
+        self.storage = FileStorage(thread_safe=True)
+
+    def tearDown(self):
+        """Remove the test file"""
+        for path in ["test_file.json"] + glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        FileStorage._FileStorage__objects = {}
+
+    def test_all_returns_copy(self):
+        """Test all() does not return the storage dictionary itself"""
+        BaseModel()
+        objs = self.storage.all()
+        self.assertEqual(objs, FileStorage._FileStorage__objects)
+        self.assertIsNot(objs, FileStorage._FileStorage__objects)
+
+    def test_concurrent_create_update_save(self):
+        """Test threads creating, updating, deleting, reading and saving
+        at once leave a file matching the storage"""
+        errors = []
+
+        def work(number):
+            try:
+                for i in range(150):
+                    state = State()
+                    state.name = f"{number}-{i}"
+                    city = City()
+                    city.state_id = state.id
+                    if i % 3 == 0:
+                        self.storage.delete(city)
+                    if i % 10 == 0:
+                        self.storage.save()
+                    if i % 25 == 0:
+                        for obj in self.storage.all().values():
+                            str(obj)
+                    self.storage.all(State)
+                    self.storage.lookup(City, "state_id", state.id)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        self.storage.save()
+        with open("test_file.json", "r") as f:
+            saved_data = json.load(f)
+        objs = self.storage.all()
+        self.assertEqual(len(objs), 8 * (150 + 100))
+        self.assertEqual(set(saved_data), set(objs))
+        for key, obj in objs.items():
+            self.assertEqual(saved_data[key], obj.to_dict())
+
+
+class TestFileStorageShared(unittest.TestCase):
+    """Test cases for FileStorage shared by processes"""
+
+    script = """
+import sys
+from models.engine.file_storage import FileStorage
+from models.state import State
+FileStorage._FileStorage__file_path = "test_file.json"
+storage = FileStorage(journal=sys.argv[1] == "1", shared=True)
+storage.reload()
+for i in range(int(sys.argv[2])):
+    state = State()
+    state.name = sys.argv[3]
+    storage.new(state)
+    storage.save()
+    if len(sys.argv) > 4:
+        storage.search(State, sys.argv[3])
+storage.close()
+"""
+
+    def setUp(self):
+        """Use an empty storage on a test file"""
+        self.tearDown()
+        FileStorage._FileStorage__file_path = "test_file.json"
+        FileStorage._FileStorage__dirty = set()
+
+    def tearDown(self):
+        """Remove the test files"""
+        for path in ["test_file.json", "test_file.json.lock"] + \
+                glob.glob("test_file.*.text"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        Journal("test_file.json").discard()
+        FileStorage._FileStorage__objects = {}
+
+    def spawn(self, journal, count, name, search=False):
+        """Starts a process saving count new State objects"""
+        return subprocess.Popen(
+                [sys.executable, "-c", self.script,
+                 "1" if journal else "0", str(count), name] +
+                (["search"] if search else []))
+
+    def check_merge(self, journal):
+        """Test changes saved by another process are seen and kept"""
+        storage = FileStorage(journal=journal, shared=True)
+        storage.reload()
+        mine = State()
+        mine.name = "mine"
+        storage.save()
+
+        self.assertEqual(self.spawn(journal, 2, "theirs").wait(), 0)
+        states = storage.all(State)
+        self.assertEqual(len(states), 3)
+        self.assertIs(states[f"State.{mine.id}"], mine)
+
+        other = State()
+        storage.save()
+        fresh = FileStorage(journal=journal, shared=True)
+        FileStorage._FileStorage__objects = {}
+        fresh.reload()
+        self.assertEqual(len(fresh.all(State)), 4)
+        self.assertIsNotNone(fresh.get(State, other.id))
+
+    def test_merge(self):
+        """Test merging the file saved by another process"""
+        self.check_merge(False)
+
+    def test_merge_journal(self):
+        """Test merging the records another process journaled"""
+        self.check_merge(True)
+
+    def test_deleted_elsewhere(self):
+        """Test objects deleted by another process are dropped"""
+        storage = FileStorage(shared=True)
+        storage.reload()
+        state = State()
+        storage.save()
+        with open("test_file.json", "w") as f:
+            f.write("{}")
+        self.assertIsNone(storage.get(State, state.id))
+
+    def test_concurrent_writers(self):
+        """Test processes saving at once lose no object"""
+        for journal in (False, True):
+            processes = [self.spawn(journal, 20, str(n)) for n in range(4)]
+            for process in processes:
+                self.assertEqual(process.wait(), 0)
+
+            storage = FileStorage(journal=journal, shared=True)
+            storage.reload()
+            self.assertEqual(len(storage.all(State)), 80)
+            self.setUp()
+
+    def test_concurrent_text(self):
+        """Test processes saving their text index at once"""
+        processes = [self.spawn(True, 20, str(n), True) for n in range(3)]
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+        self.assertEqual(glob.glob("test_file.State.text*"),
+                         ["test_file.State.text"])
+        with open("test_file.State.text", "r") as f:
+            # Written by the last to close, which saw its own states
+            self.assertGreaterEqual(len(json.load(f)["documents"]), 20)
+
+    def test_sharded_rejected(self):
+        """Test shared mode cannot be combined with sharded mode"""
+        with self.assertRaises(ValueError):
+            FileStorage(sharded=True, shared=True)
+
+    def test_read_only_rejected(self):
+        """Test shared mode cannot be combined with read only mode"""
+        with self.assertRaises(ValueError):
+            FileStorage(read_only=True, shared=True)
+
+
 if __name__ == '__main__':
     unittest.main()
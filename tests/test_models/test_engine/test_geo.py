@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+"""Test suite for the geospatial index"""
+import random
+import unittest
+from models.engine.geo import GeoIndex, distance_km
+
+
+class TestGeoIndex(unittest.TestCase):
+    """Test cases for the GeoIndex class"""
+
+    def setUp(self):
+        """Index random points all over the earth"""
+        rng = random.Random(0)
+        self.rng = rng
+        self.points = {}
+        self.index = GeoIndex()
+        for i in range(3000):
+            point = {"latitude": rng.uniform(-90, 90),
+                     "longitude": rng.uniform(-180, 180)}
+            self.points[f"Place.{i}"] = point
+            self.index.add(f"Place.{i}", point)
+
+    def distance(self, latitude, longitude, key):
+        """Returns the distance from a point to an indexed point"""
+        point = self.points[key]
+        return distance_km(latitude, longitude, point["latitude"],
+                           point["longitude"])
+
+    def test_distance(self):
+        """Test the great-circle distance"""
+        self.assertAlmostEqual(distance_km(0, 0, 0, 1), 111.195, places=2)
+        self.assertAlmostEqual(distance_km(0, 179.5, 0, -179.5), 111.195,
+                               places=2)
+        self.assertAlmostEqual(distance_km(90, 0, -90, 0), 20015.1,
+                               places=0)
+
+    def test_within_radius(self):
+        """Test radius searches match a linear scan"""
+        for latitude, longitude, km in ((0, 0, 500), (85, 10, 1500),
+                                        (10, 179, 800), (-30, -60, 8000),
+                                        (0, 0, 25000)):
+            expected = sorted(
+                    key for key in self.points
+                    if self.distance(latitude, longitude, key) <= km)
+            hits = self.index.within_radius(latitude, longitude, km)
+            self.assertEqual(sorted(key for key, km in hits), expected)
+            distances = [distance for key, distance in hits]
+            self.assertEqual(distances, sorted(distances))
+
+    def test_nearest(self):
+        """Test the k nearest points match a linear scan"""
+        for _ in range(20):
+            latitude = self.rng.uniform(-90, 90)
+            longitude = self.rng.uniform(-180, 180)
+            expected = sorted(self.points, key=lambda key: self.distance(
+                    latitude, longitude, key))[:7]
+            hits = self.index.nearest(latitude, longitude, 7)
+            self.assertEqual([key for key, distance in hits], expected)
+        self.assertEqual(len(self.index.nearest(0, 0, 5000)), 3000)
+
+    def test_within_bbox(self):
+        """Test bounding boxes, across the antimeridian too"""
+        for box in ((10, -20, 40, 30), (-50, 170, 50, -170),
+                    (-90, -180, 90, 180)):
+            min_latitude, min_longitude, max_latitude, max_longitude = box
+            expected = []
+            for key, point in self.points.items():
+                longitude = point["longitude"]
+                if min_longitude > max_longitude:
+                    inside = (longitude >= min_longitude or
+                              longitude <= max_longitude)
+                else:
+                    inside = min_longitude <= longitude <= max_longitude
+                if (inside and
+                        min_latitude <= point["latitude"] <= max_latitude):
+                    expected.append(key)
+            self.assertEqual(sorted(self.index.within_bbox(*box)),
+                             sorted(expected))
+
+    def test_update_and_remove(self):
+        """Test objects move with their coordinates"""
+        point = {"latitude": 48.85, "longitude": 2.35}
+        self.index.add("Place.paris", point)
+        self.assertEqual(self.index.nearest(48.85, 2.35, 1)[0][0],
+                         "Place.paris")
+
+        point["latitude"], point["longitude"] = -33.87, 151.21
+        self.index.update("Place.paris", point, "name")
+        self.assertEqual(self.index.nearest(48.85, 2.35, 1)[0][0],
+                         "Place.paris")
+        self.index.update("Place.paris", point, "latitude")
+        self.assertEqual(self.index.nearest(-33.87, 151.21, 1)[0][0],
+                         "Place.paris")
+
+        point["longitude"] = "east"
+        self.index.update("Place.paris", point)
+        self.index.remove("Place.0")
+        keys = [key for key, km in self.index.within_radius(0, 0, 30000)]
+        self.assertNotIn("Place.paris", keys)
+        self.assertNotIn("Place.0", keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+"""Test suite for the storage secondary indexes"""
+import unittest
+from models.engine.indexes import ForeignKeyIndex, value_of
+from models.review import Review
+
+
+class TestForeignKeyIndex(unittest.TestCase):
+    """Test cases for the ForeignKeyIndex class"""
+
+    def setUp(self):
+        """Set up an index on place_id"""
+        self.index = ForeignKeyIndex("place_id")
+
+    def test_value_of(self):
+        """Test attributes are read from instances and dictionaries"""
+        review = Review(place_id="p1")
+        self.assertEqual(value_of(review, "place_id"), "p1")
+        self.assertEqual(value_of({"place_id": "p2"}, "place_id"), "p2")
+        self.assertIsNone(value_of({}, "place_id"))
+
+    def test_add_and_lookup(self):
+        """Test keys are found by value"""
+        self.index.add("Review.1", {"place_id": "p1"})
+        self.index.add("Review.2", {"place_id": "p1"})
+        self.index.add("Review.3", {"place_id": "p2"})
+        self.assertEqual(self.index.lookup("p1"), {"Review.1", "Review.2"})
+        self.assertEqual(self.index.lookup("p3"), set())
+
+    def test_empty_value_not_indexed(self):
+        """Test objects without a foreign key are left out"""
+        self.index.add("Review.1", {"place_id": ""})
+        self.index.add("Review.2", {})
+        self.assertEqual(self.index.lookup(""), set())
+
+    def test_update(self):
+        """Test the index follows changes of the attribute"""
+        self.index.add("Review.1", {"place_id": "p1"})
+        self.index.update("Review.1", {"place_id": "p2"}, "text")
+        self.assertEqual(self.index.lookup("p1"), {"Review.1"})
+        self.index.update("Review.1", {"place_id": "p2"}, "place_id")
+        self.assertEqual(self.index.lookup("p1"), set())
+        self.assertEqual(self.index.lookup("p2"), {"Review.1"})
+
+    def test_remove(self):
+        """Test removed keys are no longer found"""
+        self.index.add("Review.1", {"place_id": "p1"})
+        self.index.remove("Review.1")
+        self.index.remove("Review.2")
+        self.assertEqual(self.index.lookup("p1"), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+"""Test suite for the Journal class"""
+import json
+import os
+import unittest
+from models.engine.journal import Journal
+
+
+def entry(key, value):
+    """Returns the journal entry text for key and value"""
+    return f"{json.dumps(key)}: {json.dumps(value)}"
+
+
+class TestJournal(unittest.TestCase):
+    """Test cases for the Journal class"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.journal = Journal("test_journal.json")
+
+    def tearDown(self):
+        """Remove the journal files"""
+        self.journal.discard()
+
+    def test_paths(self):
+        """Test the journal files live next to the snapshot"""
+        self.assertEqual(self.journal.path, "test_journal.json.journal")
+        self.assertEqual(self.journal.old_path,
+                         "test_journal.json.journal.old")
+
+    def test_append_and_replay(self):
+        """Test records are replayed in order on top of a snapshot"""
+        self.journal.append([entry("A.1", {"id": "1"}),
+                             entry("A.2", {"id": "2"})])
+        self.journal.append([entry("A.1", None),
+                             entry("A.2", {"id": "2", "x": 1})])
+
+        obj_dict = {"A.1": {"id": "1"}, "A.3": {"id": "3"}}
+        self.journal.replay(obj_dict)
+        self.assertEqual(obj_dict, {"A.2": {"id": "2", "x": 1},
+                                    "A.3": {"id": "3"}})
+
+    def test_append_returns_size(self):
+        """Test append returns the size of the log"""
+        size = self.journal.append([entry("A.1", {"id": "1"})])
+        self.assertEqual(size, os.path.getsize(self.journal.path))
+
+    def test_replay_ignores_torn_line(self):
+        """Test a truncated last record is ignored"""
+        self.journal.append([entry("A.1", {"id": "1"})])
+        with open(self.journal.path, "a") as f:
+            f.write('{"A.2": {"id": "2"')
+
+        obj_dict = {}
+        self.journal.replay(obj_dict)
+        self.assertEqual(obj_dict, {"A.1": {"id": "1"}})
+
+    def test_rotate(self):
+        """Test rotated records are replayed before the active ones"""
+        self.journal.append([entry("A.1", {"id": "1"})])
+        self.journal.rotate()
+        self.assertFalse(os.path.exists(self.journal.path))
+        self.assertTrue(os.path.exists(self.journal.old_path))
+
+        self.journal.append([entry("A.1", {"id": "1", "x": 2})])
+        obj_dict = {}
+        self.journal.replay(obj_dict)
+        self.assertEqual(obj_dict["A.1"], {"id": "1", "x": 2})
+
+        self.journal.finish()
+        self.assertFalse(os.path.exists(self.journal.old_path))
+        self.assertTrue(self.journal.exists())
+
+    def test_rotate_keeps_unfinished_log(self):
+        """Test rotating twice without finishing loses no record"""
+        self.journal.append([entry("A.1", {"id": "1"})])
+        self.journal.rotate()
+        self.journal.append([entry("A.2", {"id": "2"})])
+        self.journal.rotate()
+
+        obj_dict = {}
+        self.journal.replay(obj_dict)
+        self.assertEqual(set(obj_dict), {"A.1", "A.2"})
+
+
+if __name__ == '__main__':
+    unittest.main()
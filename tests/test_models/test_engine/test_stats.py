@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+"""Test suite for the operation statistics"""
+import unittest
+from models.engine import stats
+from models.engine.stats import Histogram
+
+
+class TestHistogram(unittest.TestCase):
+    """Test cases for the Histogram class"""
+
+    def test_percentiles(self):
+        """Test percentiles are bounded by their bucket"""
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(50), 0.0)
+        for microseconds in range(1, 101):
+            histogram.add(microseconds / 10 ** 6)
+        histogram.add(0.5)
+
+        self.assertEqual(histogram.count, 101)
+        self.assertEqual(histogram.max, 0.5)
+        p50 = histogram.percentile(50)
+        self.assertGreaterEqual(p50, 51 / 10 ** 6)
+        self.assertLess(p50, 51 * 2 ** 0.25 / 10 ** 6)
+        self.assertEqual(histogram.percentile(100), 0.5)
+
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 101)
+        self.assertEqual(summary["max_ms"], 500.0)
+        self.assertEqual(summary["bytes"], 0)
+
+
+class TestStats(unittest.TestCase):
+    """Test cases for the recording functions"""
+
+    def setUp(self):
+        """Start from nothing recorded"""
+        stats.reset()
+
+    def tearDown(self):
+        """Forget what the test recorded"""
+        stats.reset()
+
+    def test_record(self):
+        """Test runs and bytes are added up per operation"""
+        stats.record("write", 0.002, 100)
+        stats.record("write", 0.004, 50)
+        stats.record("read", 0.001)
+
+        report = stats.report()
+        self.assertEqual(list(report), ["read", "write"])
+        self.assertEqual(report["write"]["count"], 2)
+        self.assertEqual(report["write"]["bytes"], 150)
+        self.assertEqual(report["write"]["total_ms"], 6.0)
+        self.assertEqual(report["write"]["mean_ms"], 3.0)
+        stats.reset()
+        self.assertEqual(stats.report(), {})
+
+    def test_instrumented(self):
+        """Test decorated functions are recorded, hot ones if enabled"""
+        def double(value):
+            return value * 2
+
+        self.assertEqual(stats.instrumented("double")(double)(2), 4)
+        self.assertEqual(stats.report()["double"]["count"], 1)
+        hot = stats.instrumented("hot", hot=True)(double)
+        self.assertEqual(hot is double, not stats.ENABLED)
+
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            stats.instrumented("fail")(fail)()
+        self.assertEqual(stats.report()["fail"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Test suite for the full-text index"""
+import json
+import unittest
+from unittest import mock
+from models.engine import text
+from models.engine.text import TextIndex, tokenize
+
+
+class TestTextIndex(unittest.TestCase):
+    """Test cases for the TextIndex class"""
+
+    def setUp(self):
+        """Index a few reviews"""
+        self.index = TextIndex("text")
+        self.reviews = {
+            "Review.1": {"text": "Great place, great host"},
+            "Review.2": {"text": "Noisy street but a great view"},
+            "Review.3": {"text": "Clean and quiet"},
+            "Review.4": {"text": None}
+        }
+        for key, review in self.reviews.items():
+            self.index.add(key, review)
+
+    def test_tokenize(self):
+        """Test text is split into lowercase words"""
+        self.assertEqual(tokenize("Café, CLEAN & quiet!"),
+                         ["café", "clean", "quiet"])
+
+    def test_search(self):
+        """Test hits are the objects using a word, best first"""
+        hits = self.index.search("GREAT")
+        self.assertEqual([key for key, score in hits],
+                         ["Review.1", "Review.2"])
+        self.assertGreater(hits[0][1], hits[1][1])
+        self.assertEqual([key for key, score in
+                          self.index.search("quiet view")],
+                         ["Review.3", "Review.2"])
+        self.assertEqual(self.index.search("great", limit=1)[0][0],
+                         "Review.1")
+        self.assertEqual(self.index.search("pool"), [])
+        self.assertEqual(self.index.search(""), [])
+
+    def test_update_and_remove(self):
+        """Test the postings follow the changes"""
+        self.index.update("Review.3", {"text": "Great"}, "text")
+        self.assertEqual(self.index.search("quiet"), [])
+        self.assertEqual(len(self.index.search("great")), 3)
+        self.index.update("Review.3", {"text": "Dirty"}, "place_id")
+        self.assertEqual(len(self.index.search("great")), 3)
+
+        self.index.remove("Review.1")
+        self.index.remove("Review.1")
+        self.assertEqual([key for key, score in self.index.search("host")],
+                         [])
+        self.index.clear()
+        self.assertEqual(self.index.search("great"), [])
+
+    def test_load(self):
+        """Test a dumped index spares splitting unchanged text again"""
+        data = json.loads(json.dumps(self.index.dump()))
+        self.assertFalse(self.index.changed)
+
+        index = TextIndex("text")
+        index.load(data)
+        with mock.patch.object(text, "tokenize", wraps=tokenize) as split:
+            for key, review in self.reviews.items():
+                index.add(key, review if key != "Review.3" else
+                          {"text": "Dirty"})
+        self.assertEqual(split.call_count, 1)
+        self.assertTrue(index.changed)
+        self.assertEqual([key for key, score in index.search("great")],
+                         ["Review.1", "Review.2"])
+        self.assertEqual(index.search("quiet"), [])
+
+        # Made for other attributes
+        index = TextIndex("name")
+        index.load(data)
+        with mock.patch.object(text, "tokenize", wraps=tokenize) as split:
+            index.add("Review.1", {"name": "Great place, great host"})
+        self.assertEqual(split.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()